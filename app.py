@@ -1,7 +1,19 @@
+import itertools
 import streamlit as st
 from utils.rag_utils import retrieve_similar_artworks
-from models.llm import generate_llm
-from config.config import INDEX_PATH
+from models.llm import generate_llm, stream_llm, build_context_prompt, LLMMetrics, answer_cache, PROMPT_VERSION
+from models.embeddings import warm_up
+from models.metadata_filters import MetadataFilter
+from models.query_cache import normalise_query
+from utils.single_flight import Flight, FlightAbandoned, SingleFlight
+from utils.telemetry import (
+    trace, span, start_metrics_server, STAGE_SECONDS, QUESTIONS, CACHE_LOOKUPS, LLM_ERRORS, LLM_TOKENS,
+    COALESCED_CALLS,
+)
+from config.config import (
+    INDEX_PATH, LLM_MODEL, LLM_STREAMING, WARM_UP_ON_START, TELEMETRY_ENABLED, METRICS_PORT, METRICS_HOST,
+    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+)
 
 # ---------------------------
 # Sidebar Navigation
@@ -12,6 +24,44 @@ st.set_page_config(
     layout="wide"
 )
 
+# ---------------------------
+# Background Warm-up
+# ---------------------------
+@st.cache_resource
+def start_warm_up():
+    """
+    Starts loading the model and index in the background once per server process,
+    so this page renders straight away instead of waiting for them.
+    """
+    return warm_up(INDEX_PATH)
+
+if WARM_UP_ON_START:
+    start_warm_up()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """
+    Serves the Prometheus metrics endpoint once per server process. Returns its URL,
+    or None when it is disabled or the port is taken (e.g. by another app process).
+    """
+    if not TELEMETRY_ENABLED or not METRICS_PORT:
+        return None
+    try:
+        return start_metrics_server(METRICS_PORT, METRICS_HOST)[1]
+    except OSError as e:
+        print(f"Metrics endpoint not started on {METRICS_HOST}:{METRICS_PORT}: {e}")
+        return None
+
+metrics_url = start_metrics_endpoint()
+
+@st.cache_resource
+def questions_in_flight() -> SingleFlight:
+    """
+    Questions being answered right now, shared by every session in this server process,
+    so a group asking the same thing at once triggers one retrieval and one LLM call.
+    """
+    return SingleFlight()
+
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to:", ["Chat", "Instructions"], index=0)
 
@@ -59,6 +109,107 @@ def instructions_page():
 # ---------------------------
 # Chat Page
 # ---------------------------
+def stream_answer(prompt: str, mode: str, flight: Flight):
+    """
+    Renders the answer as it is generated, then the request's latency figures, and
+    passes each fragment on to sessions sharing the question.
+    Returns the full answer and the request's metrics.
+    """
+    answer_box = st.empty()
+    metrics = LLMMetrics(LLM_MODEL, streamed=True)
+    response = ""
+    for text in stream_llm(prompt, mode=mode, metrics=metrics):
+        response += text
+        answer_box.success(response)
+        flight.publish("delta", text)
+    if metrics.ttft is not None:
+        st.caption(f"⏱️ First token in {metrics.ttft:.2f}s · {metrics.tokens_per_second:.0f} tokens/s · "
+                   f"{metrics.total:.2f}s total")
+    return response, metrics
+
+def show_answer_header():
+    st.markdown("""
+    <h3 style='color: #2E8B57;'>🧠 Docent Bot's Answer:</h3>
+    """, unsafe_allow_html=True)
+
+def answer_question(query: str, mode: str, filters: MetadataFilter, flight: Flight):
+    """
+    Retrieves context and answers the question, publishing the context and the answer
+    (or its fragments as they stream) to sessions asking the same question meanwhile.
+    """
+    with st.spinner("🔍 Searching the museum archive..."):
+        with span("retrieve"):
+            context_chunks = retrieve_similar_artworks(query, index_path=INDEX_PATH, filters=filters)
+        flight.publish("chunks", context_chunks)
+        if not context_chunks and not filters.is_empty():
+            st.warning("No artworks match these filters.")
+
+        if context_chunks:
+            with span("prompt"):
+                full_prompt = build_context_prompt(query, context_chunks)
+
+            with span("answer_cache"):
+                response = answer_cache.get(query, context_chunks, mode, LLM_MODEL, PROMPT_VERSION)
+            cached = response is not None
+            CACHE_LOOKUPS.inc(cache="answer", result="hit" if cached else "miss")
+            if not cached and not LLM_STREAMING:
+                metrics = LLMMetrics(LLM_MODEL, streamed=False)
+                response = generate_llm(full_prompt, mode=mode, metrics=metrics)
+                if not metrics.error:
+                    answer_cache.put(query, context_chunks, mode, LLM_MODEL, PROMPT_VERSION, response)
+        # Error message is handled within retrieve_similar_artworks
+
+    if context_chunks:
+        show_answer_header()
+        if response is None:
+            response, metrics = stream_answer(full_prompt, mode, flight)
+            if not metrics.error:
+                answer_cache.put(query, context_chunks, mode, LLM_MODEL, PROMPT_VERSION, response)
+        else:
+            flight.publish("answer", response, cached)
+            st.success(response)
+            if cached:
+                st.caption("⚡ Answered from cache")
+
+def follow_answer(flight: Flight, filters: MetadataFilter) -> bool:
+    """
+    Renders the answer to an identical question another session is already answering,
+    as that session produces it, instead of retrieving and calling the LLM again.
+    Returns False, leaving nothing rendered, if that session stopped before finishing
+    or has gone longer than an LLM call may take without producing anything.
+    """
+    placeholder = st.empty()
+    response, llm_called = "", False
+    try:
+        with placeholder.container():
+            events = flight.events(timeout=LLM_CONNECT_TIMEOUT + LLM_READ_TIMEOUT)
+            with st.spinner("🔍 Searching the museum archive..."):
+                for event in events:
+                    if event[0] != "chunks":
+                        break
+                    if not event[1] and not filters.is_empty():
+                        st.warning("No artworks match these filters.")
+                else:
+                    event = None  # No context, so no answer
+            if event is not None:
+                show_answer_header()
+                answer_box = st.empty()
+                for event in itertools.chain([event], events):
+                    if event[0] == "delta":
+                        response += event[1]
+                        llm_called = True
+                    else:
+                        response, llm_called = event[1], not event[2]
+                    answer_box.success(response)
+                st.caption("🤝 Shared with the same question asked at the same time")
+    except FlightAbandoned:
+        placeholder.empty()
+        return False
+    COALESCED_CALLS.inc(call="retrieve")
+    if llm_called:
+        COALESCED_CALLS.inc(call="llm")
+    return True
+
 def chat_page():
     st.markdown("""
         <h1 style='text-align: center; color: #4B0082;'>🖼️ Museum Docent Chatbot</h1>
@@ -72,6 +223,14 @@ def chat_page():
     with col1:
         query = st.text_input("🔍 Ask a question:", placeholder="e.g. Tell me about Van Gogh's self portrait")
         mode = st.radio("📝 Response Style:", ["concise", "detailed"], horizontal=True)
+        with st.expander("🔎 Filter artworks"):
+            artist_col, medium_col, from_col, to_col = st.columns(4)
+            filters = MetadataFilter.parse(
+                artist_col.text_input("Artist", placeholder="e.g. Houdon"),
+                medium_col.text_input("Medium", placeholder="e.g. bronze"),
+                from_col.text_input("From", placeholder="e.g. 500 B.C."),
+                to_col.text_input("To", placeholder="e.g. 1600"),
+            )
 
     with col2:
         st.info("""
@@ -86,20 +245,23 @@ def chat_page():
     st.markdown("---")
 
     if query:
-        with st.spinner("🔍 Searching the museum archive..."):
-            context_chunks = retrieve_similar_artworks(query, index_path=INDEX_PATH)
-            
-            if context_chunks:
-                context = "\n---\n".join(context_chunks)
-                full_prompt = f"Use the following context to answer the user's question.\n---\n{context}\n---\nQuestion: {query}"
-
-                response = generate_llm(full_prompt, mode=mode)
-
-                st.markdown("""
-                <h3 style='color: #2E8B57;'>🧠 Docent Bot's Answer:</h3>
-                """, unsafe_allow_html=True)
-                st.success(response)
-            # Error message is handled within retrieve_similar_artworks
+        with trace("question") as question_trace:
+            QUESTIONS.inc()
+            key = (normalise_query(query), mode, repr(filters))
+            while True:
+                with questions_in_flight().join(key) as (flight, leader):
+                    if leader:
+                        answer_question(query, mode, filters, flight)
+                        break
+                    with span("shared_answer"):
+                        if follow_answer(flight, filters):
+                            break
+                if not flight.landed:
+                    # The session answering it is stuck; answer it here without waiting on it again
+                    answer_question(query, mode, filters, Flight())
+                    break
+                # The session answering it was interrupted; answer it here instead
+        st.session_state["last_trace"] = question_trace
 
     else:
         st.markdown("<p style='text-align: center;'>👆 Enter a question above to begin exploring the art world!</p>", unsafe_allow_html=True)
@@ -110,4 +272,43 @@ def chat_page():
 if page == "Instructions":
     instructions_page()
 else:
-    chat_page()
\ No newline at end of file
+    chat_page()
+
+# ---------------------------
+# Answer Cache Stats
+# ---------------------------
+cache_stats = answer_cache.stats()
+st.sidebar.caption(
+    f"⚡ Answer cache: {cache_stats['hit_rate']:.0%} hit rate "
+    f"({cache_stats['hits'] + cache_stats['disk_hits']} hits, {cache_stats['misses']} misses)"
+)
+
+# ---------------------------
+# Pipeline Timings
+# ---------------------------
+if TELEMETRY_ENABLED and st.sidebar.checkbox("🛠️ Pipeline timings"):
+    last_trace = st.session_state.get("last_trace")
+    if last_trace is not None:
+        st.sidebar.caption(f"Last question: {last_trace.total * 1000:.0f} ms")
+        st.sidebar.dataframe(last_trace.as_rows(), hide_index=True)
+    stage_rows = [
+        {"stage": labels["stage"], "count": STAGE_SECONDS.count(**labels),
+         "p50 ms": round(STAGE_SECONDS.quantile(0.5, **labels) * 1000, 1),
+         "p95 ms": round(STAGE_SECONDS.quantile(0.95, **labels) * 1000, 1)}
+        for labels in STAGE_SECONDS.series_labels()
+    ]
+    if stage_rows:
+        st.sidebar.caption("All questions in this process (p50/p95 estimated from histogram buckets)")
+        st.sidebar.dataframe(stage_rows, hide_index=True)
+    embed_hits = CACHE_LOOKUPS.value(cache="query_embedding", result="hit")
+    embed_lookups = embed_hits + CACHE_LOOKUPS.value(cache="query_embedding", result="miss")
+    st.sidebar.caption(
+        f"{QUESTIONS.total():.0f} questions · {LLM_ERRORS.total():.0f} LLM errors · {LLM_TOKENS.total():.0f} tokens · "
+        f"query embedding cache {embed_hits / embed_lookups if embed_lookups else 0:.0%} hit rate"
+    )
+    st.sidebar.caption(
+        f"Shared in-flight answers saved {COALESCED_CALLS.value(call='retrieve'):.0f} retrievals and "
+        f"{COALESCED_CALLS.value(call='llm'):.0f} LLM calls"
+    )
+    if metrics_url:
+        st.sidebar.caption(f"Prometheus metrics: {metrics_url}")
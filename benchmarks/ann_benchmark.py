@@ -0,0 +1,88 @@
+"""
+Recall / latency benchmark for the supported FAISS index families.
+
+Builds every configuration below over the same synthetic corpus, then reports
+recall@k against the exact flat index, single-query QPS and p50/p99 latency.
+
+    python -m benchmarks.ann_benchmark --vectors 100000 --queries 1000 --k 10
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from models.index_factory import make_index, configure_search, needs_training
+
+# (label, index type, parameter overrides)
+CONFIGURATIONS = [
+    ("flat", "flat", {}),
+    ("ivf nprobe=1", "ivf", {"nprobe": 1}),
+    ("ivf nprobe=8", "ivf", {"nprobe": 8}),
+    ("ivf nprobe=32", "ivf", {"nprobe": 32}),
+    ("hnsw ef=16", "hnsw", {"ef_search": 16}),
+    ("hnsw ef=64", "hnsw", {"ef_search": 64}),
+    ("hnsw ef=128", "hnsw", {"ef_search": 128}),
+    ("ivfpq m=48 nprobe=8", "ivfpq", {"pq_m": 48, "nprobe": 8}),
+    ("ivfpq m=48 nprobe=32", "ivfpq", {"pq_m": 48, "nprobe": 32}),
+]
+
+
+def synthetic_corpus(n: int, dimension: int, n_queries: int, clusters: int = 200, seed: int = 0):
+    """
+    Clustered unit vectors, which look more like sentence embeddings than uniform
+    noise does. Queries are perturbed corpus vectors.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    corpus = centres[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dimension)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = corpus[rng.integers(0, n, n_queries)] + 0.1 * rng.standard_normal((n_queries, dimension)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return corpus, queries.astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(n: int, dimension: int, n_queries: int, k: int):
+    corpus, queries = synthetic_corpus(n, dimension, n_queries)
+    ids = np.arange(n, dtype=np.int64)
+    truth = None
+
+    print(f"{n} vectors x {dimension} dims, {n_queries} queries, k={k}, {faiss.omp_get_max_threads()} threads\n")
+    print(f"{'configuration':<22} {'build (s)':>10} {'size (MB)':>10} {f'recall@{k}':>10} {'QPS':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+
+    for label, index_type, overrides in CONFIGURATIONS:
+        start = time.perf_counter()
+        train_vectors = corpus[:overrides.get("train_size", 50000)] if needs_training(index_type) else None
+        index, params = make_index(dimension, index_type, overrides, train_vectors=train_vectors)
+        index.add_with_ids(corpus, ids)
+        build_seconds = time.perf_counter() - start
+        configure_search(index, params)
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        latencies = np.empty(n_queries)
+        found = np.empty((n_queries, k), dtype=np.int64)
+        start = time.perf_counter()
+        for i in range(n_queries):
+            query_start = time.perf_counter()
+            _, found[i] = index.search(queries[i:i + 1], k)
+            latencies[i] = time.perf_counter() - query_start
+        qps = n_queries / (time.perf_counter() - start)
+
+        if truth is None:
+            truth = found.copy()  # The first configuration is the exact flat baseline
+        print(f"{label:<22} {build_seconds:>10.2f} {size_mb:>10.1f} {recall_at_k(found, truth):>10.3f} {qps:>9.0f} "
+              f"{np.percentile(latencies, 50) * 1000:>9.3f} {np.percentile(latencies, 99) * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index families on a synthetic corpus.")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 produces 384-dim embeddings")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    run(args.vectors, args.dim, args.queries, args.k)
@@ -0,0 +1,108 @@
+"""
+Prompt-size report for context assembly (models/context_builder.py).
+
+For questions about artworks in data/met_artworks.jsonl, retrieves context from the
+published index twice and builds the prompt each way:
+  - before: all top_k chunks in the original indented layout, with empty and
+    "Unknown ..." fields, joined as they are
+  - after: dense hits past CONTEXT_MAX_DISTANCE and BM25 hits under
+    CONTEXT_MIN_LEXICAL_SCORE dropped, then compacted, de-duplicated and packed
+    into CONTEXT_TOKEN_BUDGET
+and reports estimated prompt tokens, the answer latency of both against the local mock
+LLM endpoint (whose first token waits for the prompt at --prefill-rate tokens/s), and
+the input-token cost per thousand questions at --input-price.
+
+    python build_index.py
+    python -m benchmarks.context_budget --questions 50 --top-k 5
+"""
+import argparse
+import os
+import numpy as np
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")  # The mock endpoint accepts any key
+
+from benchmarks.end_to_end import sample_questions
+from config.config import ARTWORK_DATA_PATH, INDEX_PATH, LLM_MODEL, CONTEXT_MAX_DISTANCE, CONTEXT_MIN_LEXICAL_SCORE
+from models.context_builder import compact_chunk, estimate_tokens
+from models.llm import build_context_prompt, build_messages, generate_llm, LLMMetrics
+from models.mock_llm_server import start_mock_server
+from utils.rag_utils import hot_index, search_artworks_batch
+
+LEGACY_FIELDS = ["Title", "Artist", "Date", "Medium", "Dimensions", "Description", "Source"]
+LEGACY_DEFAULTS = {"Title": "Unknown Title", "Artist": "Unknown Artist", "Date": "Unknown Date",
+                   "Medium": "Unknown Medium"}
+
+
+def legacy_chunk(chunk: str) -> str:
+    """
+    A chunk in the layout load_artwork_chunks produced before chunks were compacted.
+    """
+    fields = dict(line.split(": ", 1) for line in compact_chunk(chunk).splitlines() if ": " in line)
+    lines = [f"{name}: {fields.get(name) or LEGACY_DEFAULTS.get(name, '')}" for name in LEGACY_FIELDS]
+    return ("\n" + " " * 16).join(lines)
+
+
+def legacy_prompt(query: str, chunks: list) -> str:
+    context = "\n---\n".join(legacy_chunk(chunk) for chunk in chunks)
+    return f"Use the following context to answer the user's question.\n---\n{context}\n---\nQuestion: {query}"
+
+
+def prompt_tokens(prompt: str) -> int:
+    return sum(estimate_tokens(message["content"]) for message in build_messages(prompt))
+
+
+def answer_seconds(prompts: list, api_url: str) -> tuple:
+    ttfts, totals = [], []
+    for prompt in prompts:
+        metrics = LLMMetrics(LLM_MODEL, streamed=False)
+        generate_llm(prompt, api_url=api_url, metrics=metrics)
+        if metrics.error:
+            raise RuntimeError(metrics.error)
+        ttfts.append(metrics.ttft)
+        totals.append(metrics.total)
+    return np.mean(ttfts), np.mean(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure prompt tokens, latency and cost saved by context assembly.")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--llm-ttft", type=float, default=0.1, help="Mock endpoint's fixed delay before the first token")
+    parser.add_argument("--prefill-rate", type=float, default=2000, help="Mock endpoint's prompt tokens per second")
+    parser.add_argument("--input-price", type=float, default=0.05, help="USD per million prompt tokens")
+    args = parser.parse_args()
+
+    if not os.path.exists(ARTWORK_DATA_PATH):
+        raise SystemExit(f"Artwork data file not found at: {ARTWORK_DATA_PATH}")
+    generation = hot_index(INDEX_PATH).current
+    questions = sample_questions(ARTWORK_DATA_PATH, args.questions)
+
+    def retrieve(max_distance, min_lexical_score):
+        return search_artworks_batch(generation.index, generation.chunks, questions, args.top_k, generation.lexical,
+                                     max_distance=max_distance, min_lexical_score=min_lexical_score)
+
+    before = [legacy_prompt(q, chunks) for q, chunks in zip(questions, retrieve(None, 0.0))]
+    after = [build_context_prompt(q, chunks)
+             for q, chunks in zip(questions, retrieve(CONTEXT_MAX_DISTANCE, CONTEXT_MIN_LEXICAL_SCORE))]
+    tokens_before = np.array([prompt_tokens(prompt) for prompt in before])
+    tokens_after = np.array([prompt_tokens(prompt) for prompt in after])
+
+    server, api_url = start_mock_server(ttft=args.llm_ttft, token_delay=0.0, prefill_rate=args.prefill_rate)
+    try:
+        ttft_before, total_before = answer_seconds(before, api_url)
+        ttft_after, total_after = answer_seconds(after, api_url)
+    finally:
+        server.shutdown()
+
+    def cost(tokens):
+        return tokens.mean() * 1000 * args.input_price / 1e6
+
+    print(f"{len(questions)} questions, top_k {args.top_k}, index version {generation.version or 'unversioned'}\n")
+    print(f"{'':<8} {'prompt tokens':>14} {'p95 tokens':>11} {'ttft ms':>8} {'answer ms':>10} {'$ / 1k q':>9}")
+    for name, tokens, ttft, total in [("before", tokens_before, ttft_before, total_before),
+                                      ("after", tokens_after, ttft_after, total_after)]:
+        print(f"{name:<8} {tokens.mean():>14.0f} {np.percentile(tokens, 95):>11.0f} {ttft * 1000:>8.1f} "
+              f"{total * 1000:>10.1f} {cost(tokens):>9.4f}")
+    print(f"\nPrompt tokens -{1 - tokens_after.mean() / tokens_before.mean():.0%}, "
+          f"time to first token -{1 - ttft_after / ttft_before:.0%}, "
+          f"input cost -{1 - cost(tokens_after) / cost(tokens_before):.0%}")
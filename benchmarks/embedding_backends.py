@@ -0,0 +1,95 @@
+"""
+Throughput, latency and parity of the embedding backends.
+
+Encodes the same sentences (artwork chunks when the collection is present, otherwise
+generated ones) with every backend and reports load time, batch throughput in
+sentences/sec, single-query p50/p95 latency, and the cosine drift of each backend's
+vectors against the PyTorch reference.
+
+    python -m benchmarks.embedding_backends --sentences 2000 --queries 200 --threads 4
+"""
+import argparse
+import itertools
+import os
+import time
+import numpy as np
+from config.config import ARTWORK_DATA_PATH, EMBED_BATCH_SIZE
+from models.embedding_backends import EMBEDDING_BACKENDS, load_embedding_model, cosine_drift
+from utils.rag_utils import iter_artwork_chunks
+
+QUESTIONS = [
+    "Who painted The Starry Night?",
+    "Tell me about Egyptian funerary masks",
+    "What materials were used in this Japanese woodblock print?",
+    "Which artworks in the collection come from 17th century Netherlands?",
+    "Describe a marble sculpture of a Greek goddess",
+]
+
+
+def sample_sentences(n: int) -> list:
+    if os.path.exists(ARTWORK_DATA_PATH):
+        chunks = list(itertools.islice(iter_artwork_chunks(ARTWORK_DATA_PATH), n))
+        if chunks:
+            return chunks
+    subjects = ["portrait", "landscape", "vase", "tapestry", "armour", "print", "statue", "manuscript"]
+    periods = ["Ming dynasty", "Edo period", "Renaissance", "Baroque", "New Kingdom", "Art Nouveau"]
+    return [f"Title: {subject} {i}\nPeriod: {periods[i % len(periods)]}\n"
+            f"A {subject} from the {periods[i % len(periods)]}, catalogued as object {i}."
+            for i, subject in zip(range(n), itertools.cycle(subjects))]
+
+
+def run(backends, n_sentences: int, n_queries: int, threads: int, tolerance: float):
+    sentences = sample_sentences(n_sentences)
+    queries = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(n_queries)]
+    print(f"{len(sentences)} sentences, {n_queries} single queries, threads={threads or 'default'}\n")
+    print(f"{'backend':<10} {'load s':>7} {'sent/s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'mean cos':>9} {'min cos':>8} {'parity':>7}")
+
+    reference = None
+    for backend in backends:
+        start = time.perf_counter()
+        try:
+            model = load_embedding_model(backend, threads)
+        except ImportError as e:
+            print(f"{backend:<10} skipped: {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        model.encode(sentences[:EMBED_BATCH_SIZE], show_progress_bar=False)  # Warm-up
+        start = time.perf_counter()
+        vectors = model.encode(sentences, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False)
+        throughput = len(sentences) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            model.encode([query], show_progress_bar=False)
+            latencies.append(time.perf_counter() - start)
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+
+        if backend == "torch":
+            reference = vectors
+        if reference is None:
+            parity = f"{'-':>9} {'-':>8} {'-':>7}"
+        else:
+            drift = cosine_drift(reference, vectors, tolerance)
+            parity = (f"{drift['mean_cosine']:>9.5f} {drift['min_cosine']:>8.5f} "
+                      f"{'ok' if drift['within_tolerance'] else 'DRIFT':>7}")
+        print(f"{backend:<10} {load_seconds:>7.1f} {throughput:>8.0f} {p50:>7.2f} {p95:>7.2f} {parity}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends for speed and parity.")
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS),
+                        help="Backends to run; the first 'torch' run is the parity reference.")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per backend (0 = library default).")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="Largest acceptable 1 - cosine against the reference for any sentence.")
+    args = parser.parse_args()
+
+    if "torch" in args.backends:
+        args.backends.remove("torch")
+        args.backends.insert(0, "torch")  # Reference vectors first
+    run(args.backends, args.sentences, args.queries, args.threads, args.tolerance)
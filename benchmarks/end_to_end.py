@@ -0,0 +1,281 @@
+"""
+End-to-end benchmark of the docent pipeline on a synthetic collection.
+
+Generates a Met-shaped corpus (benchmarks/generate_corpus.py) in a scratch directory
+and times every stage in a fresh interpreter, so each stage's peak RSS is its own and
+"cold" really is cold:
+  - ingest: records appended through the scraper's checkpoint (hash, flush, delta manifest)
+  - build: `python build_index.py` over the ingested file
+  - cold_load: opening the index, chunk store and sidecars in a new process
+  - retrieve: retrieve_similar_artworks for questions about artworks in the corpus
+  - answer: question -> retrieval -> prompt -> streamed answer, against the local mock
+    of the Groq chat endpoint (models/mock_llm_server.py); the answer cache is bypassed
+Each stage reports wall time, throughput, peak RSS and, per query, p50/p95/p99. The
+report is written as JSON with the commit it was run on; --compare prints the change
+between two reports.
+
+    python -m benchmarks.end_to_end --records 100k --queries 200 --llm-ttft 0.3 --output bench.json
+    python -m benchmarks.end_to_end --compare before.json after.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from benchmarks.generate_corpus import parse_size, write_corpus
+from config.config import EMBED_BATCH_SIZE, EMBED_WORKERS, EMBEDDING_BACKEND, INDEX_TYPE
+from models.index_factory import INDEX_TYPES
+from models.mock_llm_server import start_mock_server
+from utils.rag_utils import iter_artwork_records
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared by every stage script: stage output goes to stderr, the JSON result to stdout
+PRELUDE = """
+import contextlib, json, resource, sys, time
+import numpy as np
+
+def finish(result, latencies=None):
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        result.update(p50_ms=round(p50, 3), p95_ms=round(p95, 3), p99_ms=round(p99, 3))
+    peak_kb = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    result["peak_rss_mb"] = round(peak_kb / 1024, 1)
+    print(json.dumps(result), file=sys.__stdout__)
+
+quiet = contextlib.redirect_stdout(sys.stderr)
+"""
+
+INGEST = PRELUDE + """
+import os
+from config.config import ARTWORK_DATA_PATH
+from utils.ingest_checkpoint import IngestCheckpoint, artwork_id
+from utils.rag_utils import iter_artwork_records
+os.makedirs(os.path.dirname(ARTWORK_DATA_PATH), exist_ok=True)
+start = time.perf_counter()
+checkpoint = IngestCheckpoint(ARTWORK_DATA_PATH)
+count = 0
+with open(ARTWORK_DATA_PATH, "w", encoding="utf-8") as f:
+    for data in iter_artwork_records(%(corpus)r):
+        key = artwork_id(data)
+        status = checkpoint.classify(key, data)
+        offset = f.tell()
+        f.write(json.dumps(data, ensure_ascii=False) + "\\n")
+        f.flush()
+        checkpoint.mark(key, data, status, offset)
+        count += 1
+checkpoint.finish()
+seconds = time.perf_counter() - start
+finish({"records": count, "seconds": round(seconds, 3), "records_per_s": round(count / seconds, 1)})
+"""
+
+BUILD = PRELUDE + """
+import runpy
+from config.config import INDEX_PATH
+from models.embeddings import load_id_map
+from models.index_manifest import resolve_index_path
+sys.argv = ["build_index.py", "--index-type", %(index_type)r, "--workers", "%(workers)d",
+            "--batch-size", "%(batch_size)d"]
+start = time.perf_counter()
+with quiet:
+    runpy.run_path(%(build_index)r, run_name="__main__")
+seconds = time.perf_counter() - start
+count = len(load_id_map(resolve_index_path(INDEX_PATH)[1])["rows"])
+finish({"chunks": count, "seconds": round(seconds, 3), "chunks_per_s": round(count / seconds, 1)})
+"""
+
+COLD_LOAD = PRELUDE + """
+start = time.perf_counter()
+from config.config import INDEX_PATH
+from models.embeddings import load_faiss_index, get_model
+from models.lexical_index import LexicalIndex
+from models.metadata_filters import FilterIndex
+from models.index_manifest import resolve_index_path
+imported = time.perf_counter()
+_, path = resolve_index_path(INDEX_PATH)
+index, chunks = load_faiss_index(path)
+LexicalIndex.load(path)
+FilterIndex.load(path)
+loaded = time.perf_counter()
+get_model()
+done = time.perf_counter()
+finish({"vectors": index.ntotal, "import_s": round(imported - start, 3), "index_s": round(loaded - imported, 3),
+        "model_s": round(done - loaded, 3), "seconds": round(done - start, 3)})
+"""
+
+RETRIEVE = PRELUDE + """
+from config.config import INDEX_PATH
+from utils.rag_utils import retrieve_similar_artworks
+queries = json.load(open(%(queries)r, encoding="utf-8"))
+retrieve_similar_artworks(queries[0], INDEX_PATH)  # Load the model and index outside the timed loop
+latencies = []
+start = time.perf_counter()
+for query in queries:
+    step = time.perf_counter()
+    retrieve_similar_artworks(query, INDEX_PATH)
+    latencies.append(time.perf_counter() - step)
+seconds = time.perf_counter() - start
+finish({"queries": len(queries), "seconds": round(seconds, 3), "queries_per_s": round(len(queries) / seconds, 1)},
+       latencies)
+"""
+
+ANSWER = PRELUDE + """
+from config.config import INDEX_PATH, LLM_MODEL
+from utils.rag_utils import retrieve_similar_artworks
+from models.llm import stream_llm, build_context_prompt, LLMMetrics
+queries = json.load(open(%(queries)r, encoding="utf-8"))
+retrieve_similar_artworks(queries[0], INDEX_PATH)
+latencies, ttfts, errors = [], [], 0
+start = time.perf_counter()
+for query in queries:
+    step = time.perf_counter()
+    chunks = retrieve_similar_artworks(query, INDEX_PATH)
+    metrics = LLMMetrics(LLM_MODEL, streamed=True)
+    "".join(stream_llm(build_context_prompt(query, chunks), api_url=%(api_url)r, metrics=metrics))
+    latencies.append(time.perf_counter() - step)
+    errors += metrics.error is not None
+    if metrics.ttft is not None:
+        ttfts.append(metrics.ttft + metrics.started_at - step)  # From the question, not from the request
+seconds = time.perf_counter() - start
+finish({"questions": len(queries), "errors": errors, "seconds": round(seconds, 3),
+        "questions_per_s": round(len(queries) / seconds, 2),
+        "ttft_p50_ms": round(float(np.percentile(ttfts, 50)) * 1000, 3) if ttfts else None}, latencies)
+"""
+
+# Metrics compared between reports; lower is better unless listed in HIGHER_IS_BETTER
+COMPARED = ("seconds", "records_per_s", "chunks_per_s", "queries_per_s", "questions_per_s",
+            "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "index_s", "model_s", "peak_rss_mb")
+HIGHER_IS_BETTER = {"records_per_s", "chunks_per_s", "queries_per_s", "questions_per_s"}
+
+
+def sample_questions(corpus_path: str, n: int, seed: int = 0) -> list:
+    """
+    Questions about artworks in the corpus: exact titles (the lexical fast path),
+    artist and medium questions, and free-form descriptions (dense retrieval).
+    """
+    rng = random.Random(seed)
+    records = list(itertools.islice(iter_artwork_records(corpus_path), max(n * 10, 1000)))
+    templates = [
+        lambda r: f"What is '{r['title']}'?",
+        lambda r: f"Tell me about works in {r['medium'].lower()} by {r['artist'] or 'unknown artists'}",
+        lambda r: f"Describe a {r['title'].lower()} from {r['date']}",
+    ]
+    return [rng.choice(templates)(rng.choice(records)) for _ in range(n)]
+
+
+def git_commit() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run_stage(name: str, script: str, workdir: str, env: dict) -> dict:
+    print(f"  {name:<10}", end=" ", flush=True)
+    result = subprocess.run([sys.executable, "-c", script], cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+        print(f"failed: {error}")
+        return {"error": error}
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    print(", ".join(f"{key} {value}" for key, value in stats.items()))
+    return stats
+
+
+def run(args) -> dict:
+    n_records = parse_size(args.records)
+    report = {
+        **git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "records": n_records, "queries": args.queries, "answers": args.answers, "index_type": args.index_type,
+            "embed_workers": args.workers, "batch_size": args.batch_size, "embedding_backend": EMBEDDING_BACKEND,
+            "llm_ttft": args.llm_ttft, "llm_token_delay": args.llm_token_delay,
+        },
+        "stages": {},
+    }
+    server, api_url = start_mock_server(ttft=args.llm_ttft, token_delay=args.llm_token_delay)
+    # The mock accepts any key; the answer cache stays in memory and is bypassed anyway
+    python_path = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "PYTHONPATH": python_path, "GROQ_API_KEY": "benchmark", "ANSWER_CACHE_PATH": ""}
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        corpus = os.path.join(workdir, "corpus.jsonl")
+        start = time.perf_counter()
+        write_corpus(corpus, n_records, args.seed)
+        print(f"Generated {n_records} records in {time.perf_counter() - start:.1f}s; stages:")
+        queries = os.path.join(workdir, "queries.json")
+        answers = os.path.join(workdir, "answers.json")
+        questions = sample_questions(corpus, args.queries, args.seed)
+        with open(queries, "w", encoding="utf-8") as f:
+            json.dump(questions, f)
+        with open(answers, "w", encoding="utf-8") as f:
+            json.dump(questions[:args.answers], f)
+
+        stages = [
+            ("ingest", INGEST % {"corpus": corpus}),
+            ("build", BUILD % {"index_type": args.index_type, "workers": args.workers, "batch_size": args.batch_size,
+                               "build_index": os.path.join(REPO_ROOT, "build_index.py")}),
+            ("cold_load", COLD_LOAD),
+            ("retrieve", RETRIEVE % {"queries": queries}),
+            ("answer", ANSWER % {"queries": answers, "api_url": api_url}),
+        ]
+        for name, script in stages:
+            report["stages"][name] = run_stage(name, script, workdir, env)
+            if "error" in report["stages"][name] and name in ("ingest", "build"):
+                break  # Later stages need the index
+    server.shutdown()
+    return report
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{(before.get('commit') or '?')[:10]} -> {(after.get('commit') or '?')[:10]}")
+    if before.get("config") != after.get("config"):
+        print("⚠️ The reports were run with different settings; see their 'config' sections.")
+    print(f"{'stage':<10} {'metric':<16} {'before':>12} {'after':>12} {'change':>9}")
+    for stage, old in before.get("stages", {}).items():
+        new = after.get("stages", {}).get(stage, {})
+        for metric in COMPARED:
+            if old.get(metric) is None or new.get(metric) is None:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            worse = change < 0 if metric in HIGHER_IS_BETTER else change > 0
+            flag = " ⚠️" if worse and abs(change) >= 0.1 else ""
+            print(f"{stage:<10} {metric:<16} {old[metric]:>12} {new[metric]:>12} {change:>+9.1%}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest, index build, retrieval and answers end to end.")
+    parser.add_argument("--records", default="1k", help="Corpus size, or one of 1k / 100k / 1m")
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries to time")
+    parser.add_argument("--answers", type=int, default=50, help="Questions answered through the mock LLM")
+    parser.add_argument("--index-type", default=INDEX_TYPE, choices=INDEX_TYPES)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Embedding processes for the build")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="Mock LLM seconds before the first token")
+    parser.add_argument("--llm-token-delay", type=float, default=0.02, help="Mock LLM seconds between tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="Where to create the scratch directory")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON report to write")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
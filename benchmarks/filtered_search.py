@@ -0,0 +1,107 @@
+"""
+Latency and completeness of metadata-filtered search at high and low selectivity.
+
+Builds a synthetic corpus with artist, medium and year-range metadata, then for each
+filter compares two strategies on every index family:
+  - pre-filter: resolve the matching row IDs from the filter index, then search only
+    those (exact scoring for small sets, ANN with an ID selector for large ones)
+  - post-filter: plain top-k search, then drop results that fail the filter
+reporting p50/p95 query latency, how often k results come back, and recall@k against
+exact filtered search.
+
+    python -m benchmarks.filtered_search --vectors 100000 --queries 200 --k 3
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from benchmarks.ann_benchmark import synthetic_corpus
+from config.config import FILTER_EXACT_SEARCH_MAX
+from models.index_factory import make_index, configure_search, filtered_search, needs_training
+from models.metadata_filters import MetadataFilter, FilterIndex, build_filter_index
+
+MEDIA = ["Bronze", "Marble", "Oil on canvas", "Terracotta", "Gold", "Limestone, paint", "Ink on paper", "Silk"]
+POST_FILTER_DEPTH = 10  # Post-filtering searches k * this many neighbours before dropping misses
+
+# (label, filter)
+FILTERS = [
+    ("artist (~0.1%)", MetadataFilter(artist="artist 7")),
+    ("bronze before 500 B.C.", MetadataFilter(medium="bronze", year_to=-500)),
+    ("after A.D. 1 (~40%)", MetadataFilter(year_from=1)),
+]
+
+
+def synthetic_metadata(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(-3000, 2000, n)
+    spans = rng.integers(0, 50, n)
+    artists = rng.integers(0, 1000, n)
+    media = rng.integers(0, len(MEDIA), n)
+    return [(row, (f"Artist {artists[row]}", MEDIA[media[row]], (int(starts[row]), int(starts[row] + spans[row]))))
+            for row in range(n)]
+
+
+def timed_queries(search, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query[None, :]))
+        latencies.append(time.perf_counter() - start)
+    return np.percentile(latencies, [50, 95]) * 1000, results
+
+
+def run(n: int, dimension: int, n_queries: int, k: int):
+    corpus, queries = synthetic_corpus(n, dimension, n_queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, "bench_index")
+        build_filter_index(index_path, synthetic_metadata(n), n)
+        filter_index = FilterIndex.load(index_path)
+
+    indexes = []
+    for index_type in ("flat", "hnsw", "ivf"):
+        train = corpus[:50000] if needs_training(index_type) else None
+        index, params = make_index(dimension, index_type, train_vectors=train)
+        index.add_with_ids(corpus, np.arange(n, dtype=np.int64))
+        configure_search(index, params)
+        indexes.append((index_type, index, params))
+
+    print(f"{n} vectors x {dimension} dims, {n_queries} queries, k={k}, "
+          f"exact scoring up to {FILTER_EXACT_SEARCH_MAX} candidates\n")
+    print(f"{'filter':<24} {'matches':>8} {'resolve ms':>10}  {'index':<5} {'strategy':<11} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'full k':>7} {'recall@k':>9}")
+    for label, filters in FILTERS:
+        start = time.perf_counter()
+        candidates = filter_index.candidates(filters)
+        resolve_ms = (time.perf_counter() - start) * 1000
+        allowed = np.zeros(n, dtype=bool)
+        allowed[candidates] = True
+
+        flat_params = indexes[0][2]
+        truth = [filtered_search(indexes[0][1], query[None, :], candidates, k, flat_params, len(candidates))[1][0]
+                 for query in queries]
+
+        for index_type, index, params in indexes:
+            strategies = [
+                ("pre-filter", lambda q: filtered_search(index, q, candidates, k, params, FILTER_EXACT_SEARCH_MAX)[1][0]),
+                ("post-filter", lambda q: [r for r in index.search(q, k * POST_FILTER_DEPTH)[1][0]
+                                           if r >= 0 and allowed[r]][:k]),
+            ]
+            for strategy, search in strategies:
+                (p50, p95), results = timed_queries(search, queries)
+                full = np.mean([len([r for r in result if r >= 0]) >= min(k, len(candidates)) for result in results])
+                recall = np.mean([len(set(result) & set(t[t >= 0])) / max(1, len(t[t >= 0]))
+                                  for result, t in zip(results, truth)])
+                print(f"{label:<24} {len(candidates):>8} {resolve_ms:>10.2f}  {index_type:<5} {strategy:<11} "
+                      f"{p50:>7.2f} {p95:>7.2f} {full:>7.0%} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark metadata-filtered vector search.")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.vectors, args.dim, args.queries, args.k)
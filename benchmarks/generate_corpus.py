@@ -0,0 +1,115 @@
+"""
+Synthetic artwork records shaped like met_scraper.py output, for benchmarks.
+
+Records carry every field the scraper writes (title, artist, date, year_range, medium,
+dimensions, description, url) with the same kinds of values: Met date strings such
+as "ca. 1515–20", "332–30 B.C." or "late 19th century", compound media, anonymous
+antiquities, and a long tail of artists. Output is deterministic for a given seed and
+is streamed to disk, so a million records need no more memory than a thousand.
+
+    python -m benchmarks.generate_corpus --records 100k --output data/bench_artworks.jsonl
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+from typing import Iterator, List
+from models.metadata_filters import parse_year_range
+
+SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+FIRST_NAMES = ["Joachim", "Rosa", "Jean", "Elisabeth", "Paul", "Henri", "Han", "Johann", "Charles", "Samuel",
+               "Fra", "Edouard", "Jules", "Thomas", "Katsushika", "Artemisia", "Utagawa", "Pieter", "Mary", "Winslow"]
+LAST_NAMES = ["Patinir", "Bonheur", "Houdon", "Vigée Le Brun", "Gauguin", "Matisse", "Gan", "Bauer", "Le Brun",
+              "Colt", "Lippi", "Manet", "Bastien-Lepage", "Benton", "Hokusai", "Gentileschi", "Hiroshige",
+              "Bruegel", "Cassatt", "Homer", "Roentgen", "Soseki", "David", "Merisi"]
+SUBJECTS = ["Portrait of a Woman", "Landscape with a River", "Still Life with Flowers", "Statuette of a Goddess",
+            "Stela of a Steward", "Bowl", "Hanging Scroll", "Armchair", "Tapestry", "Madonna and Child",
+            "Head of a Youth", "The Harvesters", "View of a Harbour", "Mask", "Ewer", "Saint Jerome",
+            "Figure of a Horse", "Writing Desk", "Garden Scene", "Funerary Relief"]
+QUALIFIERS = ["", "", "Small ", "Seated ", "Standing ", "Fragment of a ", "Pair of "]
+MEDIA = ["Oil on canvas", "Oil on wood", "Tempera on wood", "Bronze", "White marble", "Limestone, paint",
+         "Glassy faience", "Hanging scroll; ink on paper", "Handscroll; ink and color on silk",
+         "Black chalk, stumped, and white chalk", "Porcelain painted in underglaze blue",
+         "Glass; blown, enameled and gilded", "Terracotta", "Gold, carnelian", "Woodblock print; ink and color on paper",
+         "Carved, painted and gilded linden wood", "Silk, wool; tapestry weave", "Steel, brass, gold, wood (walnut)"]
+DONORS = ["Edward S. Harkness", "Mrs. Charles Wrightsman", "Cornelius Vanderbilt", "Erwin Davis",
+          "Henry G. Marquand", "Mary Stillman Harkness", "Sam A. Lewisohn", "Emma A. Sheafer"]
+CREDITS = ["Gift of {donor}, {year}", "Bequest of {donor}, {year}", "Purchase, {donor} Gift, {year}",
+           "Rogers Fund, {year}", "Fletcher Fund, {year}", "The Dillon Fund Gift, {year}"]
+
+
+def parse_size(text: str) -> int:
+    return SIZES.get(text.lower()) or int(text)
+
+
+def synthetic_date(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.15:
+        start = rng.randint(30, 3000)
+        return f"ca. {start}–{max(1, start - rng.randint(1, 300))} B.C." if rng.random() < 0.5 else f"ca. {start} B.C."
+    if kind < 0.3:
+        part = rng.choice(["early ", "mid-", "late ", "", "early to mid-"])
+        century = rng.randint(1, 20)
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(century if century < 20 else 0, "th")
+        return f"{part}{century}{suffix} century"
+    year = rng.randint(600, 2020)
+    if kind < 0.4:
+        return f"{year // 10 * 10}s"
+    if kind < 0.65:
+        return f"ca. {year}–{(year + rng.randint(1, 9)) % 100:02d}" if year % 100 < 90 else f"ca. {year}"
+    return f"ca. {year}" if kind < 0.8 else str(year)
+
+
+def synthetic_record(object_id: int, rng: random.Random, artists: List[str]) -> dict:
+    date = synthetic_date(rng)
+    title = f"{rng.choice(QUALIFIERS)}{rng.choice(SUBJECTS)}"
+    if rng.random() < 0.3:
+        title += f" {rng.randint(1, 500)}"
+    credit = rng.choice(CREDITS).format(donor=rng.choice(DONORS), year=rng.randint(1870, 2023))
+    return {
+        "title": title,
+        "artist": "" if rng.random() < 0.3 else rng.choice(artists),  # Antiquities are mostly anonymous
+        "date": date,
+        "year_range": parse_year_range(date),
+        "medium": rng.choice(MEDIA),
+        "dimensions": f"H. {rng.randint(2, 300)} cm, W. {rng.randint(2, 300)} cm",
+        "description": credit,
+        "url": f"https://www.metmuseum.org/art/collection/search/{object_id}",
+    }
+
+
+def generate_records(n: int, seed: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed)
+    # A long tail of artists: about one per 20 artworks, named from first x last name pairs
+    names = [f"{first} {last}" for first, last in itertools.product(FIRST_NAMES, LAST_NAMES)]
+    artists = [name if i < len(names) else f"{name} {i // len(names) + 1}"
+               for i, name in zip(range(max(len(names), n // 20)), itertools.cycle(names))]
+    for object_id in range(100000, 100000 + n):
+        yield synthetic_record(object_id, rng, artists)
+
+
+def write_corpus(path: str, n: int, seed: int = 0) -> int:
+    """
+    Writes `n` synthetic records to a JSONL file and returns the number written.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in generate_records(n, seed):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Met-shaped artwork collection.")
+    parser.add_argument("--records", default="1k", help="Number of records, or one of 1k / 100k / 1m")
+    parser.add_argument("--output", default="data/bench_artworks.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    count = write_corpus(args.output, parse_size(args.records), args.seed)
+    print(f"✅ Wrote {count} synthetic artworks to {args.output}")
@@ -0,0 +1,71 @@
+"""
+Scaling curve of multi-process embedding for index builds.
+
+Embeds the same sentences (artwork chunks when the collection is present, otherwise
+generated ones) with 1, 2, 4, ... worker processes and reports throughput in
+sentences/sec, speedup and parallel efficiency against a single worker, and whether
+the merged vectors match the single-worker run row for row. Batches go through
+embed_batches, as in a full build. Model loading is timed separately so the curve
+reflects steady-state encoding. The backend follows
+EMBEDDING_BACKEND.
+
+    python -m benchmarks.parallel_embedding --sentences 20000 --workers 1 2 4 8 --batch-size 256
+"""
+import argparse
+import os
+import time
+import numpy as np
+from config.config import EMBED_BATCH_SIZE, EMBEDDING_BACKEND
+from models.embeddings import embed_batches
+from models.parallel_embedding import EmbeddingPool
+from benchmarks.embedding_backends import sample_sentences
+from utils.pipeline import batched, PipelineStats
+
+
+def embed_all(sentences, workers: int, batch_size: int):
+    """Returns (load seconds, encode seconds, vectors) for one worker count."""
+    items = [(None, text) for text in sentences]
+    if workers <= 1:
+        start = time.perf_counter()
+        list(embed_batches(batched(items[:1], 1), workers=1))  # Load the model outside the timed run
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        vectors = [v for _, v in embed_batches(batched(items, batch_size), workers=1, stats=PipelineStats())]
+        return load, time.perf_counter() - start, np.vstack(vectors)
+
+    with EmbeddingPool(workers) as pool:
+        start = time.perf_counter()
+        # One tiny batch per worker forces every model to load before timing starts
+        list(embed_batches(batched(items[:workers], 1), pool=pool))
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        vectors = [v for _, v in embed_batches(batched(items, batch_size), stats=PipelineStats(), pool=pool)]
+        return load, time.perf_counter() - start, np.vstack(vectors)
+
+
+def run(n_sentences: int, worker_counts, batch_size: int):
+    sentences = sample_sentences(n_sentences)
+    print(f"{len(sentences)} sentences, batch size {batch_size}, backend '{EMBEDDING_BACKEND}', "
+          f"{os.cpu_count()} CPUs\n")
+    print(f"{'workers':>7} {'load s':>7} {'encode s':>9} {'sent/s':>9} {'speedup':>8} {'efficiency':>10} {'max |Δ|':>9}")
+
+    baseline = None
+    for workers in worker_counts:
+        load, seconds, vectors = embed_all(sentences, workers, batch_size)
+        throughput = len(sentences) / seconds
+        if baseline is None:
+            baseline = (throughput, vectors)
+        speedup = throughput / baseline[0]
+        drift = float(np.abs(vectors - baseline[1]).max())
+        print(f"{workers:>7} {load:>7.1f} {seconds:>9.2f} {throughput:>9.1f} {speedup:>7.2f}x "
+              f"{speedup / workers * worker_counts[0]:>10.0%} {drift:>9.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput against worker count.")
+    parser.add_argument("--sentences", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    run(args.sentences, args.workers, args.batch_size)
@@ -0,0 +1,70 @@
+"""
+Load test for the HTTP service (service.py).
+
+Sends questions to a running service from many concurrent clients and reports request
+throughput, p50/p95/p99 latency, and how many requests failed or were shed with 503.
+Repeat questions hit the answer cache, so use --unique to measure the LLM path.
+
+    python service.py &
+    python -m benchmarks.service_load --endpoint retrieve --requests 2000 --concurrency 64
+    python -m benchmarks.service_load --endpoint answer --requests 200 --concurrency 32 --unique
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import aiohttp
+import numpy as np
+from benchmarks.embedding_backends import QUESTIONS
+from config.config import SERVICE_HOST, SERVICE_PORT
+
+ENDPOINTS = ("retrieve", "answer", "answer/stream")
+
+
+async def load_test(url: str, endpoint: str, n_requests: int, concurrency: int, unique: bool) -> dict:
+    questions = itertools.cycle(QUESTIONS)
+    latencies, statuses = [], {}
+    queue: "asyncio.Queue" = asyncio.Queue()
+    for i in range(n_requests):
+        question = next(questions)
+        queue.put_nowait(f"{question} (visit {i})" if unique else question)
+
+    async def client(session: aiohttp.ClientSession):
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{url}/{endpoint}", json={"query": question}) as response:
+                    await response.read()  # For streams, the whole answer
+                    status = response.status
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {"requests": n_requests, "seconds": seconds, "requests_per_s": n_requests / seconds,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "statuses": statuses}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the docent HTTP service.")
+    parser.add_argument("--url", default=f"http://{SERVICE_HOST}:{SERVICE_PORT}")
+    parser.add_argument("--endpoint", default="retrieve", choices=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--unique", action="store_true", help="Make every question distinct (no cache hits)")
+    args = parser.parse_args()
+
+    result = asyncio.run(load_test(args.url, args.endpoint, args.requests, args.concurrency, args.unique))
+    print(f"{args.endpoint}: {result['requests']} requests, concurrency {args.concurrency}, "
+          f"{result['seconds']:.1f}s")
+    print(f"  {result['requests_per_s']:.1f} req/s · p50 {result['p50_ms']:.1f} ms · "
+          f"p95 {result['p95_ms']:.1f} ms · p99 {result['p99_ms']:.1f} ms")
+    print(f"  responses: {', '.join(f'{status} x{count}' for status, count in sorted(result['statuses'].items(), key=str))}")
@@ -0,0 +1,94 @@
+"""
+Latency of scatter-gather search over a sharded index against one unsharded index.
+
+Partitions the same synthetic corpus into each shard count below by hash of object
+ID (as `build_index.py --shards` does), then searches it one query at a time through
+ShardedIndex with shard worker processes and with in-process threads. Reports p50/p99
+query latency, the mean latency fan-out adds on top of the slowest shard's own search,
+and agreement@k with the unsharded index (the share of its top-k the merge returns).
+
+    python -m benchmarks.sharded_search --vectors 200000 --queries 500 --shards 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+from benchmarks.ann_benchmark import synthetic_corpus, recall_at_k
+from models.chunk_store import ChunkStoreWriter
+from models.embeddings import write_index
+from models.index_factory import make_index, save_index_params
+from models.index_shards import shard_for, shard_index_path, write_shard_layout
+from utils.scatter_gather import ShardedIndex
+
+
+def write_shards(index_path: str, corpus: np.ndarray, count: int):
+    """
+    Saves each shard as an unversioned index whose chunks name their object IDs.
+    """
+    shard_of = np.array([shard_for(str(object_id), count) for object_id in range(len(corpus))])
+    for shard in range(count):
+        object_ids = np.flatnonzero(shard_of == shard)
+        path = shard_index_path(index_path, shard)
+        index, params = make_index(corpus.shape[1], "flat")
+        index.add_with_ids(corpus[object_ids], np.arange(len(object_ids), dtype=np.int64))
+        write_index(index, path)
+        save_index_params(path, params)
+        with ChunkStoreWriter(path) as writer:
+            writer.write(str(object_id) for object_id in object_ids)
+    write_shard_layout(index_path, count, "id", list(range(count)))
+
+
+def measure(sharded: ShardedIndex, queries: np.ndarray, k: int):
+    latencies, fanouts = np.empty(len(queries)), np.empty(len(queries))
+    found = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        chunks = sharded.search([""], query[None, :], k, max_distance=None)[0]
+        latencies[i] = time.perf_counter() - start
+        fanouts[i] = sharded.last_fanout_seconds
+        found[i, :len(chunks)] = [int(chunk) for chunk in chunks]
+    return latencies, fanouts, found
+
+
+def run(n: int, dimension: int, n_queries: int, k: int, shard_counts):
+    corpus, queries = synthetic_corpus(n, dimension, n_queries)
+    exact = faiss.IndexFlatL2(dimension)
+    exact.add(corpus)
+    _, truth = exact.search(queries, k)
+
+    print(f"{n} vectors x {dimension} dims, {n_queries} queries, k={k}, {os.cpu_count()} CPUs\n")
+    print(f"{'configuration':<22} {'p50 (ms)':>9} {'p99 (ms)':>9} {'fan-out (ms)':>13} {f'agree@{k}':>9}")
+
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        exact.search(query[None, :], k)
+    print(f"{'unsharded in-process':<22} {(time.perf_counter() - start) / n_queries * 1000:>9.3f} (mean)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in shard_counts:
+            index_path = os.path.join(tmp, f"index{count}")
+            write_shards(index_path, corpus, count)
+            layout = {"count": count, "key": "id", "shards": list(range(count))}
+            for workers in ("thread", "process"):
+                sharded = ShardedIndex(index_path, layout, workers=workers, timeout=30.0)
+                sharded.warm_up()
+                measure(sharded, queries[:10], k)  # Warm the pipes and page cache
+                latencies, fanouts, found = measure(sharded, queries, k)
+                sharded.close()
+                print(f"{f'{count} shards, {workers}':<22} {np.percentile(latencies, 50) * 1000:>9.3f} "
+                      f"{np.percentile(latencies, 99) * 1000:>9.3f} {fanouts.mean() * 1000:>13.3f} "
+                      f"{recall_at_k(found, truth):>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare scatter-gather search over index shards.")
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 produces 384-dim embeddings")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    run(args.vectors, args.dim, args.queries, args.k, args.shards)
@@ -0,0 +1,72 @@
+"""
+Resident memory per worker as the number of app processes grows, with the index
+loaded into each process versus memory-mapped and shared (SHARED_INDEX=true).
+
+Each worker opens the same index file, runs a few searches so every vector page is
+touched, and reports RSS (pages resident in this process), USS (pages only this
+process holds) and PSS (shared pages split evenly across the processes using them).
+
+    python -m benchmarks.shared_index_memory --vectors 200000 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import faiss
+import numpy as np
+import psutil
+from models.index_factory import make_index, read_index_file
+
+
+def worker(index_path: str, mmap: bool, queries: np.ndarray, barrier, results):
+    index = read_index_file(index_path, mmap=mmap)
+    index.search(queries, 5)  # Flat search reads every vector
+    barrier.wait()  # Measure while all workers hold the index
+    info = psutil.Process().memory_full_info()
+    results.put((info.rss, info.uss, info.pss))
+    barrier.wait()
+
+
+def measure(index_path: str, mmap: bool, workers: int, queries: np.ndarray):
+    ctx = mp.get_context("spawn")  # No fork: pages must not be shared by copy-on-write
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(index_path, mmap, queries, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return np.mean(samples, axis=0) / 2**20
+
+
+def run(n: int, dimension: int, worker_counts):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dimension)).astype(np.float32)
+    queries = vectors[:8].copy()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, "bench_index")
+        index, _ = make_index(dimension, "flat")
+        index.add_with_ids(vectors, np.arange(n, dtype=np.int64))
+        faiss.write_index(index, f"{index_path}.index")
+        del index, vectors
+        size_mb = os.path.getsize(f"{index_path}.index") / 2**20
+
+        print(f"Flat index: {n} vectors x {dimension} dims, {size_mb:.0f} MB on disk\n")
+        print(f"{'mode':<8} {'workers':>8} {'RSS/worker':>11} {'USS/worker':>11} {'PSS/worker':>11} {'total PSS':>10}   (MB)")
+        for mmap in (False, True):
+            for workers in worker_counts:
+                rss, uss, pss = measure(index_path, mmap, workers, queries)
+                print(f"{'mmap' if mmap else 'private':<8} {workers:>8} {rss:>11.0f} {uss:>11.0f} {pss:>11.0f} {pss * workers:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure per-worker memory for private vs shared indexes.")
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    run(args.vectors, args.dim, args.workers)
@@ -0,0 +1,98 @@
+"""
+Import-time and cold-start report.
+
+Every measurement runs in a fresh interpreter without GROQ_API_KEY, the way the
+index-build tooling is run:
+  - wall-clock import time of each entry-point module, plus the slowest imports
+    underneath utils.rag_utils according to `python -X importtime`
+  - cold start: loading the embedding model, opening the index, first query embedding
+  - time until the app could render versus until it could answer, with background warm-up
+
+    python -m benchmarks.startup_report
+"""
+import json
+import os
+import subprocess
+import sys
+from config.config import INDEX_PATH
+
+MODULES = ["config.config", "models.embeddings", "utils.rag_utils", "models.llm", "build_index"]
+
+COLD_START = """
+import json, time
+start = time.perf_counter()
+timings = {}
+from models.embeddings import get_model, load_faiss_index, embed_query
+from models.index_manifest import resolve_index_path
+timings["import models.embeddings"] = time.perf_counter() - start
+step = time.perf_counter()
+get_model()
+timings["load embedding model"] = time.perf_counter() - step
+step = time.perf_counter()
+try:
+    load_faiss_index(resolve_index_path(%(index_path)r)[1])
+    timings["open index + chunk store"] = time.perf_counter() - step
+except FileNotFoundError:
+    timings["open index + chunk store"] = None
+step = time.perf_counter()
+embed_query("What is The Starry Night?")
+timings["first query embedding"] = time.perf_counter() - step
+timings["total"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+WARM_UP = """
+import json, time
+start = time.perf_counter()
+from utils.rag_utils import retrieve_similar_artworks
+from models.llm import generate_llm
+from models.embeddings import warm_up, get_model
+thread = warm_up(%(index_path)r)
+page_ready = time.perf_counter() - start
+thread.join()
+print(json.dumps({"page can render": page_ready, "model + index ready": time.perf_counter() - start}))
+"""
+
+
+def run_python(args, env):
+    result = subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return result
+
+
+def main():
+    env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+
+    print("Import time (fresh interpreter, no GROQ_API_KEY)")
+    for module in MODULES:
+        code = f"import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+        try:
+            seconds = float(run_python(["-c", code], env).stdout.strip().splitlines()[-1])
+            print(f"  {module:<22} {seconds * 1000:>9.1f} ms")
+        except RuntimeError as e:
+            print(f"  {module:<22} failed: {e}")
+
+    print("\nSlowest imports under utils.rag_utils (cumulative)")
+    stderr = run_python(["-X", "importtime", "-c", "import utils.rag_utils"], env).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    for micros, name in sorted(rows, reverse=True)[:8]:
+        print(f"  {name.strip():<40} {micros / 1000:>9.1f} ms")
+
+    for title, script in (("Cold start", COLD_START), ("Background warm-up", WARM_UP)):
+        print(f"\n{title}")
+        try:
+            timings = json.loads(run_python(["-c", script % {"index_path": INDEX_PATH}], env).stdout.strip().splitlines()[-1])
+        except RuntimeError as e:
+            print(f"  failed: {e}")
+            continue
+        for label, seconds in timings.items():
+            print(f"  {label:<28} " + ("skipped (no index)" if seconds is None else f"{seconds * 1000:>9.1f} ms"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Index size / load time / latency / agreement for the vector metric and storage options.
+
+Builds each configuration below over the same synthetic corpus and compares it with
+the current default, a float32 L2 flat index: bytes on disk, time to load the file,
+single-query p50/p99 latency, and agreement@k (the share of the baseline's top-k that
+each configuration also returns). A second agreement column compares with exact cosine
+search, isolating what compressed storage and HNSW lose from what the metric changes.
+
+The corpus vectors are given norms between 0.8 and 1.2, as a model without a final
+normalisation layer would produce; all-MiniLM-L6-v2 through sentence-transformers emits
+unit vectors, on which L2 and cosine rank identically and only storage changes results.
+
+    python -m benchmarks.vector_storage --vectors 100000 --queries 1000 --k 10
+"""
+import argparse
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+from benchmarks.ann_benchmark import synthetic_corpus, recall_at_k
+from models.index_factory import make_index, needs_training, prepare_vectors, read_index_file
+
+# (label, index type, parameter overrides); the first is the baseline, the second exact cosine
+CONFIGURATIONS = [
+    ("flat l2 float32", "flat", {"metric": "l2", "storage": "float32"}),
+    ("flat cosine float32", "flat", {"metric": "cosine", "storage": "float32"}),
+    ("flat cosine float16", "flat", {"metric": "cosine", "storage": "float16"}),
+    ("flat cosine sq8", "flat", {"metric": "cosine", "storage": "sq8"}),
+    ("hnsw cosine float32", "hnsw", {"metric": "cosine", "storage": "float32"}),
+    ("hnsw cosine float16", "hnsw", {"metric": "cosine", "storage": "float16"}),
+    ("hnsw cosine sq8", "hnsw", {"metric": "cosine", "storage": "sq8"}),
+]
+
+
+def run(n: int, dimension: int, n_queries: int, k: int, load_repeats: int = 5):
+    corpus, queries = synthetic_corpus(n, dimension, n_queries)
+    rng = np.random.default_rng(1)
+    corpus *= rng.uniform(0.8, 1.2, (n, 1)).astype(np.float32)
+    ids = np.arange(n, dtype=np.int64)
+    baseline = exact_cosine = None
+
+    print(f"{n} vectors x {dimension} dims, {n_queries} queries, k={k}, {faiss.omp_get_max_threads()} threads\n")
+    print(f"{'configuration':<22} {'size (MB)':>10} {'load (ms)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{f'agree@{k}':>9} {'vs cosine':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, index_type, overrides in CONFIGURATIONS:
+            train = corpus[:50000] if needs_training(index_type, overrides["storage"]) else None
+            index, params = make_index(dimension, index_type, overrides, train_vectors=train)
+            index.add_with_ids(prepare_vectors(index, corpus), ids)
+            path = os.path.join(tmp, label.replace(" ", "_"))
+            faiss.write_index(index, f"{path}.index")
+            size_mb = os.path.getsize(f"{path}.index") / 1e6
+
+            load_seconds = []
+            for _ in range(load_repeats):
+                start = time.perf_counter()
+                loaded = read_index_file(path)
+                load_seconds.append(time.perf_counter() - start)
+                del loaded
+
+            prepared = prepare_vectors(index, queries)
+            latencies = np.empty(n_queries)
+            found = np.empty((n_queries, k), dtype=np.int64)
+            for i in range(n_queries):
+                start = time.perf_counter()
+                _, found[i] = index.search(prepared[i:i + 1], k)
+                latencies[i] = time.perf_counter() - start
+
+            if baseline is None:
+                baseline = found.copy()
+            elif exact_cosine is None:
+                exact_cosine = found.copy()
+            print(f"{label:<22} {size_mb:>10.1f} {np.median(load_seconds) * 1000:>10.1f} "
+                  f"{np.percentile(latencies, 50) * 1000:>9.3f} {np.percentile(latencies, 99) * 1000:>9.3f} "
+                  f"{recall_at_k(found, baseline):>9.3f} "
+                  f"{recall_at_k(found, exact_cosine) if exact_cosine is not None else float('nan'):>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vector metrics and storage encodings for the FAISS index.")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 produces 384-dim embeddings")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    run(args.vectors, args.dim, args.queries, args.k)
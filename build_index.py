@@ -1,28 +1,283 @@
+import argparse
+import json
 import os
-from utils.rag_utils import load_artwork_chunks
-from models.embeddings import build_faiss_index
-from config.config import ARTWORK_DATA_PATH, INDEX_PATH
+import time
+from utils.rag_utils import iter_artwork_records, format_artwork_chunk
+from utils.pipeline import PipelineStats
+from utils.ingest_checkpoint import artwork_id, delta_manifest_path
+from models.embeddings import build_faiss_index_streaming, load_id_map, open_embedding_store
+from models.lexical_index import build_lexical_index, lexical_index_path, update_lexical_index
+from models.metadata_filters import build_filter_index, filter_index_path, record_filter_fields, update_filter_index
+from models.chunk_store import chunk_store_path
+from models.index_factory import INDEX_TYPES, METRICS, VECTOR_STORAGE
+from models.index_manifest import new_generation, discard_generation, publish, resolve_index_path, manifest_path
+from models.index_shards import (
+    shard_for, shard_index_path, shards_path, read_shard_layout, write_shard_layout, remove_shard_layout,
+)
+from config.config import (
+    ARTWORK_DATA_PATH, INDEX_PATH, EMBED_BATCH_SIZE, EMBED_WORKERS, INDEX_TYPE, INDEX_PARAMS, EMBEDDING_STORE_GC,
+    INDEX_SHARDS, SHARD_KEY,
+)
 
-def main():
+def main(index_type=INDEX_TYPE, workers=EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE, metric=INDEX_PARAMS["metric"],
+         storage=INDEX_PARAMS["storage"], shards=INDEX_SHARDS, shard_key=SHARD_KEY):
     """
-    Main function to load data, build, and save the FAISS index.
+    Main function to stream artwork data into the FAISS index and save it.
+    Records flow through reader -> formatter -> embedding batches -> index.add ->
+    chunk store writer, so memory stays flat regardless of the collection size.
+    With `workers` > 1 the embedding batches are spread over that many processes.
+    Chunks whose text was embedded by an earlier build come from the embedding store.
+    With `shards` > 1 the collection is partitioned by `shard_key` and each shard is
+    built and published as an index of its own; the layout is recorded once all are.
     """
     if not os.path.exists(ARTWORK_DATA_PATH):
         print(f"Artwork data file not found at: {ARTWORK_DATA_PATH}")
         print("Please run 'python met_scraper.py' first to generate it.")
         return
 
-    print("Loading artwork data...")
-    chunks = load_artwork_chunks(ARTWORK_DATA_PATH)
+    store = open_embedding_store()
+    print(f"Streaming artwork data into a '{index_type}' FAISS index of {storage} vectors by {metric} "
+          f"(batch size {batch_size}, {workers} embedding worker{'s' if workers != 1 else ''}"
+          f"{f', {shards} shards by {shard_key}' if shards > 1 else ''})...")
+    build = dict(index_type=index_type, workers=workers, batch_size=batch_size, metric=metric, storage=storage,
+                 store=store)
+    if shards > 1:
+        built = []
+        for shard in range(shards):
+            print(f"\nShard {shard}:")
+            if build_generation(shard_index_path(INDEX_PATH, shard),
+                                belongs=lambda data, shard=shard: shard_of(data, shards, shard_key) == shard, **build):
+                built.append(shard)
+        if not built:
+            return
+        write_shard_layout(INDEX_PATH, shards, shard_key, built)
+        print(f"\nShard layout ({len(built)} of {shards} shards) saved to '{shards_path(INDEX_PATH)}'")
+    else:
+        if not build_generation(INDEX_PATH, **build):
+            return
+        remove_shard_layout(INDEX_PATH)
 
-    if not chunks:
-        print("No chunks were loaded. Please check the content of your .jsonl file.")
+    if store is not None:
+        removed = store.collect_garbage() if EMBEDDING_STORE_GC else 0
+        store.save()
+        print(store.summary() + (f", {removed} unused removed" if removed else ""))
+
+def shard_of(data: dict, count: int, key: str) -> int:
+    """
+    The shard an artwork record belongs to when partitioning `count` ways by `key`.
+    """
+    value = artwork_id(data) if key == "id" else str(data.get(key) or "")
+    return shard_for(value, count)
+
+def build_generation(index_path, index_type, workers, batch_size, metric, storage, store, belongs=None) -> int:
+    """
+    Builds the artworks accepted by `belongs` (all by default) into a new generation of
+    the index at `index_path` and publishes it. Returns the number of chunks indexed.
+    """
+    stats = PipelineStats()
+    records = iter_artwork_records(ARTWORK_DATA_PATH)
+    records = stats.timed("read", records if belongs is None else filter(belongs, records))
+    items = stats.timed("format", ((artwork_id(data), format_artwork_chunk(data)) for data in records))
+
+    version, path = new_generation(index_path)
+    try:
+        index, total = build_faiss_index_streaming(items, index_path=path, batch_size=batch_size,
+                                                   stats=stats, index_type=index_type, workers=workers, store=store,
+                                                   index_params={"metric": metric, "storage": storage})
+    except BaseException:
+        discard_generation(path)
+        raise
+
+    if not total:
+        discard_generation(path)
+        if belongs is None:
+            print("No chunks were loaded. Please check the content of your .jsonl file.")
+        else:
+            print("No artworks fall in this shard.")
+        return 0
+
+    start = time.perf_counter()
+    indexed = rebuild_lexical_index(path)
+    stats.add("lexical", indexed, time.perf_counter() - start)
+    start = time.perf_counter()
+    filtered = rebuild_filter_index(path)
+    stats.add("filters", filtered, time.perf_counter() - start)
+    publish(index_path, version, path)
+
+    print(stats.report())
+    print(f"FAISS index with {total} chunks saved to '{path}.index' and '{chunk_store_path(path)}'")
+    print(f"Lexical index over {indexed} artworks saved to '{lexical_index_path(path)}'")
+    print(f"Metadata filters over {filtered} artworks saved to '{filter_index_path(path)}'")
+    print(f"Published index version {version} in '{manifest_path(index_path)}'")
+    return total
+
+def rebuild_lexical_index(index_path: str) -> int:
+    """
+    Rebuilds the BM25 / exact-name index from the saved chunk store, leaving out
+    tombstoned rows, so it always matches the FAISS index row for row.
+    """
+    id_map = load_id_map(index_path) or {}
+    return build_lexical_index(index_path, skip_rows=id_map.get("tombstones", ()))
+
+def rebuild_filter_index(index_path: str) -> int:
+    """
+    Rebuilds the artist / medium / year-range filter columns from the artwork records,
+    placing each record at the live index row its artwork ID maps to.
+    """
+    id_map = load_id_map(index_path)
+    rows = id_map["rows"]
+    fields = {}
+    for data in iter_artwork_records(ARTWORK_DATA_PATH):
+        row = rows.get(artwork_id(data))
+        if row is not None:
+            fields[row] = record_filter_fields(data)  # A later duplicate wins, as in the index
+    return build_filter_index(index_path, fields.items(), id_map["next_row"])
+
+def update(delete_ids=(), compact=False):
+    """
+    Applies the scraper's delta manifest (added and changed artworks) and any explicit
+    deletions to a new generation of the published index, embedding only the affected
+    artworks, then publishes it. A sharded index is updated shard by shard, each taking
+    the delta's artworks that partition to it.
+    """
+    delta_path = delta_manifest_path(ARTWORK_DATA_PATH)
+    delta = None
+    if os.path.exists(delta_path):
+        with open(delta_path, "r", encoding="utf-8") as f:
+            delta = json.load(f)
+    records = delta_records(delta) if delta else []
+
+    layout = read_shard_layout(INDEX_PATH)
+    if layout is None:
+        update_index(INDEX_PATH, delta, records, delta_path, delete_ids, compact)
         return
+    by_shard = {shard: [] for shard in layout["shards"]}
+    for key, data in records:
+        by_shard.get(shard_of(data, layout["count"], layout["key"]), []).append((key, data))
+    for shard in layout["shards"]:
+        print(f"Shard {shard}:")
+        update_index(shard_index_path(INDEX_PATH, shard), delta, by_shard[shard], delta_path, delete_ids, compact)
+    missing = sorted(set(range(layout["count"])) - set(layout["shards"]))
+    if delta and missing:
+        print(f"Artworks partitioned to shards {missing}, which had none at build time, are skipped until "
+              f"the next full build.")
+
+def delta_records(delta: dict) -> list:
+    """
+    The delta's added and changed artworks as (artwork_id, record) pairs. Manifests
+    carry the records themselves; the artwork data file is only read for those of
+    manifests written before they did.
+    """
+    records = dict(delta.get("records") or {})
+    missing = (set(delta["added"]) | set(delta["changed"])) - set(records)
+    if missing:
+        for data in iter_artwork_records(ARTWORK_DATA_PATH):
+            if artwork_id(data) in missing:
+                records[artwork_id(data)] = data  # A later duplicate wins, as in the index
+    return list(records.items())
+
+def update_index(index_path, delta, records, delta_path, delete_ids=(), compact=False):
+    """
+    Updates the index at `index_path` with `records`, the (artwork_id, record) pairs of
+    `delta` that belong to it, and `delete_ids`. The new generation starts as hard links
+    to the current one and the lexical and filter sidecars are patched for the affected
+    rows only, so the cost follows the size of the change; a compaction renumbers every
+    row, so it rebuilds them.
+    """
+    from models.index_updates import IncrementalIndex
+
+    _, current = resolve_index_path(index_path)
+    version, path = new_generation(index_path, copy_from=current)
+    try:
+        incremental = IncrementalIndex(path)
+        first_row = incremental.id_map["next_row"]
+        first_tombstone = len(incremental.id_map["tombstones"])
+        changed = False
+        if delta and incremental.id_map.get("applied_delta") == delta["completed"]:
+            print(f"Delta from '{delta_path}' was already applied.")
+        elif delta:
+            items = ((key, format_artwork_chunk(data)) for key, data in records)
+            store = open_embedding_store()
+            added, replaced = incremental.upsert(items, store=store)
+            if store is not None:
+                store.save()
+                print(store.summary())
+            incremental.id_map["applied_delta"] = delta["completed"]
+            changed = True
+            print(f"Applied delta from '{delta_path}': {added} added, {replaced} replaced.")
+        else:
+            print(f"No delta manifest found at '{delta_path}'; nothing to add.")
+
+        if delete_ids:
+            deleted = incremental.delete(delete_ids)
+            print(f"Deleted {deleted} artworks.")
+            changed = changed or deleted > 0
+
+        if not changed and not compact:
+            discard_generation(path)
+            print("Index unchanged; nothing to publish.")
+            return
+        incremental.save()
+        compacted = compact
+        if compact:
+            incremental.compact()
+            print("Index compacted.")
+        elif incremental.maybe_compact():
+            compacted = True
+            print("Tombstones exceeded the compaction threshold; index compacted.")
+        if compacted:
+            rebuild_lexical_index(path)
+            rebuild_filter_index(path)
+        else:
+            patch_sidecars(path, incremental.id_map, records, first_row, first_tombstone)
+    except BaseException:
+        discard_generation(path)
+        raise
+    publish(index_path, version, path)
+    print(f"Index now holds {incremental.live_count} live artworks; published version {version}.")
 
-    print(f"Building FAISS index from {len(chunks)} chunks...")
-    build_faiss_index(chunks, index_path=INDEX_PATH)
+def patch_sidecars(index_path, id_map, records, first_row, first_tombstone):
+    """
+    Brings the lexical and filter sidecars up to date with an update that appended the
+    rows from `first_row` on and added the tombstones from `first_tombstone` on, using
+    only those rows' chunks and `records`. A sidecar the index was saved without is
+    built in full instead.
+    """
+    dead = set(id_map["tombstones"][first_tombstone:])
+    added = [row for row in range(first_row, id_map["next_row"]) if row not in dead]
+    removed = [row for row in dead if row < first_row]
 
-    print(f"FAISS index and chunks saved to '{INDEX_PATH}.index' and '{INDEX_PATH}_chunks.pkl'")
+    if os.path.exists(lexical_index_path(index_path)):
+        update_lexical_index(index_path, added, removed)
+    else:
+        rebuild_lexical_index(index_path)
+
+    if os.path.exists(filter_index_path(index_path)):
+        rows, fresh = id_map["rows"], set(added)
+        fields = {rows[key]: record_filter_fields(data) for key, data in records if rows.get(key) in fresh}
+        update_filter_index(index_path, fields.items(), removed, id_map["next_row"])
+    else:
+        rebuild_filter_index(index_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build or update the FAISS index of artworks.")
+    parser.add_argument("--index-type", default=INDEX_TYPE, choices=INDEX_TYPES, help="Index family for a full build")
+    parser.add_argument("--metric", default=INDEX_PARAMS["metric"], choices=METRICS,
+                        help="Vector similarity for a full build")
+    parser.add_argument("--storage", default=INDEX_PARAMS["storage"], choices=VECTOR_STORAGE,
+                        help="Vector encoding for a full build")
+    parser.add_argument("--shards", type=int, default=INDEX_SHARDS, help="Partitions for a full build; 1 = one index")
+    parser.add_argument("--shard-key", default=SHARD_KEY,
+                        help="'id' to spread artworks by object ID, or a record field to group them by")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Embedding processes for a full build")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    parser.add_argument("--update", action="store_true", help="Apply the latest scrape delta instead of rebuilding")
+    parser.add_argument("--delete", nargs="+", default=[], metavar="ID", help="Artwork IDs to remove (implies --update)")
+    parser.add_argument("--compact", action="store_true", help="Reclaim tombstoned rows (implies --update)")
+    args = parser.parse_args()
+
+    if args.update or args.delete or args.compact:
+        update(delete_ids=args.delete, compact=args.compact)
+    else:
+        main(index_type=args.index_type, workers=args.workers, batch_size=args.batch_size, metric=args.metric,
+             storage=args.storage, shards=args.shards, shard_key=args.shard_key)
@@ -5,10 +5,21 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Groq API Key
+# Only the LLM call needs it, so index builds and tooling run without one.
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY is not set in environment variables or .env file.")
+def require_groq_api_key() -> str:
+    if not GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY is not set in environment variables or .env file.")
+    return GROQ_API_KEY
+
+# LLM API
+# Any OpenAI-compatible chat completions endpoint; point it at models/mock_llm_server.py to test offline
+LLM_API_URL = os.getenv("LLM_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+LLM_STREAMING = True       # Render answers token by token as they arrive
+LLM_CONNECT_TIMEOUT = 5.0  # Seconds to establish a connection
+LLM_READ_TIMEOUT = 60.0    # Seconds to wait between bytes (streaming) or for the whole answer
+LLM_POOL_SIZE = 10         # Keep-alive connections held open to the endpoint
 
 # File Paths
 INDEX_PATH = "faiss_index"
@@ -16,4 +27,118 @@ ARTWORK_DATA_PATH = "data/met_artworks.jsonl"
 
 # Model Names
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-LLM_MODEL = "llama3-8b-8192"
\ No newline at end of file
+LLM_MODEL = "llama3-8b-8192"
+
+# Embedding Backend
+# "torch" (reference), "onnx" (ONNX Runtime) or "onnx-int8" (dynamically quantized ONNX).
+# Vectors from the ONNX backends drift slightly from the reference; check with
+# `python -m benchmarks.embedding_backends` before serving queries against an index
+# built with a different backend.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # CPU threads per encode call; 0 = library default
+ONNX_MODEL_DIR = "onnx_models"  # Exported ONNX models, created on first use
+INT8_QUANTIZATION = "avx2"      # Target CPU for int8: "arm64", "avx2", "avx512" or "avx512_vnni"
+
+# Index Build
+EMBED_BATCH_SIZE = 256  # Chunks encoded and added to the index per step; bounds build memory
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # Embedding processes for full builds; 1 = in-process
+COMPACTION_THRESHOLD = 0.2  # Compact after an update once this fraction of index rows is tombstoned
+
+# Embedding Store
+# Chunk embeddings are cached on disk by a hash of (text, model, backend), so a rebuild only
+# encodes new or changed artworks. Set EMBEDDING_STORE_PATH= (empty) to always re-encode.
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "embedding_store") or None
+EMBEDDING_STORE_GC = True  # After a full build, drop cached embeddings of chunks no longer in the collection
+
+# Index Versions
+# Builds and updates write a new generation under faiss_index_versions/ and publish it by
+# atomically rewriting faiss_index_manifest.json; running apps pick it up without a restart.
+INDEX_KEEP_GENERATIONS = 3   # Published generations kept on disk, for rollback and slow readers
+INDEX_RELOAD_INTERVAL = 5.0  # Seconds between checks of the manifest while serving; 0 = never reload
+
+# Index Shards
+# With INDEX_SHARDS > 1 a full build partitions the collection into that many independent
+# indexes (faiss_index_shard0, ...); queries fan out to every shard in parallel and the
+# per-shard top-k are merged. Running apps switch between sharded and not on their own,
+# checking faiss_index_shards.json every INDEX_RELOAD_INTERVAL seconds.
+INDEX_SHARDS = int(os.getenv("INDEX_SHARDS", "1"))
+SHARD_KEY = "id"  # "id" spreads artworks by object ID; a record field (e.g. "department") keeps each value together
+# "process": each shard is searched by its own worker process, queries and results crossing
+# the process boundary as they would cross the network to a remote node; "thread": in-process
+SHARD_WORKERS = os.getenv("SHARD_WORKERS", "process")
+SHARD_TIMEOUT = 2.0  # Seconds to wait for a shard; results from slower shards are left out
+
+# Vector Index
+# Set SHARED_INDEX=true when running several app processes: each one memory-maps the
+# index read-only, so they all share a single physical copy of the vectors.
+SHARED_INDEX = os.getenv("SHARED_INDEX", "false").lower() == "true"
+INDEX_TYPE = "flat"  # One of "flat", "ivf", "hnsw", "ivfpq"
+INDEX_PARAMS = {
+    "metric": "l2",          # "l2", or "cosine": unit-normalised vectors searched by inner product
+    "storage": "float32",    # "float32", "float16" (half the memory) or "sq8" (8-bit scalar quantized, a quarter)
+    "nlist": 1024,           # IVF: number of inverted lists (clamped for small collections)
+    "nprobe": 16,            # IVF: lists scanned per query
+    "hnsw_m": 32,            # HNSW: graph neighbours per node
+    "ef_construction": 200,  # HNSW: build-time search depth
+    "ef_search": 64,         # HNSW: query-time search depth
+    "pq_m": 48,              # IVF-PQ: sub-quantizers per vector (must divide the embedding dimension)
+    "pq_nbits": 8,           # IVF-PQ: bits per sub-quantizer code
+    "train_size": 50000,     # IVF: vectors buffered for training during a streaming build
+}
+
+# Query Embedding Cache
+QUERY_CACHE_SIZE = 4096  # Query embeddings kept in memory (LRU)
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")  # Optional SQLite file for a persistent tier, e.g. query_cache.sqlite
+
+# LLM Answer Cache
+# Answers are reused for the same question, retrieved context, mode, model and prompt
+# version, and dropped whenever the index is rebuilt. Set ANSWER_CACHE_PATH= (empty)
+# to keep the cache in memory only.
+ANSWER_CACHE_SIZE = 1024                # Answers kept in memory (LRU)
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite") or None
+ANSWER_CACHE_DISK_SIZE = 50000          # Answers kept in the SQLite tier (least recently used evicted)
+ANSWER_CACHE_TTL = 7 * 24 * 3600        # Seconds before a cached answer is regenerated; 0 = never
+
+# Hybrid Retrieval
+# A BM25 index over title, artist and medium is built next to the FAISS index.
+HYBRID_RETRIEVAL = True       # Fuse BM25 and dense rankings with reciprocal rank fusion
+EXACT_MATCH_FAST_PATH = True  # Answer questions naming an exact title or artist without embedding
+HYBRID_CANDIDATES = 20        # Candidates taken from each retriever before fusion
+RRF_K = 60                    # Reciprocal rank fusion damping constant
+
+# Metadata Filters
+# Filtered searches over at most this many matching artworks score them exactly;
+# larger matching sets use the ANN index with an ID selector.
+FILTER_EXACT_SEARCH_MAX = 4096
+
+# Context Assembly
+# Retrieved chunks are compacted, de-duplicated and packed into a token budget before
+# they go into the prompt; fewer prompt tokens mean a faster first token and a lower bill.
+CONTEXT_TOKEN_BUDGET = 800           # Estimated prompt tokens for artwork context; None = no limit
+CONTEXT_MAX_DISTANCE = 1.4           # Squared L2 past which dense hits are dropped (cosine < 0.3); None = keep all
+CONTEXT_MIN_LEXICAL_SCORE = 0.4      # Normalised BM25 score (1 ~ every query term matched) at or below which BM25 hits are dropped
+CONTEXT_DUPLICATE_SIMILARITY = 0.9   # Word overlap (Jaccard) at which a lower-ranked chunk counts as a duplicate
+CHARS_PER_TOKEN = 4                  # For estimating LLM tokens without the model's tokenizer
+
+# Retrieval Micro-Batching
+RETRIEVAL_MICRO_BATCHING = True  # Coalesce concurrent sessions' queries into one encode + one search call
+RETRIEVAL_MAX_BATCH = 32         # Largest batch dispatched at once
+RETRIEVAL_BATCH_WAIT_MS = 2.0    # How long the first query waits for others; 0 adds no idle latency
+
+# HTTP Service
+# Headless API over retrieval and answers (python service.py), independent of Streamlit
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "4"))  # Threads for embedding and search; queries micro-batch across them
+SERVICE_MAX_PENDING = 64  # Retrievals queued or running before new requests are refused with 503
+SERVICE_LLM_CONNECTIONS = 64  # LLM requests in flight at once; more wait for a free connection
+
+# Telemetry
+# Per-stage timings, counters and histograms for the question-answer pipeline, served in
+# Prometheus text format at http://127.0.0.1:METRICS_PORT/metrics while the app runs.
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"  # A span costs a few microseconds
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # 0 = don't serve the endpoint
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Startup
+WARM_UP_ON_START = True  # Load the embedding model and index in the background when the app starts
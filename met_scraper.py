@@ -3,7 +3,10 @@ from bs4 import BeautifulSoup
 import json
 import time
 import os
+import argparse
 from config.config import ARTWORK_DATA_PATH
+from utils.ingest_checkpoint import IngestCheckpoint, artwork_id, compact_jsonl
+from models.metadata_filters import parse_year_range
 
 BASE_URL = "https://www.metmuseum.org"
 COLLECTION_SEARCH_URL = "https://www.metmuseum.org/art/collection/search"
@@ -38,10 +41,12 @@ def scrape_artwork_details(url):
             tag = soup.select_one(selector)
             return tag.get_text(strip=True) if tag else None
 
+        date = safe_extract("div.object-details__date")
         return {
             "title": safe_extract("h2.card__title"),
             "artist": safe_extract("div.card__artist a"),
-            "date": safe_extract("div.object-details__date"),
+            "date": date,
+            "year_range": parse_year_range(date),  # Numeric years (negative for B.C.) for date filters
             "medium": safe_extract("div.object-details__medium"),
             "dimensions": safe_extract("div.object-details__dimensions"),
             "description": safe_extract("div.rte__text"),
@@ -52,17 +57,53 @@ def scrape_artwork_details(url):
         print(f"Error scraping {url}: {e}")
         return None
 
-def main(output_path=ARTWORK_DATA_PATH, max_pages=1):
+def main(output_path=ARTWORK_DATA_PATH, max_pages=1, incremental=True, refresh=False):
+    """
+    Scrape artworks into a JSONL file.
+    In incremental mode, artworks already recorded in the checkpoint are skipped (unless
+    `refresh` is set, which re-scrapes them and keeps only changed records), new or
+    changed records are appended, and a delta manifest is written next to the output.
+    """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     artwork_links = get_artwork_links(max_pages=max_pages)
     print(f"Found {len(artwork_links)} artwork links. Scraping details...")
-    with open(output_path, "w", encoding="utf-8") as f:
+
+    if not incremental and os.path.exists(f"{output_path}.checkpoint"):
+        os.remove(f"{output_path}.checkpoint")
+    checkpoint = IngestCheckpoint(output_path)
+    unchanged = 0
+    failed = []
+
+    with open(output_path, "a" if incremental else "w", encoding="utf-8") as f:
         for url in artwork_links:
+            key = artwork_id({"url": url})  # The object ID the collection URL ends with
+            if key in checkpoint and not refresh:
+                continue
             data = scrape_artwork_details(url)
             if data and data["title"]:
-                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                status = checkpoint.classify(key, data)
+                if status == "unchanged":
+                    unchanged += 1
+                else:
+                    offset = f.tell()
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                    f.flush()
+                    checkpoint.mark(key, data, status, offset)
+            else:
+                failed.append(key)
             time.sleep(1)
-    print(f"Scraping complete. Data saved to {output_path}")
+
+    delta = checkpoint.finish(failed=failed, unchanged=unchanged)
+    if delta["changed"]:
+        compact_jsonl(output_path, key_fn=artwork_id)
+    print(f"Scraping complete. Data saved to {output_path} "
+          f"({len(delta['added'])} added, {len(delta['changed'])} changed, {unchanged} unchanged, {len(failed)} failed)")
 
 if __name__ == "__main__":
-    main(max_pages=2)  # Scrape 2 pages (~40–60 artworks)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape artwork pages from the Met collection website.")
+    parser.add_argument("--pages", type=int, default=2, help="Search result pages to scrape (~20-30 artworks each)")
+    parser.add_argument("--refresh", action="store_true", help="Re-scrape known artworks and keep only changed ones")
+    parser.add_argument("--full", action="store_true", help="Discard the checkpoint and rewrite the output file")
+    args = parser.parse_args()
+
+    main(max_pages=args.pages, incremental=not args.full, refresh=args.refresh)
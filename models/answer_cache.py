@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from models.index_manifest import manifest_path, read_manifest
+from models.index_shards import read_shard_layout, shard_paths, shards_path
+from models.query_cache import normalise_query
+from config.config import INDEX_RELOAD_INTERVAL
+
+
+def chunk_id(chunk: str) -> str:
+    """
+    Content ID of a retrieved chunk. Row numbers are reused across rebuilds; a hash of
+    the text identifies the same context wherever it sits in the index.
+    """
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()[:16]
+
+
+def answer_key(question: str, chunks: List[str], mode: str, model: str, prompt_version: str) -> str:
+    parts = [normalise_query(question), [chunk_id(chunk) for chunk in chunks], mode, model, prompt_version]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def index_version(index_path: str) -> str:
+    """
+    Changes whenever a new index generation is published, or for indexes built before
+    versioning, whenever the index file is rewritten (full rebuild, update or compaction).
+    A sharded index changes whenever any of its shards does.
+    """
+    layout = read_shard_layout(index_path)
+    if layout is not None:
+        return "+".join(index_version(path) for path in shard_paths(index_path, layout))
+    manifest = read_manifest(index_path)
+    if manifest is not None:
+        return manifest["version"]
+    try:
+        stat = os.stat(f"{index_path}.index")
+    except FileNotFoundError:
+        return "missing"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _stat(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def index_files(index_path: str) -> List[str]:
+    """
+    The files `index_version` reads: whenever none of them has changed, neither has
+    the version, so a stat of each is enough to tell.
+    """
+    files = [shards_path(index_path), manifest_path(index_path), f"{index_path}.index"]
+    layout = read_shard_layout(index_path)
+    if layout is not None:
+        files += [manifest_path(path) for path in shard_paths(index_path, layout)]
+    return files
+
+
+class AnswerCache:
+    """
+    Cache of LLM answers keyed by (normalised question, retrieved chunk IDs, mode, model,
+    system-prompt version), so a repeated question over the same context costs no API call.
+
+    A bounded LRU sits in front of an optional SQLite tier that survives restarts and is
+    shared between app processes. Entries expire after `ttl` seconds, the SQLite tier
+    keeps at most `max_disk_entries` (least recently used are evicted first), and every
+    entry is dropped once the index at `index_path` is rebuilt. Like HotIndex, the cache
+    checks for a rebuild at most every `check_interval` seconds (0 = on every lookup), by
+    a stat of the index files, so lookups in between do no file I/O.
+    """
+
+    def __init__(self, max_entries: int, persist_path: Optional[str] = None, ttl: float = 0,
+                 max_disk_entries: int = 0, index_path: Optional[str] = None,
+                 check_interval: float = INDEX_RELOAD_INTERVAL):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.index_path = index_path
+        self.check_interval = check_interval
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._version = index_version(index_path) if index_path else ""
+        self._files = index_files(index_path) if index_path else []
+        self._stamp = [_stat(path) for path in self._files]
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")  # Lets several app processes share the file
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_answers ("
+                "key TEXT PRIMARY KEY, index_version TEXT, answer TEXT, created_at REAL, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_answers_last_used ON llm_answers (last_used)")
+            self._db.execute("DELETE FROM llm_answers WHERE index_version != ?", (self._version,))
+            self._db.commit()
+
+    def _check_version(self):
+        """
+        Drops every entry when the index has been rebuilt since the last check.
+        """
+        if not self.index_path:
+            return
+        now = time.monotonic()
+        if self.check_interval > 0 and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        stamp = [_stat(path) for path in self._files]
+        if stamp == self._stamp:
+            return
+        self._files = index_files(self.index_path)  # The shard layout may have changed too
+        self._stamp = [_stat(path) for path in self._files]
+        version = index_version(self.index_path)
+        if version == self._version:
+            return
+        self._version = version
+        self._entries.clear()
+        self.invalidations += 1
+        if self._db is not None:
+            self._db.execute("DELETE FROM llm_answers WHERE index_version != ?", (version,))
+            self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    def get(self, question: str, chunks: List[str], mode: str, model: str, prompt_version: str) -> Optional[str]:
+        key = answer_key(question, chunks, mode, model, prompt_version)
+        now = time.time()
+        expired = False
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                expired = True
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT answer, created_at FROM llm_answers WHERE key = ? AND index_version = ?",
+                    (key, self._version),
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._db.execute("UPDATE llm_answers SET last_used = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._insert(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    self._db.execute("DELETE FROM llm_answers WHERE key = ?", (key,))
+                    self._db.commit()
+                    expired = True
+
+            if expired:
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, question: str, chunks: List[str], mode: str, model: str, prompt_version: str, answer: str):
+        key = answer_key(question, chunks, mode, model, prompt_version)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            self._insert(key, answer, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_answers VALUES (?, ?, ?, ?, ?)",
+                    (key, self._version, answer, now, now),
+                )
+                if self.max_disk_entries:
+                    cursor = self._db.execute(
+                        "DELETE FROM llm_answers WHERE key IN (SELECT key FROM llm_answers "
+                        "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,),
+                    )
+                    self.evictions += cursor.rowcount
+                self._db.commit()
+
+    def _insert(self, key: str, answer: str, created_at: float):
+        self._entries[key] = (answer, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_answers")
+                self._db.commit()
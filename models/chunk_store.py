@@ -0,0 +1,137 @@
+from typing import Iterable, List, Union
+import mmap
+import os
+import pickle
+import numpy as np
+
+# On-disk layout, both files in index row order:
+#   <index>_chunks.bin  UTF-8 chunk text, concatenated with no separators
+#   <index>_chunks.idx  little-endian uint64 end offset of each row in the .bin file
+OFFSET_DTYPE = np.dtype("<u8")
+
+
+def chunk_store_path(index_path: str) -> str:
+    return f"{index_path}_chunks.bin"
+
+
+def chunk_offsets_path(index_path: str) -> str:
+    return f"{index_path}_chunks.idx"
+
+
+class ChunkStoreWriter:
+    """
+    Streams text chunks to the binary chunk store in index row order.
+    A fresh store is written to temporary files that replace the old ones only on
+    a clean close; in append mode rows are added to the end of the existing store.
+    """
+
+    def __init__(self, index_path: str, append: bool = False):
+        self.paths = (chunk_store_path(index_path), chunk_offsets_path(index_path))
+        self.append = append
+        self._write_paths = self.paths if append else tuple(f"{path}.tmp" for path in self.paths)
+        mode = "ab" if append else "wb"
+        self._data = open(self._write_paths[0], mode)
+        self._offsets = open(self._write_paths[1], mode)
+        self._end = self._data.tell()
+        self.count = 0
+
+    def write(self, chunks: Iterable[str]):
+        ends = []
+        for chunk in chunks:
+            encoded = chunk.encode("utf-8")
+            self._data.write(encoded)
+            self._end += len(encoded)
+            ends.append(self._end)
+        self._offsets.write(np.asarray(ends, dtype=OFFSET_DTYPE).tobytes())
+        self.count += len(ends)
+
+    def tell(self) -> int:
+        """
+        Size of the data file so far, recorded so interrupted appends can be rolled back.
+        """
+        return self._end
+
+    def close(self):
+        self._data.close()
+        self._offsets.close()
+        if not self.append:
+            for tmp_path, path in zip(self._write_paths, self.paths):
+                os.replace(tmp_path, path)
+
+    def abort(self):
+        self._data.close()
+        self._offsets.close()
+        if not self.append:
+            for tmp_path in self._write_paths:
+                os.remove(tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of the chunk store with O(1) access by row ID.
+
+    Opening maps the files without reading them, so load time does not grow with the
+    corpus; a lookup pages in only the bytes of the requested row, and the OS page
+    cache backing the mapping is shared by every process that opens the same store.
+    """
+
+    def __init__(self, index_path: str):
+        self._file = open(chunk_store_path(index_path), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        offsets = chunk_offsets_path(index_path)
+        self._ends = (np.memmap(offsets, dtype=OFFSET_DTYPE, mode="r")
+                      if os.path.getsize(offsets) else np.zeros(0, dtype=OFFSET_DTYPE))
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def __getitem__(self, row: int) -> str:
+        if row < 0:
+            row += len(self._ends)
+        if not 0 <= row < len(self._ends):
+            raise IndexError(f"Chunk row {row} out of range")
+        start = int(self._ends[row - 1]) if row else 0
+        return self._data[start:int(self._ends[row])].decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def read_chunk_store(index_path: str) -> Union[ChunkStore, List[str]]:
+    """
+    Opens the memory-mapped chunk store, falling back to the legacy pickle file
+    for indexes built before it existed.
+    """
+    if os.path.exists(chunk_store_path(index_path)):
+        return ChunkStore(index_path)
+    with open(f"{index_path}_chunks.pkl", "rb") as f:
+        return pickle.load(f)
+
+
+def truncate_chunk_store(index_path: str, rows: int, data_bytes: int):
+    """
+    Drops rows beyond `rows`, e.g. ones appended by an update that crashed before
+    its ID map was saved.
+    """
+    for path, size in ((chunk_store_path(index_path), data_bytes),
+                       (chunk_offsets_path(index_path), rows * OFFSET_DTYPE.itemsize)):
+        if os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
@@ -0,0 +1,83 @@
+from typing import List, Optional
+import math
+import re
+from config.config import CONTEXT_TOKEN_BUDGET, CONTEXT_DUPLICATE_SIMILARITY, CHARS_PER_TOKEN
+
+# Field values that carry no information for the LLM
+_EMPTY_VALUES = {"", "unknown", "n/a", "none"}
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough LLM token count of `text` (about CHARS_PER_TOKEN characters per token for
+    English catalogue text), good enough for budgeting without the model's tokenizer.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def compact_chunk(chunk: str) -> str:
+    """
+    Normalises an artwork chunk for the prompt: one "Field: value" line each, with
+    indentation and runs of whitespace collapsed, and empty or "Unknown Medium"-style fields
+    dropped. Chunks from indexes built before chunks were compact get the same text.
+    """
+    lines = []
+    for line in chunk.splitlines():
+        line = " ".join(line.split())
+        field, sep, value = line.partition(":")
+        value = value.strip().lower()
+        if sep and (value in _EMPTY_VALUES or value == f"unknown {field.lower()}"):
+            continue
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+def _similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """
+    Cuts `text` to about `max_tokens`, at a line or word boundary where possible.
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return (cut[:boundary] if boundary > limit // 2 else cut).rstrip() + " …"
+
+
+def assemble_context(chunks: List[str], token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET,
+                     duplicate_similarity: float = CONTEXT_DUPLICATE_SIMILARITY) -> List[str]:
+    """
+    The retrieved chunks (best first) as they should appear in the prompt: compacted,
+    without near-duplicates of a better-ranked chunk (word-set Jaccard similarity of at
+    least `duplicate_similarity`), and packed in rank order into `token_budget`
+    estimated tokens. The best chunk is always included, truncated if it alone is over
+    budget; None means no budget.
+    """
+    kept, kept_words, used = [], [], 0
+    for chunk in chunks:
+        text = compact_chunk(chunk)
+        if not text:
+            continue
+        words = _words(text)
+        if any(_similarity(words, other) >= duplicate_similarity for other in kept_words):
+            continue
+        tokens = estimate_tokens(text)
+        if token_budget is not None and used + tokens > token_budget:
+            if kept:
+                continue  # A shorter, lower-ranked chunk may still fit
+            text = _truncate(text, token_budget)
+            tokens = estimate_tokens(text)
+        kept.append(text)
+        kept_words.append(words)
+        used += tokens
+    return kept
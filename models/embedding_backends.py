@@ -0,0 +1,84 @@
+from typing import Optional
+import os
+import numpy as np
+from config.config import EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_THREADS, ONNX_MODEL_DIR, INT8_QUANTIZATION
+
+# "torch" is the reference; the ONNX Runtime backends are exported from it on first use
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def onnx_model_dir(model_name: str = EMBEDDING_MODEL) -> str:
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def int8_file_name(quantization: str = INT8_QUANTIZATION) -> str:
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def export_onnx(model_name: str = EMBEDDING_MODEL, quantization: str = INT8_QUANTIZATION) -> str:
+    """
+    Exports the model to ONNX and writes a dynamically quantized int8 copy next to it,
+    unless they already exist. Later loads read the local files and need no network.
+    Returns the export directory.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = onnx_model_dir(model_name)
+    if not os.path.exists(os.path.join(path, "onnx", "model.onnx")):
+        SentenceTransformer(model_name, backend="onnx", device="cpu").save_pretrained(path)
+    if not os.path.exists(os.path.join(path, int8_file_name(quantization))):
+        model = SentenceTransformer(path, backend="onnx", device="cpu")
+        export_dynamic_quantized_onnx_model(model, quantization, path, file_suffix=f"qint8_{quantization}")
+    return path
+
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS,
+                         model_name: str = EMBEDDING_MODEL):
+    """
+    Loads the sentence embedding model on the given backend. `threads` caps the CPU
+    threads used per encode call (0 keeps the library default). All backends return a
+    SentenceTransformer, so callers use `.encode` as before.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Choose one of: {', '.join(EMBEDDING_BACKENDS)}.")
+
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise ImportError(f"The '{backend}' backend needs ONNX Runtime: pip install 'sentence-transformers[onnx]'")
+
+    path = export_onnx(model_name)
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    model_kwargs = {"provider": "CPUExecutionProvider", "session_options": options}
+    if backend == "onnx-int8":
+        model_kwargs["file_name"] = int8_file_name()
+    return SentenceTransformer(path, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray, tolerance: Optional[float] = None) -> dict:
+    """
+    Row-wise cosine similarity between vectors from the reference backend and another
+    backend for the same sentences. With `tolerance`, also reports whether the worst
+    row stays within it (1 - cosine <= tolerance).
+    """
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = np.sum(reference * candidate, axis=1)
+    drift = {
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "p01_cosine": float(np.percentile(cosine, 1)),
+    }
+    if tolerance is not None:
+        drift["within_tolerance"] = bool(1 - drift["min_cosine"] <= tolerance)
+    return drift
@@ -0,0 +1,189 @@
+from typing import Dict, List, Optional, Set
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+KEY_BYTES = 16
+DTYPE = np.float32
+
+
+def text_key(namespace: str, text: str) -> bytes:
+    """
+    Content address of a chunk's embedding: a hash of the text and the model/backend
+    namespace that embedded it.
+    """
+    return hashlib.blake2b(f"{namespace}\0{text}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed cache of chunk embeddings, so a rebuild only runs the
+    model on text it has not embedded before.
+
+    Each namespace (model and backend) has a directory holding a float32 matrix with one
+    row per entry (memory-mapped for lookups), the 16-byte key of each row in the same
+    order, and meta.json naming both files. Entries are appended as they are embedded;
+    `collect_garbage` rewrites the files keeping only the entries used since the store
+    was opened and then switches meta.json over to them, so a crash at any point leaves
+    a consistent store. One build writes to a store at a time.
+    """
+
+    def __init__(self, path: str, namespace: str):
+        self.namespace = namespace
+        self.directory = os.path.join(path, re.sub(r"[^A-Za-z0-9._-]+", "_", namespace))
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self._encode_seconds = 0.0
+        self._encoded = 0
+        self._used: Set[bytes] = set()
+        self._meta = self._read_meta()
+        self._open()
+
+    # Files
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"namespace": self.namespace, "dim": None, "generation": 0, "seconds_per_text": None}
+
+    def _write_meta(self):
+        tmp_path = f"{self._meta_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> str:
+        generation = self._meta["generation"] if generation is None else generation
+        return os.path.join(self.directory, f"{kind}-{generation}.bin")
+
+    def _open(self):
+        """
+        Loads the key index and maps the vectors. Rows appended before a crash without
+        their key (or keys without their full row) are cut off.
+        """
+        self._keys: Dict[bytes, int] = {}
+        self._vectors = np.zeros((0, self._meta["dim"] or 0), dtype=DTYPE)
+        dim = self._meta["dim"]
+        if not dim or not os.path.exists(self._file("keys")):
+            return
+        with open(self._file("keys"), "rb") as f:
+            raw = f.read()
+        row_bytes = dim * np.dtype(DTYPE).itemsize
+        count = min(len(raw) // KEY_BYTES, os.path.getsize(self._file("vectors")) // row_bytes)
+        for kind, size in (("keys", count * KEY_BYTES), ("vectors", count * row_bytes)):
+            if os.path.getsize(self._file(kind)) > size:
+                with open(self._file(kind), "r+b") as f:
+                    f.truncate(size)
+        self._keys = {raw[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(count)}
+        self._map()
+
+    def _map(self):
+        if self._keys:
+            self._vectors = np.memmap(self._file("vectors"), dtype=DTYPE, mode="r",
+                                      shape=(len(self._keys), self._meta["dim"]))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # Cache
+
+    def lookup(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        The stored vector of each text, or None where it has not been embedded yet.
+        """
+        vectors = []
+        for text in texts:
+            key = text_key(self.namespace, text)
+            self._used.add(key)
+            row = self._keys.get(key)
+            if row is not None and row >= len(self._vectors):
+                self._map()  # Appended since the file was mapped
+            vectors.append(self._vectors[row] if row is not None else None)
+        found = sum(vector is not None for vector in vectors)
+        self.hits += found
+        self.misses += len(texts) - found
+        return vectors
+
+    def add(self, texts: List[str], vectors: np.ndarray, seconds: Optional[float] = None):
+        """
+        Stores newly embedded texts. With `seconds` (the time the model took), the
+        average cost of a text is remembered for estimating the time hits save.
+        """
+        vectors = np.asarray(vectors, dtype=DTYPE)
+        if self._meta["dim"] is None:
+            self._meta["dim"] = vectors.shape[1]
+            self._write_meta()
+        keys, rows = [], []
+        for text, vector in zip(texts, vectors):
+            key = text_key(self.namespace, text)
+            self._used.add(key)
+            if key in self._keys:
+                continue
+            self._keys[key] = len(self._keys)
+            keys.append(key)
+            rows.append(vector)
+        if seconds is not None and len(texts):
+            self._encode_seconds += seconds
+            self._encoded += len(texts)
+            self._meta["seconds_per_text"] = self._encode_seconds / self._encoded
+        if not keys:
+            return
+        # Vectors first: a key is only trusted once its row is complete
+        with open(self._file("vectors"), "ab") as f:
+            f.write(np.vstack(rows).tobytes())
+        with open(self._file("keys"), "ab") as f:
+            f.write(b"".join(keys))
+        self.added += len(keys)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def seconds_saved(self) -> float:
+        """
+        Estimated model time the hits saved, at the recorded per-text encoding cost.
+        """
+        return self.hits * (self._meta["seconds_per_text"] or 0.0)
+
+    def save(self):
+        self._write_meta()
+
+    def collect_garbage(self) -> int:
+        """
+        Drops every entry not looked up or added since the store was opened, e.g. the
+        embeddings of artworks that a full rebuild no longer contains. Returns the
+        number of entries removed.
+        """
+        kept = [(key, row) for key, row in self._keys.items() if key in self._used]
+        removed = len(self._keys) - len(kept)
+        if not removed:
+            return 0
+        self._map()
+        old_generation, generation = self._meta["generation"], self._meta["generation"] + 1
+        with open(self._file("vectors", generation), "wb") as vectors_file, \
+                open(self._file("keys", generation), "wb") as keys_file:
+            for key, row in kept:
+                vectors_file.write(np.asarray(self._vectors[row]).tobytes())
+                keys_file.write(key)
+        self._meta["generation"] = generation
+        self._write_meta()
+        for kind in ("vectors", "keys"):
+            os.remove(self._file(kind, old_generation))
+        self._open()
+        return removed
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        return (f"Embedding cache: {self.hits}/{lookups} hits ({self.hit_ratio:.0%}), "
+                f"{self.added} new, ~{self.seconds_saved:.1f}s of encoding saved; {len(self)} entries")
@@ -1,43 +1,327 @@
-from typing import List
-from sentence_transformers import SentenceTransformer
-import faiss
+from __future__ import annotations
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
 import numpy as np
 import os
-import pickle
-from config.config import EMBEDDING_MODEL
+import threading
+import time
+from config.config import (
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBED_BATCH_SIZE, EMBED_WORKERS, INDEX_TYPE, INDEX_PARAMS, SHARED_INDEX,
+    QUERY_CACHE_SIZE, QUERY_CACHE_PATH, EMBEDDING_STORE_PATH,
+)
+from models.index_factory import (
+    make_index, needs_training, configure_search, save_index_params, load_index_params, drop_tombstones,
+    read_index_file, prepare_vectors,
+)
+from models.embedding_backends import load_embedding_model
+from models.parallel_embedding import EmbeddingPool
+from models.embedding_store import EmbeddingStore
+from models.chunk_store import ChunkStoreWriter, read_chunk_store
+from models.query_cache import QueryEmbeddingCache, normalise_query
+from utils.pipeline import PipelineStats, batched, prefetch
+from utils.telemetry import CACHE_LOOKUPS
+from utils.lazy_import import lazy_import
 
-# Load embedding model once
-model = SentenceTransformer(EMBEDDING_MODEL)
+faiss = lazy_import("faiss")
 
-def build_faiss_index(text_chunks: List[str], index_path: str = None):
+# The embedding model is loaded once, on first use: importing sentence-transformers
+# (and torch) alone takes several seconds
+_model = None
+_model_lock = threading.Lock()
+
+# Repeated questions (and Streamlit reruns) skip the transformer entirely.
+# Backends produce slightly different vectors, so each gets its own namespace.
+query_cache = QueryEmbeddingCache(QUERY_CACHE_SIZE, QUERY_CACHE_PATH, namespace=f"{EMBEDDING_MODEL}:{EMBEDDING_BACKEND}")
+
+def get_model():
     """
-    Generate embeddings and store them in a FAISS index.
-    Optionally save index and mapping.
+    Returns the shared embedding model on the configured backend, loading it on the first call.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_embedding_model()
+    return _model
+
+def warm_up(index_path: Optional[str] = None) -> threading.Thread:
+    """
+    Loads the embedding model (and optionally the index) on a background thread so the
+    UI can render meanwhile. The first query waits only for whatever is still loading.
+    """
+    def load():
+        get_model()
+        if index_path:
+            from utils.rag_utils import load_index
+            try:
+                load_index(index_path)
+            except FileNotFoundError:
+                pass  # Reported to the user when they first query
+
+    thread = threading.Thread(target=load, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def id_map_path(index_path: str) -> str:
+    return f"{index_path}_ids.json"
+
+def load_id_map(index_path: str) -> Optional[dict]:
     """
-    embeddings = model.encode(text_chunks, show_progress_bar=True)
-    dimension = embeddings.shape[1]
+    Loads the sidecar that maps artwork IDs to chunk-store rows, or None for indexes
+    built before ID mapping existed.
+
+    Layout: {"rows": {artwork_id: row}, "tombstones": [row, ...],
+             "next_row": int, "chunk_store_bytes": int}
+    """
+    path = id_map_path(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_id_map(index_path: str, id_map: dict):
+    tmp_path = f"{id_map_path(index_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(id_map, f)
+    os.replace(tmp_path, id_map_path(index_path))
+
+def write_index(index: faiss.Index, index_path: str):
+    faiss.write_index(index, f"{index_path}.index.tmp")
+    os.replace(f"{index_path}.index.tmp", f"{index_path}.index")
+
+def open_embedding_store() -> Optional[EmbeddingStore]:
+    """
+    The persistent chunk-embedding cache for the configured model and backend, or None
+    when EMBEDDING_STORE_PATH is unset.
+    """
+    if not EMBEDDING_STORE_PATH:
+        return None
+    return EmbeddingStore(EMBEDDING_STORE_PATH, namespace=f"{EMBEDDING_MODEL}:{EMBEDDING_BACKEND}")
+
+def embed_batches(batches: Iterable[List[Tuple[Optional[str], str]]], workers: int = EMBED_WORKERS,
+                  stats: Optional[PipelineStats] = None,
+                  store: Optional[EmbeddingStore] = None,
+                  pool: Optional[EmbeddingPool] = None) -> Iterator[Tuple[list, np.ndarray]]:
+    """
+    Yields (batch, vectors) for batches of (artwork_id, chunk) pairs, in input order.
+    With more than one worker, batches are encoded concurrently by an EmbeddingPool,
+    `pool` if given (e.g. one already warmed up) or else one started for the call.
+    With a `store`, only chunks it does not hold yet are encoded, and those are added to it.
+    """
+    stats = stats or PipelineStats()
+
+    def lookup(batch):
+        texts = [text for _, text in batch]
+        if store is None:
+            return [None] * len(texts), texts
+        start = time.perf_counter()
+        cached = store.lookup(texts)
+        missing = [text for text, vector in zip(texts, cached) if vector is None]
+        stats.add("cache", len(texts) - len(missing), time.perf_counter() - start)
+        return cached, missing
 
-    index = faiss.IndexFlatL2(dimension)
-    index.add(np.array(embeddings))
+    def merge(batch, cached, missing, vectors, seconds=None):
+        if store is not None and missing:
+            store.add(missing, vectors, seconds)
+        if len(missing) == len(batch):
+            return batch, vectors
+        fresh = iter(() if vectors is None else vectors)
+        return batch, np.vstack([vector if vector is not None else next(fresh) for vector in cached])
 
-    if index_path:
-        faiss.write_index(index, f"{index_path}.index")
-        with open(f"{index_path}_chunks.pkl", "wb") as f:
-            pickle.dump(text_chunks, f)
+    if workers <= 1 and pool is None:
+        for batch in batches:
+            cached, missing = lookup(batch)
+            vectors, seconds = None, None
+            if missing:
+                start = time.perf_counter()
+                vectors = get_model().encode(missing, batch_size=len(missing), show_progress_bar=False)
+                seconds = time.perf_counter() - start
+                stats.add("embed", len(missing), seconds)
+                vectors = np.asarray(vectors, dtype=np.float32)
+            yield merge(batch, cached, missing, vectors, seconds)
+        return
 
+    def collect(batch, cached, missing, future):
+        vectors = seconds = None
+        if future is not None:
+            # Time spent waiting on the pool is what embedding costs the build
+            start = time.perf_counter()
+            vectors = future.result()
+            seconds = time.perf_counter() - start
+            stats.add("embed", len(missing), seconds)
+        return merge(batch, cached, missing, vectors, seconds)
+
+    if pool is None:
+        with EmbeddingPool(workers) as pool:
+            yield from embed_batches(batches, workers, stats, store, pool)
+        return
+
+    # Two batches per worker in flight keeps every worker busy with bounded memory
+    window = deque()
+    for batch in batches:
+        cached, missing = lookup(batch)
+        window.append((batch, cached, missing, pool.submit(missing) if missing else None))
+        if len(window) >= 2 * pool.workers:
+            yield collect(*window.popleft())
+    while window:
+        yield collect(*window.popleft())
+
+def build_faiss_index_streaming(
+    items: Iterable[Tuple[Optional[str], str]],
+    index_path: Optional[str] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    stats: Optional[PipelineStats] = None,
+    index_type: str = INDEX_TYPE,
+    index_params: Optional[dict] = None,
+    workers: int = EMBED_WORKERS,
+    store: Optional[EmbeddingStore] = None,
+) -> Tuple[Optional[faiss.Index], int]:
+    """
+    Embed (artwork_id, chunk) pairs in fixed-size batches and add each batch to the
+    FAISS index as it is produced, streaming the chunk text to disk alongside. Only a
+    couple of batches are held in memory at once, whatever the size of the collection;
+    the upstream iterator runs on a background thread so reading overlaps with encoding.
+    With `workers` > 1, batches are embedded by a process pool and merged in row order.
+    With a `store`, chunks embedded by an earlier build are taken from it instead.
+    Artwork IDs (None when unknown) are recorded in the ID map used for incremental updates.
+    IVF families (and 8-bit storage) are trained on the first `train_size` vectors,
+    which are buffered until then. Cosine indexes store the vectors unit-normalised.
+    Returns the index (None if there were no chunks) and the number of chunks added.
+    """
+    stats = stats or PipelineStats()
+    index = None
+    params = None
+    build_params = {**INDEX_PARAMS, **(index_params or {})}
+    train_size = build_params["train_size"]
+    pending: List[Tuple[np.ndarray, np.ndarray]] = []  # Vectors held back until the index is trained
+    pending_count = 0
+    writer = ChunkStoreWriter(index_path) if index_path else None
+    rows: Dict[str, int] = {}
+    tombstones: List[int] = []
+    total = 0
+
+    try:
+        batches = prefetch(batched(items, batch_size), maxsize=max(2, 2 * workers))
+        for batch, vectors in embed_batches(batches, workers, stats, store):
+            texts = [text for _, text in batch]
+            start = time.perf_counter()
+            row_ids = np.arange(total, total + len(batch), dtype=np.int64)
+            if index is None and needs_training(index_type, build_params["storage"]):
+                pending.append((vectors, row_ids))
+                pending_count += len(batch)
+                if pending_count >= train_size:
+                    index, params = _train_and_flush(pending, index_type, index_params)
+            elif index is None:
+                index, params = make_index(vectors.shape[1], index_type, index_params)
+                index.add_with_ids(prepare_vectors(index, vectors), row_ids)
+            else:
+                index.add_with_ids(prepare_vectors(index, vectors), row_ids)
+            for (artwork_id, _), row in zip(batch, row_ids.tolist()):
+                if artwork_id is None:
+                    continue
+                if artwork_id in rows:
+                    tombstones.append(rows[artwork_id])  # A later duplicate supersedes the earlier row
+                rows[artwork_id] = row
+            stats.add("index", len(batch), time.perf_counter() - start)
+
+            if writer:
+                start = time.perf_counter()
+                writer.write(texts)
+                stats.add("write", len(batch), time.perf_counter() - start)
+            total += len(batch)
+        if index is None and pending:
+            # Collections smaller than train_size train on everything they have
+            index, params = _train_and_flush(pending, index_type, index_params)
+    except BaseException:
+        if writer:
+            writer.abort()
+        raise
+
+    if writer:
+        if index is None:
+            writer.abort()
+        else:
+            store_bytes = writer.tell()
+            write_index(index, index_path)
+            save_index_params(index_path, params)
+            writer.close()
+            save_id_map(index_path, {
+                "rows": rows,
+                "tombstones": tombstones,
+                "next_row": total,
+                "chunk_store_bytes": store_bytes,
+            })
+
+    if index is not None:
+        index = drop_tombstones(index, tombstones, params)
+
+    return index, total
+
+def _train_and_flush(pending: List[Tuple[np.ndarray, np.ndarray]], index_type: str, index_params: Optional[dict]):
+    """
+    Trains a new index on the buffered vectors, then adds them and empties the buffer.
+    """
+    train_vectors = np.vstack([vectors for vectors, _ in pending])
+    index, params = make_index(train_vectors.shape[1], index_type, index_params, train_vectors=train_vectors)
+    for vectors, row_ids in pending:
+        index.add_with_ids(prepare_vectors(index, vectors), row_ids)
+    pending.clear()
+    return index, params
+
+def build_faiss_index(text_chunks: List[str], index_path: str = None):
+    """
+    Generate embeddings and store them in a FAISS index.
+    Optionally save index and mapping.
+    """
+    index, _ = build_faiss_index_streaming(((None, chunk) for chunk in text_chunks), index_path=index_path)
     return index, text_chunks
 
-def load_faiss_index(index_path: str):
+def load_faiss_index(index_path: str, mmap: bool = SHARED_INDEX):
     """
     Load FAISS index and corresponding text chunks.
+    Tombstoned rows are dropped from the in-memory index (or filtered at search time for
+    a memory-mapped one), so searches never return them. With `mmap`, the vectors and
+    chunks stay in shared, read-only file mappings instead of per-process memory.
     """
-    index = faiss.read_index(f"{index_path}.index")
-    with open(f"{index_path}_chunks.pkl", "rb") as f:
-        chunks = pickle.load(f)
+    index = read_index_file(index_path, mmap=mmap)
+    params = load_index_params(index_path)
+    configure_search(index, params)
+    chunks = read_chunk_store(index_path)
+    id_map = load_id_map(index_path)
+    if id_map:
+        index = drop_tombstones(index, id_map["tombstones"], params, read_only=mmap)
     return index, chunks
 
 def embed_query(query: str):
     """
     Embed a query string for retrieval.
+    Served from the query cache when the normalised query has been seen before.
+    """
+    vector = query_cache.get(query)
+    CACHE_LOOKUPS.inc(cache="query_embedding", result="miss" if vector is None else "hit")
+    if vector is None:
+        vector = get_model().encode([query])[0]
+        query_cache.put(query, vector)
+    return vector
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """
+    Embed several query strings with a single model call, reusing cached vectors.
     """
-    return model.encode([query])[0]
\ No newline at end of file
+    vectors = [query_cache.get(query) for query in queries]
+    missing = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(normalise_query(queries[i]), []).append(i)
+    misses = sum(len(group) for group in missing.values())
+    CACHE_LOOKUPS.inc(len(queries) - misses, cache="query_embedding", result="hit")
+    CACHE_LOOKUPS.inc(misses, cache="query_embedding", result="miss")
+    if missing:
+        positions = list(missing.values())
+        encoded = get_model().encode([queries[group[0]] for group in positions], batch_size=len(positions))
+        for group, vector in zip(positions, encoded):
+            query_cache.put(queries[group[0]], vector)
+            for i in group:
+                vectors[i] = vector
+    return np.vstack(vectors).astype(np.float32)
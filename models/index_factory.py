@@ -0,0 +1,228 @@
+from __future__ import annotations
+from typing import Iterable, Optional, Tuple
+import json
+import math
+import os
+import numpy as np
+from config.config import INDEX_TYPE, INDEX_PARAMS
+from utils.lazy_import import lazy_import
+
+faiss = lazy_import("faiss")
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+METRICS = ("l2", "cosine")
+# How vectors are stored: raw float32 (4 bytes a dimension), float16 (2) or 8-bit scalar quantized (1).
+# IVF-PQ always stores product-quantized codes.
+VECTOR_STORAGE = ("float32", "float16", "sq8")
+
+# k-means wants roughly this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def index_params_path(index_path: str) -> str:
+    return f"{index_path}_params.json"
+
+
+def is_ivf(index_type: str) -> bool:
+    return index_type in ("ivf", "ivfpq")
+
+
+def needs_training(index_type: str, storage: str = "float32") -> bool:
+    return is_ivf(index_type) or (storage == "sq8" and index_type != "ivfpq")
+
+
+def _metric(params: dict) -> int:
+    return faiss.METRIC_INNER_PRODUCT if params.get("metric", "l2") == "cosine" else faiss.METRIC_L2
+
+
+def _quantizer_type(storage: str) -> int:
+    return {"float16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}[storage]
+
+
+def prepare_vectors(index, vectors: np.ndarray) -> np.ndarray:
+    """
+    The vectors as `index` expects them: unit-normalised (a copy) for a cosine index,
+    whose inner product then equals cosine similarity; unchanged for an L2 index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if getattr(index, "metric_type", faiss.METRIC_L2) != faiss.METRIC_INNER_PRODUCT:
+        return vectors
+    vectors = vectors.copy()
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def as_squared_l2(index, distances: np.ndarray) -> np.ndarray:
+    """
+    Search results as squared L2 distances whatever the metric, so one relevance
+    threshold serves both: for unit vectors, |a - b|^2 = 2 - 2 cos(a, b).
+    """
+    if getattr(index, "metric_type", faiss.METRIC_L2) == faiss.METRIC_INNER_PRODUCT:
+        return 2.0 - 2.0 * distances
+    return distances
+
+
+def make_index(dimension: int, index_type: str = INDEX_TYPE, params: Optional[dict] = None,
+               train_vectors: Optional[np.ndarray] = None) -> Tuple[faiss.Index, dict]:
+    """
+    Create an empty, ready-to-fill index of the given family whose vector IDs are
+    chunk-store row numbers, comparing vectors by `metric` and storing them as `storage`
+    (see INDEX_PARAMS). IVF families and 8-bit storage are trained on `train_vectors`;
+    nlist and the PQ code size are clamped so small collections still train.
+    Returns the index and the effective parameters, to be saved next to the index file.
+    """
+    params = {**INDEX_PARAMS, **(params or {}), "type": index_type}
+    metric, storage = _metric(params), params["storage"]
+    if params["metric"] not in METRICS:
+        raise ValueError(f"Unknown metric '{params['metric']}'. Choose one of: {', '.join(METRICS)}.")
+    if storage not in VECTOR_STORAGE:
+        raise ValueError(f"Unknown vector storage '{storage}'. Choose one of: {', '.join(VECTOR_STORAGE)}.")
+
+    if index_type == "flat":
+        if storage == "float32":
+            base = faiss.IndexFlat(dimension, metric)
+        else:
+            base = faiss.IndexScalarQuantizer(dimension, _quantizer_type(storage), metric)
+        index = faiss.IndexIDMap2(base)
+    elif index_type == "hnsw":
+        if storage == "float32":
+            base = faiss.IndexHNSWFlat(dimension, params["hnsw_m"], metric)
+        else:
+            base = faiss.IndexHNSWSQ(dimension, _quantizer_type(storage), params["hnsw_m"], metric)
+        base.hnsw.efConstruction = params["ef_construction"]
+        index = faiss.IndexIDMap2(base)
+    elif is_ivf(index_type):
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError(f"Index type '{index_type}' needs training vectors.")
+        n_train = len(train_vectors)
+        params["nlist"] = max(1, min(params["nlist"], n_train // MIN_POINTS_PER_CENTROID))
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if index_type == "ivf" and storage == "float32":
+            index = faiss.IndexIVFFlat(quantizer, dimension, params["nlist"], metric)
+        elif index_type == "ivf":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, params["nlist"], _quantizer_type(storage),
+                                                  metric)
+        else:
+            if dimension % params["pq_m"]:
+                raise ValueError(f"pq_m={params['pq_m']} must divide the embedding dimension {dimension}.")
+            params["pq_nbits"] = max(1, min(params["pq_nbits"], int(math.log2(n_train))))
+            index = faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["pq_m"], params["pq_nbits"], metric)
+        # A hash-table direct map lets rows be reconstructed and removed by ID
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}.")
+
+    if not index.is_trained:
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError(f"'{storage}' vector storage needs training vectors.")
+        index.train(prepare_vectors(index, train_vectors))
+    configure_search(index, params)
+    return index, params
+
+
+def configure_search(index: faiss.Index, params: dict):
+    """
+    Applies the query-time knobs (nprobe, efSearch) recorded for this index.
+    """
+    space = faiss.ParameterSpace()
+    if is_ivf(params["type"]):
+        space.set_index_parameter(index, "nprobe", min(params["nprobe"], params["nlist"]))
+    elif params["type"] == "hnsw":
+        space.set_index_parameter(index, "efSearch", params["ef_search"])
+
+
+def save_index_params(index_path: str, params: dict):
+    tmp_path = f"{index_params_path(index_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+    os.replace(tmp_path, index_params_path(index_path))
+
+
+def load_index_params(index_path: str) -> dict:
+    """
+    Reads the parameters saved next to an index; indexes built before they were
+    recorded are plain flat indexes, and before metric and storage were, L2 over float32.
+    """
+    path = index_params_path(index_path)
+    if not os.path.exists(path):
+        return {**INDEX_PARAMS, "type": "flat", "metric": "l2", "storage": "float32"}
+    with open(path, "r", encoding="utf-8") as f:
+        return {"metric": "l2", "storage": "float32", **json.load(f)}
+
+
+def read_index_file(index_path: str, mmap: bool = False) -> faiss.Index:
+    """
+    Reads a saved index. With `mmap`, vector storage stays in the read-only mapped file
+    instead of being copied into the process, so every worker that opens the same file
+    shares one physical copy through the OS page cache. Mapped indexes cannot be modified.
+    """
+    if not mmap:
+        return faiss.read_index(f"{index_path}.index")
+    if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        raise RuntimeError("Memory-mapped indexes need faiss-cpu 1.8 or newer.")
+    return faiss.read_index(f"{index_path}.index", faiss.IO_FLAG_MMAP_IFC)
+
+
+def search_parameters(params: dict, selector=None):
+    """
+    Per-query search parameters carrying the index's nprobe/efSearch plus an ID selector.
+    """
+    if is_ivf(params["type"]):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(params["nprobe"], params["nlist"]))
+    if params["type"] == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=params["ef_search"])
+    return faiss.SearchParameters(sel=selector)
+
+
+class TombstoneFilteredIndex:
+    """
+    Search wrapper that excludes tombstoned rows with an ID selector, for indexes that
+    cannot remove vectors: the HNSW family, and any index opened memory-mapped.
+    """
+
+    def __init__(self, index: faiss.Index, tombstones: Iterable[int], params: dict):
+        tombstones = set(tombstones)
+        self.index = index
+        self._batch = faiss.IDSelectorBatch(np.array(sorted(tombstones), dtype=np.int64))
+        self._selector = faiss.IDSelectorNot(self._batch)
+        self._search_params = search_parameters(params, self._selector)
+        self.d = index.d
+        self.metric_type = index.metric_type
+        self.ntotal = index.ntotal - len(tombstones)
+
+    def search(self, x: np.ndarray, k: int):
+        return self.index.search(x, k, params=self._search_params)
+
+
+def drop_tombstones(index: faiss.Index, tombstones: Iterable[int], params: dict, read_only: bool = False):
+    """
+    Removes tombstoned rows from an in-memory index, or wraps it with a filter when
+    the index family does not support removal or the index is memory-mapped.
+    """
+    tombstones = list(tombstones)
+    if not tombstones:
+        return index
+    if read_only or params["type"] == "hnsw":
+        return TombstoneFilteredIndex(index, tombstones, params)
+    index.remove_ids(np.array(tombstones, dtype=np.int64))
+    return index
+
+
+def filtered_search(index: faiss.Index, queries: np.ndarray, candidates: np.ndarray, k: int, params: dict,
+                    exact_max: int):
+    """
+    Nearest neighbours restricted to `candidates` (sorted row IDs from a metadata filter).
+    Sets of up to `exact_max` rows are scored exactly against their reconstructed
+    vectors, so a selective filter never comes back short; larger sets are searched
+    through the ANN index with a bitmap ID selector that skips other rows during traversal.
+    """
+    base = index.index if isinstance(index, TombstoneFilteredIndex) else index
+    if len(candidates) <= exact_max:
+        vectors = base.reconstruct_batch(candidates)
+        distances, positions = faiss.knn(queries, vectors, min(k, len(candidates)), metric=base.metric_type)
+        return distances, np.where(positions >= 0, candidates[positions], -1)
+    mask = np.zeros(int(candidates[-1]) + 1, dtype=bool)
+    mask[candidates] = True
+    bitmap = np.packbits(mask, bitorder="little")  # Must outlive the search
+    selector = faiss.IDSelectorBitmap(bitmap)
+    return base.search(queries, k, params=search_parameters(params, selector))
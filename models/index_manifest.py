@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import json
+import os
+import shutil
+import uuid
+from config.config import INDEX_KEEP_GENERATIONS
+
+# Every file that makes up one generation of an index, by suffix of its path prefix
+ARTIFACT_SUFFIXES = (".index", "_ids.json", "_params.json", "_chunks.bin", "_chunks.idx", "_chunks.pkl",
+                     "_lexical.json", "_filters.json")
+
+
+def manifest_path(index_path: str) -> str:
+    return f"{index_path}_manifest.json"
+
+
+def versions_dir(index_path: str) -> str:
+    return f"{index_path}_versions"
+
+
+def read_manifest(index_path: str) -> Optional[dict]:
+    """
+    The published generation of an index: {"version", "path", "published"}, with
+    `path` relative to the manifest's directory. None for unversioned indexes.
+    """
+    try:
+        with open(manifest_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def resolve_index_path(index_path: str) -> Tuple[Optional[str], str]:
+    """
+    Returns (version, artifact path prefix) of the published generation. Indexes
+    built before versioning resolve to (None, index_path).
+    """
+    manifest = read_manifest(index_path)
+    if manifest is None:
+        return None, index_path
+    return manifest["version"], os.path.join(os.path.dirname(index_path), manifest["path"])
+
+
+def new_generation(index_path: str, copy_from: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Creates an unpublished generation directory and returns (version, artifact path
+    prefix). With `copy_from`, the artifacts of that generation are hard-linked in
+    first (copied where links are unsupported), so starting an incremental update costs
+    nothing however large the index is. Updates never change a linked file in place in
+    a way the source generation can see: sidecars and the FAISS index are rewritten to
+    a temporary file and renamed over the link, and the chunk store is only appended
+    past the rows the source generation refers to (orphaned appends are truncated back
+    by the next update).
+    """
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    directory = os.path.join(versions_dir(index_path), version)
+    os.makedirs(directory)
+    prefix = os.path.join(directory, os.path.basename(index_path))
+    if copy_from:
+        for suffix in ARTIFACT_SUFFIXES:
+            if os.path.exists(f"{copy_from}{suffix}"):
+                link_or_copy(f"{copy_from}{suffix}", f"{prefix}{suffix}")
+    return version, prefix
+
+
+def link_or_copy(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:  # Another filesystem, or one without hard links
+        shutil.copy2(source, target)
+
+
+def discard_generation(prefix: str):
+    """
+    Deletes an unpublished generation, e.g. after a failed or empty build.
+    """
+    shutil.rmtree(os.path.dirname(prefix), ignore_errors=True)
+
+
+def publish(index_path: str, version: str, prefix: str, keep: int = INDEX_KEEP_GENERATIONS) -> dict:
+    """
+    Points the manifest at a completed generation with a single atomic rename, so
+    readers see either the old generation or the new one, never a mix of files.
+    Older generations beyond the newest `keep` are then deleted; processes still
+    serving one keep their open files until they switch.
+    """
+    manifest = {
+        "version": version,
+        "path": os.path.relpath(prefix, os.path.dirname(index_path) or "."),
+        "published": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp_path = f"{manifest_path(index_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path(index_path))
+    prune_generations(index_path, version, keep)
+    return manifest
+
+
+def prune_generations(index_path: str, current: str, keep: int = INDEX_KEEP_GENERATIONS):
+    """
+    Deletes all but the newest `keep` generations (always keeping `current`).
+    Versions start with a UTC timestamp, so name order is age order.
+    """
+    directory = versions_dir(index_path)
+    if not os.path.isdir(directory):
+        return
+    versions = sorted(os.listdir(directory), reverse=True)
+    kept = {current, *versions[:max(keep, 1)]}
+    for version in versions:
+        if version not in kept:
+            shutil.rmtree(os.path.join(directory, version), ignore_errors=True)
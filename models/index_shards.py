@@ -0,0 +1,65 @@
+from typing import List, Optional
+import hashlib
+import json
+import os
+
+
+def shards_path(index_path: str) -> str:
+    return f"{index_path}_shards.json"
+
+
+def shard_index_path(index_path: str, shard: int) -> str:
+    """
+    Where shard `shard` of a sharded index lives. Each shard is a complete index of
+    its own (manifest, generations, chunk store and sidecars) under this path.
+    """
+    return f"{index_path}_shard{shard}"
+
+
+def shard_for(value: str, count: int) -> int:
+    """
+    The shard a partition key value belongs to. Uses a stable hash, unlike hash(), so
+    every build and update process assigns the same artwork to the same shard.
+    """
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def read_shard_layout(index_path: str) -> Optional[dict]:
+    """
+    How an index is partitioned: {"count", "key", "shards"}, where `shards` lists the
+    shard numbers that were built (a partition with no artworks has no index). None for
+    an unsharded index.
+    """
+    try:
+        with open(shards_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def shard_paths(index_path: str, layout: dict) -> List[str]:
+    return [shard_index_path(index_path, shard) for shard in layout["shards"]]
+
+
+def write_shard_layout(index_path: str, count: int, key: str, shards: List[int]) -> dict:
+    """
+    Records the shards of a completed build with an atomic rename, after every shard
+    has been published.
+    """
+    layout = {"count": count, "key": key, "shards": sorted(shards)}
+    tmp_path = f"{shards_path(index_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(layout, f, indent=2)
+    os.replace(tmp_path, shards_path(index_path))
+    return layout
+
+
+def remove_shard_layout(index_path: str):
+    """
+    Switches queries back to the unsharded index at `index_path` after a single-index build.
+    """
+    try:
+        os.remove(shards_path(index_path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,146 @@
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from config.config import EMBED_BATCH_SIZE, COMPACTION_THRESHOLD
+from models.embeddings import faiss, embed_batches, load_id_map, save_id_map, write_index
+from models.embedding_store import EmbeddingStore
+from models.index_factory import prepare_vectors
+from models.chunk_store import ChunkStore, ChunkStoreWriter, truncate_chunk_store
+from utils.pipeline import batched
+
+
+class IncrementalIndex:
+    """
+    Applies add / replace / delete updates to a saved index, keyed on stable artwork IDs.
+
+    Vectors are stored under chunk-store row IDs. A replace appends a new row and
+    tombstones the old one; a delete only tombstones. Only the changed artworks are
+    embedded, so update cost follows the size of the change. Tombstoned rows are
+    dropped when the index is loaded and reclaimed on disk by `compact`.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.id_map = load_id_map(index_path)
+        if self.id_map is None:
+            raise FileNotFoundError(
+                f"No ID map found at '{index_path}_ids.json'. Run a full 'python build_index.py' first."
+            )
+        self.index = faiss.read_index(f"{index_path}.index")
+        self._discard_orphan_rows()
+
+    def _discard_orphan_rows(self):
+        """
+        Truncates chunk rows appended by an update that crashed before saving the ID map.
+        """
+        truncate_chunk_store(self.index_path, self.id_map["next_row"], self.id_map["chunk_store_bytes"])
+
+    @property
+    def live_count(self) -> int:
+        return self.index.ntotal - len(self.id_map["tombstones"])
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return len(self.id_map["tombstones"]) / self.index.ntotal if self.index.ntotal else 0.0
+
+    def upsert(self, items: Iterable[Tuple[str, str]], batch_size: int = EMBED_BATCH_SIZE,
+               store: Optional[EmbeddingStore] = None) -> Tuple[int, int]:
+        """
+        Adds new artworks and replaces existing ones from (artwork_id, chunk) pairs.
+        With a `store`, chunk text embedded before is not encoded again.
+        Returns (added, replaced) counts.
+        """
+        rows = self.id_map["rows"]
+        added = replaced = 0
+        with ChunkStoreWriter(self.index_path, append=True) as writer:
+            for batch, embeddings in embed_batches(batched(items, batch_size), workers=1, store=store):
+                texts = [text for _, text in batch]
+                start_row = self.id_map["next_row"]
+                row_ids = np.arange(start_row, start_row + len(batch), dtype=np.int64)
+                self.index.add_with_ids(prepare_vectors(self.index, embeddings), row_ids)
+                writer.write(texts)
+
+                for (artwork_id, _), row in zip(batch, row_ids.tolist()):
+                    artwork_id = str(artwork_id)
+                    if artwork_id in rows:
+                        self.id_map["tombstones"].append(rows[artwork_id])
+                        replaced += 1
+                    else:
+                        added += 1
+                    rows[artwork_id] = row
+                self.id_map["next_row"] = start_row + len(batch)
+            self.id_map["chunk_store_bytes"] = writer.tell()
+        return added, replaced
+
+    def delete(self, artwork_ids: Iterable[str]) -> int:
+        """
+        Tombstones the given artworks. Unknown IDs are ignored; returns the number deleted.
+        """
+        rows = self.id_map["rows"]
+        deleted = 0
+        for artwork_id in artwork_ids:
+            row = rows.pop(str(artwork_id), None)
+            if row is not None:
+                self.id_map["tombstones"].append(row)
+                deleted += 1
+        return deleted
+
+    def save(self):
+        """
+        Persists the index, then the ID map. The ID map is written last so a crash in
+        between leaves only orphan rows that the next update discards.
+        """
+        write_index(self.index, self.index_path)
+        save_id_map(self.index_path, self.id_map)
+
+    def compact(self):
+        """
+        Rewrites the index and chunk store without tombstoned rows, renumbering rows
+        densely. Vectors are copied from the index, so nothing is re-embedded.
+        """
+        dead = set(self.id_map["tombstones"])
+        row_to_artwork = {row: artwork_id for artwork_id, row in self.id_map["rows"].items()}
+        compacted = faiss.clone_index(self.index)
+        compacted.reset()  # Keeps IVF training and index parameters
+        new_rows = {}
+
+        store = ChunkStore(self.index_path)
+        with ChunkStoreWriter(self.index_path) as writer:
+            live_rows: List[int] = []
+            live_texts: List[str] = []
+
+            def flush():
+                vectors = np.vstack([self.index.reconstruct(row) for row in live_rows])
+                new_ids = np.arange(writer.count, writer.count + len(live_rows), dtype=np.int64)
+                compacted.add_with_ids(prepare_vectors(compacted, vectors), new_ids)
+                for row, new_row in zip(live_rows, new_ids.tolist()):
+                    if row in row_to_artwork:
+                        new_rows[row_to_artwork[row]] = new_row
+                writer.write(live_texts)
+                live_rows.clear()
+                live_texts.clear()
+
+            for row in range(self.id_map["next_row"]):
+                if row in dead:
+                    continue
+                live_rows.append(row)
+                live_texts.append(store[row])
+                if len(live_rows) == EMBED_BATCH_SIZE:
+                    flush()
+            if live_rows:
+                flush()
+            store_bytes = writer.tell()
+            next_row = writer.count
+        store.close()
+
+        self.index = compacted
+        self.id_map.update(rows=new_rows, tombstones=[], next_row=next_row, chunk_store_bytes=store_bytes)
+        self.save()
+
+    def maybe_compact(self, threshold: float = COMPACTION_THRESHOLD) -> bool:
+        """
+        Compacts once tombstones make up more than `threshold` of the stored rows.
+        """
+        if self.tombstone_ratio > threshold:
+            self.compact()
+            return True
+        return False
@@ -0,0 +1,267 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import bisect
+import json
+import math
+import os
+import re
+import numpy as np
+from models.chunk_store import read_chunk_store
+
+# Fields indexed for lexical search, as they appear in chunks from format_artwork_chunk
+LEXICAL_FIELDS = ("Title", "Artist", "Medium")
+PLACEHOLDERS = {"unknown title", "unknown artist", "unknown medium"}
+
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "by", "describe", "did", "does", "for", "from", "how", "in", "is",
+    "it", "me", "made", "of", "on", "show", "tell", "that", "the", "this", "to", "was", "what", "which",
+    "who", "with",
+}
+
+# Leading phrases stripped from a question before trying it as an exact title or artist
+QUESTION_PREFIX = re.compile(
+    r"^(?:what|who|tell me|show me|describe|find)\b(?:\s+(?:is|are|was|were|about|made|painted|created))*\s+"
+)
+QUOTED = re.compile(r"[\"'“‘]([^\"'”’]{2,})[\"'”’]")
+TOKEN = re.compile(r"\w+")
+NO_POSTINGS = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))  # A term in no row
+
+
+def lexical_index_path(index_path: str) -> str:
+    return f"{index_path}_lexical.json"
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def normalise_name(text: str) -> str:
+    """
+    Key for exact title/artist lookup: case, punctuation and spacing are ignored.
+    """
+    return " ".join(TOKEN.findall(text.lower()))
+
+
+def chunk_fields(chunk: str) -> Dict[str, str]:
+    fields = {}
+    for line in chunk.splitlines():
+        key, separator, value = line.strip().partition(":")
+        if separator and key in LEXICAL_FIELDS and key not in fields:
+            fields[key] = value.strip()
+    return fields
+
+
+def chunk_terms(chunk: str) -> Tuple[List[str], Dict[str, str]]:
+    """
+    The BM25 tokens of a chunk and its exact-lookup names ({"Title"/"Artist": name},
+    placeholders left out).
+    """
+    fields = chunk_fields(chunk)
+    names = {}
+    for field in ("Title", "Artist"):
+        name = normalise_name(fields.get(field, ""))
+        if name and name not in PLACEHOLDERS:
+            names[field] = name
+    return tokenize(" ".join(fields.values())), names
+
+
+def build_lexical_index(index_path: str, skip_rows: Iterable[int] = ()) -> int:
+    """
+    Builds the BM25 inverted index and the exact title/artist maps over the chunk store
+    of a saved index, leaving out `skip_rows` (tombstones). Rows match the FAISS vector
+    IDs. Reads only the chunk store, so it is cheap to redo after every update.
+    Returns the number of rows indexed.
+    """
+    skip = set(skip_rows)
+    chunks = read_chunk_store(index_path)
+    postings: Dict[str, Dict[int, int]] = {}
+    lengths = [0] * len(chunks)
+    titles: Dict[str, List[int]] = {}
+    artists: Dict[str, List[int]] = {}
+    indexed = 0
+
+    for row, chunk in enumerate(chunks):
+        if row in skip:
+            continue
+        tokens, names = chunk_terms(chunk)
+        lengths[row] = len(tokens)
+        for token in tokens:
+            counts = postings.setdefault(token, {})
+            counts[row] = counts.get(row, 0) + 1
+        for field, name_rows in (("Title", titles), ("Artist", artists)):
+            if field in names:
+                name_rows.setdefault(names[field], []).append(row)
+        indexed += 1
+
+    data = {
+        "lengths": lengths,
+        "postings": {term: [list(counts), list(counts.values())] for term, counts in postings.items()},
+        "titles": titles,
+        "artists": artists,
+    }
+    save_lexical_index(index_path, data)
+    return indexed
+
+
+def update_lexical_index(index_path: str, add_rows: Iterable[int], remove_rows: Iterable[int]) -> int:
+    """
+    Patches the saved lexical index after an incremental update instead of rebuilding
+    it: `remove_rows` (newly tombstoned) leave the postings and name maps, `add_rows`
+    (newly appended) join them. Only those rows' chunks are read and tokenised, so the
+    cost follows the size of the change. Returns the number of rows patched.
+    """
+    with open(lexical_index_path(index_path), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    chunks = read_chunk_store(index_path)
+    lengths, postings = data["lengths"], data["postings"]
+    lengths.extend([0] * (len(chunks) - len(lengths)))  # One entry per stored row, as in a full build
+    name_maps = (("Title", data["titles"]), ("Artist", data["artists"]))
+    patched = 0
+
+    for row in remove_rows:
+        tokens, names = chunk_terms(chunks[row])
+        for token in set(tokens):
+            rows, counts = postings.get(token, ([], []))
+            position = bisect.bisect_left(rows, row)
+            if position < len(rows) and rows[position] == row:
+                del rows[position], counts[position]
+                if not rows:
+                    del postings[token]
+        for field, name_rows in name_maps:
+            if row in name_rows.get(names.get(field), ()):
+                name_rows[names[field]].remove(row)
+                if not name_rows[names[field]]:
+                    del name_rows[names[field]]
+        lengths[row] = 0
+        patched += 1
+
+    for row in sorted(add_rows):  # Appended rows come after every indexed one, keeping lists sorted
+        tokens, names = chunk_terms(chunks[row])
+        lengths[row] = len(tokens)
+        for token in tokens:
+            rows, counts = postings.setdefault(token, [[], []])
+            if rows and rows[-1] == row:
+                counts[-1] += 1
+            else:
+                rows.append(row)
+                counts.append(1)
+        for field, name_rows in name_maps:
+            if field in names:
+                name_rows.setdefault(names[field], []).append(row)
+        patched += 1
+
+    save_lexical_index(index_path, data)
+    return patched
+
+
+def save_lexical_index(index_path: str, data: dict):
+    tmp_path = f"{lexical_index_path(index_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, lexical_index_path(index_path))
+
+
+class LexicalIndex:
+    """
+    BM25 search over artwork title, artist and medium, plus an exact-name lookup that
+    answers questions naming a title or artist without any embedding.
+    """
+
+    def __init__(self, data: dict):
+        self.lengths = np.asarray(data["lengths"], dtype=np.float32)
+        live = self.lengths > 0
+        self.n_docs = int(live.sum())
+        self.avg_length = float(self.lengths[live].mean()) if self.n_docs else 0.0
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            term: (np.asarray(rows, dtype=np.int64), np.asarray(counts, dtype=np.float32))
+            for term, (rows, counts) in data["postings"].items()
+        }
+        self.titles: Dict[str, List[int]] = data["titles"]
+        self.artists: Dict[str, List[int]] = data["artists"]
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["LexicalIndex"]:
+        """
+        Loads the lexical sidecar of an index, or None for indexes built without one.
+        """
+        path = lexical_index_path(index_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def exact_match(self, query: str, limit: int, candidates: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Rows whose title, or else whose artist, is exactly named by the query: a quoted
+        span, the whole question, or the question without a leading "what is"/"who made".
+        With `candidates`, only those rows can match.
+        """
+        names_in_query = [normalise_name(span) for span in QUOTED.findall(query)]
+        whole = normalise_name(query)
+        names_in_query += [whole, QUESTION_PREFIX.sub("", whole)]
+        for names in (self.titles, self.artists):
+            rows: List[int] = []
+            seen: Set[int] = set()
+            for name in names_in_query:
+                for row in names.get(name, ()):
+                    if row not in seen:
+                        seen.add(row)
+                        rows.append(row)
+            if rows and candidates is not None:
+                rows = [row for row, allowed in zip(rows, np.isin(rows, candidates)) if allowed]
+            if rows:
+                return rows[:limit]
+        return []
+
+    def search(self, query: str, k: int, candidates: Optional[np.ndarray] = None,
+               min_score: float = 0.0) -> List[int]:
+        """
+        Top-k rows by BM25 score, best first, optionally among `candidates` only and
+        leaving out rows whose normalised score (see `scored_search`) is not above `min_score`.
+        """
+        return [row for row, _ in self.scored_search(query, k, candidates, min_score)]
+
+    def scored_search(self, query: str, k: int, candidates: Optional[np.ndarray] = None,
+                      min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        Like `search`, with each row's BM25 score normalised by the summed IDF of all the
+        query's terms (those in no row at their largest IDF): about 1 for a row naming
+        every term once, less for rows matching only some, or only the common ones.
+        """
+        if not self.n_docs:
+            return []
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        total_idf = 0.0
+        for term in set(tokenize(query)):
+            rows, counts = self.postings.get(term, NO_POSTINGS)
+            idf = math.log(1 + (self.n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            total_idf += idf
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[rows] / self.avg_length)
+            scores[rows] += idf * counts * (BM25_K1 + 1) / (counts + norm)
+        if not total_idf:
+            return []
+        scores /= total_idf
+        if candidates is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            allowed[candidates] = True
+            scores[~allowed] = 0
+        matched = np.flatnonzero(scores > min_score)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return list(zip(matched.tolist(), scores[matched].tolist()))
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int, rrf_k: int = 60) -> List[int]:
+    """
+    Merges ranked row lists: each row scores sum(1 / (rrf_k + rank)) over the lists it
+    appears in, so rows ranked well by several retrievers rise to the top.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=lambda row: -scores[row])[:k]
@@ -1,14 +1,110 @@
-import os
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 import requests
-from config.config import GROQ_API_KEY, LLM_MODEL
+from requests.adapters import HTTPAdapter
+from models.answer_cache import AnswerCache
+from models.context_builder import assemble_context
+from utils import telemetry
+from utils.lazy_import import lazy_import
+from utils.telemetry import LLM_REQUESTS, LLM_ERRORS, LLM_TOKENS, LLM_TTFT_SECONDS
+from config.config import (
+    require_groq_api_key, LLM_MODEL, LLM_API_URL, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_POOL_SIZE,
+    INDEX_PATH, ANSWER_CACHE_SIZE, ANSWER_CACHE_PATH, ANSWER_CACHE_DISK_SIZE, ANSWER_CACHE_TTL, CONTEXT_TOKEN_BUDGET,
+)
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+aiohttp = lazy_import("aiohttp")  # Only the HTTP service uses the async client
 
+GROQ_API_URL = LLM_API_URL
 
-def generate_llm(prompt: str, model: str = LLM_MODEL, mode: str = "concise") -> str:
+# Bump whenever build_messages or build_context_prompt changes, so answers cached under the old prompt are not reused
+PROMPT_VERSION = "2"
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_PATH, ttl=ANSWER_CACHE_TTL,
+                           max_disk_entries=ANSWER_CACHE_DISK_SIZE, index_path=INDEX_PATH)
+
+# One keep-alive session per process: repeat questions skip the TCP and TLS handshakes
+_session = None
+_session_lock = threading.Lock()
+
+
+class LLMMetrics:
     """
-    Generate a response using Groq API with the given prompt.
-    Mode can be 'concise' or 'detailed'.
+    Timings for one completion: time to first token (what the user waits before text
+    appears), total time, and decoding speed (after the first token when streamed).
+    """
+
+    def __init__(self, model: str, streamed: bool):
+        self.model = model
+        self.streamed = streamed
+        self.started_at = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.total: Optional[float] = None
+        self.tokens = 0
+        self.error: Optional[str] = None
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started_at
+
+    def finish(self, tokens: Optional[int] = None):
+        self.total = time.perf_counter() - self.started_at
+        if tokens is not None:
+            self.tokens = tokens
+        self._export()
+
+    def _export(self):
+        LLM_REQUESTS.inc(delivery="stream" if self.streamed else "plain")
+        LLM_TOKENS.inc(self.tokens)
+        if self.error:
+            LLM_ERRORS.inc()
+        elif self.ttft is not None:
+            LLM_TTFT_SECONDS.observe(self.ttft)
+            telemetry.record("llm_first_token", self.started_at, self.ttft)
+        telemetry.record("llm", self.started_at, self.total)
+
+    @property
+    def tokens_per_second(self) -> float:
+        if not self.tokens or self.total is None:
+            return 0.0
+        decode_time = self.total - (self.ttft or 0.0) if self.streamed else self.total
+        return self.tokens / decode_time if decode_time > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "streamed": self.streamed,
+            "ttft_s": self.ttft,
+            "total_s": self.total,
+            "tokens": self.tokens,
+            "tokens_per_s": self.tokens_per_second,
+            "error": self.error,
+        }
+
+
+# Metrics of the most recent requests, newest last
+recent_metrics: "deque[LLMMetrics]" = deque(maxlen=100)
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def build_messages(prompt: str, mode: str = "concise") -> list:
+    """
+    Chat messages for the prompt. Mode can be 'concise' or 'detailed'.
     """
     system_prompt = "You are a helpful and knowledgeable museum guide."
 
@@ -17,25 +113,221 @@ def generate_llm(prompt: str, model: str = LLM_MODEL, mode: str = "concise") ->
     elif mode == "detailed":
         system_prompt += " Provide detailed historical and artistic context."
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def build_context_prompt(query: str, context_chunks: List[str], token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    The user prompt for a question: the retrieved artwork chunks, compacted and packed
+    into `token_budget` (see assemble_context), then the question.
+    """
+    context = "\n---\n".join(assemble_context(context_chunks, token_budget))
+    return f"Use the following context to answer the user's question.\n---\n{context}\n---\nQuestion: {query}"
+
+
+def _post(payload: dict, api_url: str, stream: bool) -> requests.Response:
     headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Authorization": f"Bearer {require_groq_api_key()}",
         "Content-Type": "application/json"
     }
+    response = get_session().post(api_url, headers=headers, json=payload, stream=stream,
+                                  timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT))
+    response.raise_for_status()
+    return response
 
+
+def generate_llm(prompt: str, model: str = LLM_MODEL, mode: str = "concise", api_url: str = GROQ_API_URL,
+                 metrics: Optional[LLMMetrics] = None) -> str:
+    """
+    Generate a response using Groq API with the given prompt.
+    Mode can be 'concise' or 'detailed'.
+    """
     payload = {
         "model": model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
+        "messages": build_messages(prompt, mode)
     }
+    metrics = metrics or LLMMetrics(model, streamed=False)
+    recent_metrics.append(metrics)
 
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
+        response = _post(payload, api_url, stream=False)
         result = response.json()
-        return result["choices"][0]["message"]["content"]
-    except requests.exceptions.RequestException as e:
+        content = result["choices"][0]["message"]["content"]
+        metrics.first_token()  # The whole answer arrives at once
+        metrics.finish(result.get("usage", {}).get("completion_tokens"))
+        return content
+    except (requests.exceptions.RequestException, ValueError) as e:
+        metrics.error = str(e)
         return f"Error communicating with LLM API: {str(e)}"
     except Exception as e:
-        return f"An unexpected error occurred: {str(e)}"
\ No newline at end of file
+        metrics.error = str(e)
+        return f"An unexpected error occurred: {str(e)}"
+    finally:
+        if metrics.total is None:
+            metrics.finish()
+
+
+def sse_data(line: str) -> Optional[str]:
+    """
+    The payload of a server-sent event `data:` line; None for blank separators,
+    comments and keep-alives.
+    """
+    if not line or not line.startswith("data:"):
+        return None
+    return line[len("data:"):].strip()
+
+
+def iter_sse_events(response: requests.Response) -> Iterator[dict]:
+    """
+    Parses a server-sent event stream of OpenAI-style chat completion chunks,
+    stopping at the `[DONE]` sentinel. Lines are decoded as UTF-8, as the event-stream
+    format requires, rather than with requests' guess for a charset-less text/ type.
+    """
+    for line in response.iter_lines():
+        data = sse_data(line.decode("utf-8"))
+        if data is None:
+            continue
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+
+def event_content(event: dict) -> Tuple[List[str], Optional[int]]:
+    """
+    The text fragments of one streamed completion chunk, and its completion token
+    count when the chunk reports usage (providers send it on the final chunk, either
+    top-level or under x_groq).
+    """
+    usage = event.get("usage") or event.get("x_groq", {}).get("usage")
+    texts = [choice.get("delta", {}).get("content") for choice in event.get("choices", [])]
+    return [text for text in texts if text], usage.get("completion_tokens") if usage else None
+
+
+def stream_llm(prompt: str, model: str = LLM_MODEL, mode: str = "concise", api_url: str = GROQ_API_URL,
+               metrics: Optional[LLMMetrics] = None) -> Iterator[str]:
+    """
+    Generate a response like `generate_llm`, yielding text fragments as the model
+    produces them so the answer can be rendered incrementally. Errors are yielded as
+    a message, as `generate_llm` returns them. Pass `metrics` to read the timings
+    of this request afterwards.
+    """
+    payload = {
+        "model": model,
+        "messages": build_messages(prompt, mode),
+        "stream": True
+    }
+    metrics = metrics or LLMMetrics(model, streamed=True)
+    recent_metrics.append(metrics)
+    usage_tokens = None
+
+    try:
+        with _post(payload, api_url, stream=True) as response:
+            for event in iter_sse_events(response):
+                texts, tokens = event_content(event)
+                usage_tokens = tokens or usage_tokens
+                for text in texts:
+                    metrics.first_token()
+                    metrics.tokens += 1  # One content chunk per token, unless usage says otherwise
+                    yield text
+    except (requests.exceptions.RequestException, ValueError) as e:
+        metrics.error = str(e)
+        yield f"Error communicating with LLM API: {str(e)}"
+    except Exception as e:
+        metrics.error = str(e)
+        yield f"An unexpected error occurred: {str(e)}"
+    finally:
+        metrics.finish(usage_tokens)
+
+
+# Async client for the HTTP service: the same requests and error handling as above, over
+# an aiohttp session so many answers can be in flight on one event loop.
+
+def new_async_session(connections: int = LLM_POOL_SIZE) -> "aiohttp.ClientSession":
+    """
+    A keep-alive aiohttp session with the same timeouts as the requests session,
+    holding up to `connections` concurrent requests. Must be created (and closed) on
+    the event loop that uses it.
+    """
+    connector = aiohttp.TCPConnector(limit=connections)
+    timeout = aiohttp.ClientTimeout(sock_connect=LLM_CONNECT_TIMEOUT, sock_read=LLM_READ_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {require_groq_api_key()}",
+        "Content-Type": "application/json"
+    }
+
+
+async def agenerate_llm(session: "aiohttp.ClientSession", prompt: str, model: str = LLM_MODEL, mode: str = "concise",
+                        api_url: str = GROQ_API_URL, metrics: Optional[LLMMetrics] = None) -> str:
+    """
+    `generate_llm` without blocking the event loop.
+    """
+    payload = {
+        "model": model,
+        "messages": build_messages(prompt, mode)
+    }
+    metrics = metrics or LLMMetrics(model, streamed=False)
+    recent_metrics.append(metrics)
+
+    try:
+        async with session.post(api_url, headers=_headers(), json=payload) as response:
+            response.raise_for_status()
+            result = await response.json()
+        content = result["choices"][0]["message"]["content"]
+        metrics.first_token()
+        metrics.finish(result.get("usage", {}).get("completion_tokens"))
+        return content
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        metrics.error = str(e) or type(e).__name__
+        return f"Error communicating with LLM API: {metrics.error}"
+    except Exception as e:
+        metrics.error = str(e)
+        return f"An unexpected error occurred: {str(e)}"
+    finally:
+        if metrics.total is None:
+            metrics.finish()
+
+
+async def astream_llm(session: "aiohttp.ClientSession", prompt: str, model: str = LLM_MODEL, mode: str = "concise",
+                      api_url: str = GROQ_API_URL, metrics: Optional[LLMMetrics] = None) -> AsyncIterator[str]:
+    """
+    `stream_llm` without blocking the event loop.
+    """
+    payload = {
+        "model": model,
+        "messages": build_messages(prompt, mode),
+        "stream": True
+    }
+    metrics = metrics or LLMMetrics(model, streamed=True)
+    recent_metrics.append(metrics)
+    usage_tokens = None
+
+    try:
+        async with session.post(api_url, headers=_headers(), json=payload) as response:
+            response.raise_for_status()
+            async for raw in response.content:
+                data = sse_data(raw.decode("utf-8").strip())
+                if data is None:
+                    continue
+                if data == "[DONE]":
+                    break
+                texts, tokens = event_content(json.loads(data))
+                usage_tokens = tokens or usage_tokens
+                for text in texts:
+                    metrics.first_token()
+                    metrics.tokens += 1
+                    yield text
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        metrics.error = str(e) or type(e).__name__
+        yield f"Error communicating with LLM API: {metrics.error}"
+    except Exception as e:
+        metrics.error = str(e)
+        yield f"An unexpected error occurred: {str(e)}"
+    finally:
+        metrics.finish(usage_tokens)
@@ -0,0 +1,228 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import bisect
+import json
+import os
+import re
+import numpy as np
+from models.lexical_index import tokenize
+
+# Tokens of a Met date string, left to right: an ordinal century ("late 19th century"),
+# a year or decade ("1515", "1850s"), or an era marker ("B.C.", "A.D.")
+DATE_TOKEN = re.compile(
+    r"(?:(?P<modifier>(?i:early|mid|late)(?:\s+to\s+(?i:early|mid|late))?)[\s-]+)?"
+    r"(?P<century>\d{1,2})(?:st|nd|rd|th)\b(?:[\s-]+(?i:century|centuries))?"
+    r"|(?P<year>\d{1,4})(?P<decade>s\b)?"
+    r"|(?P<era>B\.\s?C\.(?:E\.)?|BCE|A\.\s?D\.|AD|CE)"
+)
+CENTURY_PARTS = {"early": (0, 33), "mid": (33, 66), "late": (66, 99), None: (0, 99)}
+
+
+def filter_index_path(index_path: str) -> str:
+    return f"{index_path}_filters.json"
+
+
+def parse_year_range(text: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Parses a Met date string into an inclusive (start, end) year range, with years B.C.
+    negative: "ca. 1515" -> (1515, 1515), "332–30 B.C." -> (-332, -30),
+    "ca. 1515–20" -> (1515, 1520), "late 19th–early 20th century" -> (1866, 1933),
+    "early to mid-14th century" -> (1300, 1366).
+    An era marker applies to the preceding numbers that have none. Returns None when
+    the string holds no recognisable date.
+    """
+    if not text:
+        return None
+    spans: List[dict] = []
+    for match in DATE_TOKEN.finditer(text):
+        if match.group("era"):
+            era = "BC" if match.group("era").startswith("B") else "AD"
+            for span in reversed(spans):
+                if span["era"]:
+                    break
+                span["era"] = era
+            continue
+        if match.group("century"):
+            parts = (match.group("modifier") or "").lower().split(" to ")
+            spans.append({"century": int(match.group("century")), "parts": (parts[0] or None, parts[-1] or None),
+                          "era": None})
+        else:
+            year = match.group("year")
+            spans.append({"year": int(year), "digits": len(year), "decade": bool(match.group("decade")), "era": None})
+    if not spans:
+        return None
+
+    ranges = []
+    previous = None
+    for span in spans:
+        bc = span["era"] == "BC"
+        if "century" in span:
+            low, high = CENTURY_PARTS[span["parts"][0]][0], CENTURY_PARTS[span["parts"][1]][1]
+            first = (span["century"] - 1) * 100
+            start, end = (-(first + 100 - low), -(first + 100 - high)) if bc else (first + low, first + high)
+            if bc and high == 99:
+                end = -(first + 1)  # 2nd century B.C. runs 200-101 B.C.
+        else:
+            year = span["year"]
+            if (not bc and previous is not None and "year" in previous and previous["era"] != "BC"
+                    and span["digits"] < previous["digits"] and year < previous["year"]):
+                # Abbreviated end year: "1515–20" means 1515 to 1520
+                scale = 10 ** span["digits"]
+                year += previous["year"] // scale * scale
+                if year < previous["year"]:
+                    year += scale
+            width = 9 if span["decade"] else 0
+            start, end = (-(year + width), -year) if bc else (year, year + width)
+        ranges.append((start, end))
+        previous = span
+    return min(start for start, _ in ranges), max(end for _, end in ranges)
+
+
+def record_filter_fields(data: dict) -> Tuple[str, str, Optional[Tuple[int, int]]]:
+    """
+    The filterable fields of an artwork record: artist, medium and year range. The
+    range recorded at ingest is used when present, otherwise the date string is parsed.
+    """
+    year_range = data.get("year_range")
+    if not year_range:
+        year_range = parse_year_range(data.get("date"))
+    return data.get("artist") or "", data.get("medium") or "", tuple(year_range) if year_range else None
+
+
+class MetadataFilter:
+    """
+    Structured constraints on retrieved artworks. Every given field must hold: all words
+    of `artist` / `medium` appear in the artwork's artist / medium, and its date range
+    lies within [year_from, year_to] (years B.C. are negative; undated artworks never match).
+    """
+
+    def __init__(self, artist: Optional[str] = None, medium: Optional[str] = None,
+                 year_from: Optional[int] = None, year_to: Optional[int] = None):
+        self.artist = artist or None
+        self.medium = medium or None
+        self.year_from = year_from
+        self.year_to = year_to
+
+    @classmethod
+    def parse(cls, artist: str = "", medium: str = "", year_from: str = "", year_to: str = "") -> "MetadataFilter":
+        """
+        Filter from user-entered text; years accept Met-style dates such as "500 B.C.".
+        """
+        start = parse_year_range(year_from)
+        end = parse_year_range(year_to)
+        return cls(artist.strip(), medium.strip(), start[0] if start else None, end[1] if end else None)
+
+    def is_empty(self) -> bool:
+        return self.artist is None and self.medium is None and self.year_from is None and self.year_to is None
+
+    def __repr__(self) -> str:
+        return (f"MetadataFilter(artist={self.artist!r}, medium={self.medium!r}, "
+                f"year_from={self.year_from!r}, year_to={self.year_to!r})")
+
+
+def build_filter_index(index_path: str, rows: Iterable[Tuple[int, Tuple[str, str, Optional[Tuple[int, int]]]]],
+                       n_rows: int) -> int:
+    """
+    Writes the columnar filter index for the live rows of an index: begin/end year
+    columns indexed by row, plus inverted token postings for artist and medium.
+    `rows` yields (row, record_filter_fields(record)). Returns the number of rows indexed.
+    """
+    begin: List[Optional[int]] = [None] * n_rows
+    end: List[Optional[int]] = [None] * n_rows
+    live: List[int] = []
+    artists: Dict[str, List[int]] = {}
+    media: Dict[str, List[int]] = {}
+
+    for row, (artist, medium, year_range) in sorted(rows):
+        live.append(row)
+        if year_range:
+            begin[row], end[row] = year_range
+        for text, postings in ((artist, artists), (medium, media)):
+            for token in set(tokenize(text)):
+                postings.setdefault(token, []).append(row)
+
+    data = {"begin": begin, "end": end, "live": live, "artists": artists, "media": media}
+    save_filter_index(index_path, data)
+    return len(live)
+
+
+def update_filter_index(index_path: str, rows: Iterable[Tuple[int, Tuple[str, str, Optional[Tuple[int, int]]]]],
+                        remove_rows: Iterable[int], n_rows: int) -> int:
+    """
+    Patches the saved filter index after an incremental update instead of rebuilding
+    it from every record: `rows` (newly appended, as for `build_filter_index`) join the
+    columns and postings, and `remove_rows` (newly tombstoned) leave the columns. The
+    postings of removed rows stay behind harmlessly, since only live rows are ever
+    candidates, until the next compaction rebuilds the index. Returns the number of
+    rows patched.
+    """
+    with open(filter_index_path(index_path), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for column in (data["begin"], data["end"]):
+        column.extend([None] * (n_rows - len(column)))
+    live = data["live"]
+    patched = 0
+
+    for row in remove_rows:
+        position = bisect.bisect_left(live, row)
+        if position < len(live) and live[position] == row:
+            del live[position]
+            data["begin"][row] = data["end"][row] = None
+            patched += 1
+    for row, (artist, medium, year_range) in sorted(rows):
+        bisect.insort(live, row)
+        if year_range:
+            data["begin"][row], data["end"][row] = year_range
+        for text, postings in ((artist, data["artists"]), (medium, data["media"])):
+            for token in set(tokenize(text)):
+                postings.setdefault(token, []).append(row)
+        patched += 1
+
+    save_filter_index(index_path, data)
+    return patched
+
+
+def save_filter_index(index_path: str, data: dict):
+    tmp_path = f"{filter_index_path(index_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, filter_index_path(index_path))
+
+
+class FilterIndex:
+    """
+    Resolves a MetadataFilter to the sorted row IDs that satisfy it, with vectorised
+    column comparisons and posting-list intersections; no vectors are touched.
+    """
+
+    def __init__(self, data: dict):
+        self.begin = np.array([np.nan if year is None else year for year in data["begin"]], dtype=np.float64)
+        self.end = np.array([np.nan if year is None else year for year in data["end"]], dtype=np.float64)
+        self.live = np.zeros(len(self.begin), dtype=bool)
+        self.live[np.asarray(data["live"], dtype=np.int64)] = True
+        self.artists = {token: np.asarray(rows, dtype=np.int64) for token, rows in data["artists"].items()}
+        self.media = {token: np.asarray(rows, dtype=np.int64) for token, rows in data["media"].items()}
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["FilterIndex"]:
+        """
+        Loads the filter sidecar of an index, or None for indexes built without one.
+        """
+        path = filter_index_path(index_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def candidates(self, filters: MetadataFilter) -> np.ndarray:
+        mask = self.live.copy()
+        for text, postings in ((filters.artist, self.artists), (filters.medium, self.media)):
+            for token in tokenize(text or ""):
+                matches = np.zeros_like(mask)
+                matches[postings.get(token, np.zeros(0, dtype=np.int64))] = True
+                mask &= matches
+        with np.errstate(invalid="ignore"):  # NaN (undated) compares False
+            if filters.year_from is not None:
+                mask &= self.begin >= filters.year_from
+            if filters.year_to is not None:
+                mask &= self.end <= filters.year_to
+        return np.flatnonzero(mask).astype(np.int64)
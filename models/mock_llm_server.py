@@ -0,0 +1,127 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for an OpenAI-compatible chat completions endpoint (e.g. Groq),
+# answering both plain and `"stream": true` requests, the latter as server-sent events
+# with a configurable delay before the first token and between tokens. With a prefill
+# rate, the first token also waits for the prompt to be "read", as real endpoints do:
+#
+#   python -m models.mock_llm_server --port 8766 --ttft 0.3 --token-delay 0.02 --prefill-rate 2000
+#   LLM_API_URL=http://127.0.0.1:8766/openai/v1/chat/completions GROQ_API_KEY=test streamlit run app.py
+
+DEFAULT_ANSWER = (
+    "This artwork is a fine example of its period, showing the materials and techniques "
+    "the catalogue record describes. Look closely at the surface to see how the artist worked, "
+    "as you would in front of a Cézanne."
+)
+
+def completion_tokens(text):
+    """Splits an answer into word-sized tokens, keeping the spaces."""
+    words = text.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    # Keep-alive so the client's pooled session is actually reused
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # Non-ASCII text goes out as raw UTF-8, not \u escapes, as real endpoints send it
+    def _send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_event(self, body):
+        data = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+        self._write_chunk(f"data: {data}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, payload):
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        server = self.server
+        server.request_count += 1
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        model = request.get("model", "mock")
+        tokens = completion_tokens(server.answer)
+        # About four characters per prompt token
+        prompt_tokens = sum(len(message.get("content", "")) for message in request.get("messages", [])) // 4
+
+        time.sleep(server.ttft + (prompt_tokens / server.prefill_rate if server.prefill_rate else 0))
+        if not request.get("stream"):
+            time.sleep(server.token_delay * len(tokens))
+            self._send_json(200, {
+                "id": f"mock-{server.request_count}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": server.answer},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = {"id": f"mock-{server.request_count}", "object": "chat.completion.chunk", "model": model}
+        self._send_event({**chunk, "choices": [{"index": 0, "delta": {"role": "assistant"}}]})
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(server.token_delay)
+            self._send_event({**chunk, "choices": [{"index": 0, "delta": {"content": token}}]})
+        self._send_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                          "x_groq": {"usage": {"prompt_tokens": prompt_tokens,
+                                                "completion_tokens": len(tokens)}}})
+        self._send_event("[DONE]")
+        self._write_chunk(b"")  # Zero-length chunk ends the response
+
+def start_mock_server(port=0, answer=DEFAULT_ANSWER, ttft=0.2, token_delay=0.01, prefill_rate=0.0):
+    """
+    Starts the stand-in endpoint on a background thread and returns (server, api_url).
+    Call `server.shutdown()` when finished.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockLLMHandler)
+    server.daemon_threads = True
+    server.answer = answer
+    server.ttft = ttft
+    server.token_delay = token_delay
+    server.prefill_rate = prefill_rate
+    server.request_count = 0
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, bound_port = server.server_address[:2]
+    return server, f"http://{host}:{bound_port}/openai/v1/chat/completions"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for an OpenAI-compatible chat endpoint.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--prefill-rate", type=float, default=0.0,
+                        help="Prompt tokens read per second before the first token; 0 = instant")
+    args = parser.parse_args()
+
+    server, api_url = start_mock_server(args.port, ttft=args.ttft, token_delay=args.token_delay,
+                                        prefill_rate=args.prefill_rate)
+    print(f"✅ Mock LLM endpoint listening on {api_url}. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,54 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+import multiprocessing as mp
+import os
+import numpy as np
+from config.config import EMBEDDING_BACKEND, EMBEDDING_THREADS
+from models.embedding_backends import load_embedding_model
+
+# Set in each worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(backend: str, threads: int):
+    global _worker_model
+    _worker_model = load_embedding_model(backend, threads)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    embeddings = _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+class EmbeddingPool:
+    """
+    Process pool for embedding large builds on many cores. Each worker loads the model
+    once and encodes whole batches; embed_batches collects the results in submission
+    order, so row IDs are assigned exactly as in a single-process build.
+
+    CPU threads are split between workers (unless EMBEDDING_THREADS or `threads` is
+    set) so the pool does not oversubscribe the machine.
+    """
+
+    def __init__(self, workers: int, backend: str = EMBEDDING_BACKEND, threads: Optional[int] = None):
+        self.workers = workers
+        threads = threads or EMBEDDING_THREADS or max(1, (os.cpu_count() or 1) // workers)
+        # Spawned workers start clean instead of inheriting the parent's torch state
+        self._executor = ProcessPoolExecutor(
+            workers, mp_context=mp.get_context("spawn"), initializer=_init_worker, initargs=(backend, threads)
+        )
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Encodes one batch on a worker; the future's result is its float32 vectors.
+        """
+        return self._executor.submit(_encode, texts)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import Optional
+import sqlite3
+import threading
+import numpy as np
+
+
+def normalise_query(query: str) -> str:
+    """
+    Cache key for a query: case and whitespace differences do not change the embedding
+    enough to matter for retrieval.
+    """
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings, with an optional SQLite tier on disk that
+    survives restarts and is shared by processes pointing at the same file.
+
+    Entries are namespaced (e.g. by embedding model) so a model change never serves
+    stale vectors. Returned arrays are read-only because they are shared between callers.
+    """
+
+    def __init__(self, max_entries: int, persist_path: Optional[str] = None, namespace: str = ""):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")  # Lets several app processes share the file
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "namespace TEXT, query TEXT, dtype TEXT, vector BLOB, PRIMARY KEY (namespace, query))"
+            )
+            self._db.commit()
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        key = normalise_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT dtype, vector FROM query_embeddings WHERE namespace = ? AND query = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[1], dtype=row[0])  # frombuffer arrays are read-only
+                    self._insert(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, vector: np.ndarray):
+        key = normalise_query(query)
+        vector = np.array(vector)
+        vector.flags.writeable = False
+        with self._lock:
+            self._insert(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, vector.dtype.str, vector.tobytes()),
+                )
+                self._db.commit()
+
+    def _insert(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """
+        Drops every cached vector in this namespace, from memory and from the SQLite tier.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
@@ -1,95 +1,311 @@
 import requests
+import asyncio
+import argparse
 import json
+import random
 import time
 import os
 import sys
+# The ingest checkpoint is shared with the website scraper, so run this from the
+# repository root: python -m neostats.data.met_scraper
+from utils.ingest_checkpoint import IngestCheckpoint, artwork_id, compact_jsonl
 
 # --- CONFIGURATION ---
 # The Met's official API endpoints
-SEARCH_ENDPOINT = "https://collectionapi.metmuseum.org/public/collection/v1/search"
-OBJECT_DETAIL_ENDPOINT = "https://collectionapi.metmuseum.org/public/collection/v1/objects/"
+API_BASE_URL = "https://collectionapi.metmuseum.org/public/collection/v1"
+SEARCH_ENDPOINT = f"{API_BASE_URL}/search"
+OBJECT_DETAIL_ENDPOINT = f"{API_BASE_URL}/objects/"
 MAX_ARTWORKS_TO_FETCH = 50 # You can increase this number to get more data
 
-def get_artwork_ids():
+# Async fetch engine settings. The Met asks clients to stay under 80 requests/second.
+FETCH_CONCURRENCY = 16      # Maximum number of requests in flight at once
+FETCH_RATE_LIMIT = 60.0     # Sustained requests per second (token bucket refill rate)
+FETCH_BURST = 10            # Token bucket capacity, i.e. the largest burst allowed
+FETCH_MAX_RETRIES = 4       # Attempts after the first one before giving up on an object
+FETCH_BACKOFF_BASE = 0.5    # Seconds; doubled on every retry, plus jitter
+FETCH_TIMEOUT = 15          # Seconds per request
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+def get_artwork_ids(base_url=API_BASE_URL, max_artworks=MAX_ARTWORKS_TO_FETCH):
     """Gets a pre-filtered list of artwork IDs using the search endpoint."""
     print("➡️ Step 1: Searching for highlighted, public domain artworks via the Met API...")
-    
+
     # This query searches for artworks that are highlighted and in the public domain
     params = {
         'q': 'a',  # A general query to get a broad set of results
         'isHighlight': 'true',
         'isPublicDomain': 'true'
     }
-    
+
     try:
-        response = requests.get(SEARCH_ENDPOINT, params=params, timeout=20)
+        response = requests.get(f"{base_url}/search", params=params, timeout=20)
         response.raise_for_status()
         data = response.json()
-        object_ids = data.get("objectIDs", [])
-        
+        object_ids = data.get("objectIDs") or []
+
         if not object_ids:
             print("❌ Error: API search returned no artwork IDs for the query.")
             return []
-            
-        print(f"✅ Found {len(object_ids)} relevant artworks. Fetching details for the first {MAX_ARTWORKS_TO_FETCH}.")
-        # Return a slice of the IDs found
-        return object_ids[:MAX_ARTWORKS_TO_FETCH]
-        
+
+        if max_artworks:
+            print(f"✅ Found {len(object_ids)} relevant artworks. Fetching details for the first {max_artworks}.")
+            # Return a slice of the IDs found
+            return object_ids[:max_artworks]
+
+        print(f"✅ Found {len(object_ids)} relevant artworks. Fetching details for all of them.")
+        return object_ids
+
     except requests.exceptions.RequestException as e:
         print(f"❌ API request failed: {e}")
         return []
 
-def get_artwork_details(object_id):
+def format_artwork(data):
+    """Converts a raw Met API object record into the fields we store in the JSONL file."""
+    # We can be confident these conditions will be met because of our search query
+    return {
+        "object_id": data.get("objectID"),
+        "title": data.get("title", "No Title"),
+        "artist": data.get("artistDisplayName", "Unknown Artist"),
+        "date": data.get("objectDate", "Unknown Date"),
+        # Numeric years (negative for B.C.) for date-range filters
+        "year_range": [data["objectBeginDate"], data["objectEndDate"]] if "objectBeginDate" in data else None,
+        "medium": data.get("medium", "Unknown Medium"),
+        # Use a more descriptive field if available, otherwise fallback
+        "description": data.get("creditLine", data.get("objectName", "No Description")),
+        "url": data.get("objectURL", "")
+    }
+
+def get_artwork_details(object_id, base_url=API_BASE_URL):
     """Fetches and processes details for a single artwork ID."""
-    detail_url = f"{OBJECT_DETAIL_ENDPOINT}{object_id}"
+    detail_url = f"{base_url}/objects/{object_id}"
     try:
         response = requests.get(detail_url, timeout=15)
         response.raise_for_status()
-        data = response.json()
+        return format_artwork(response.json())
 
-        # We can be confident these conditions will be met because of our search query
-        return {
-            "title": data.get("title", "No Title"),
-            "artist": data.get("artistDisplayName", "Unknown Artist"),
-            "date": data.get("objectDate", "Unknown Date"),
-            "medium": data.get("medium", "Unknown Medium"),
-            # Use a more descriptive field if available, otherwise fallback
-            "description": data.get("creditLine", data.get("objectName", "No Description")),
-            "url": data.get("objectURL", "")
-        }
-        
     except requests.exceptions.RequestException:
         return None # Skip if an individual request fails
 
-def main(output_path="data/met_artworks.jsonl"):
-    """Main function to run the data fetching process."""
-    os.makedirs("data", exist_ok=True)
-    
-    artwork_ids = get_artwork_ids()
-    
+def get_updated_ids(since, base_url=API_BASE_URL):
+    """
+    Returns the set of object IDs whose metadata changed on or after `since`
+    (an ISO timestamp), or None if the API could not tell us.
+    """
+    params = {"metadataDate": since[:10]}
+    try:
+        response = requests.get(f"{base_url}/objects", params=params, timeout=20)
+        response.raise_for_status()
+        return set(response.json().get("objectIDs") or [])
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Could not list updated objects ({e}); re-checking every known artwork.")
+        return None
+
+def save_artwork(f, checkpoint, details, stats):
+    """Appends a fetched record unless the checkpoint shows it is unchanged."""
+    key = artwork_id(details)
+    status = checkpoint.classify(key, details) if checkpoint else "added"
+    if status == "unchanged":
+        stats["unchanged"] += 1
+        return
+    offset = f.tell()
+    f.write(json.dumps(details, ensure_ascii=False) + "\n")
+    f.flush()
+    if checkpoint:
+        checkpoint.mark(key, details, status, offset)
+    stats["saved"] += 1
+
+# ---------------------------
+# Async fetch engine
+# ---------------------------
+class TokenBucket:
+    """
+    Asyncio token bucket: allows bursts of up to `capacity` requests and
+    refills at `rate` tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        if capacity < 1:
+            raise ValueError(f"Token bucket capacity must be at least 1, got {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and consumes it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def _backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, honouring a server-sent Retry-After."""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return FETCH_BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random() / 2)
+
+async def fetch_artwork_details(session, object_id, bucket, base_url=API_BASE_URL, max_retries=FETCH_MAX_RETRIES):
+    """
+    Async counterpart of get_artwork_details. Retries rate-limited, server-side
+    and network failures with backoff; returns None when the object cannot be fetched.
+    """
+    import aiohttp
+
+    detail_url = f"{base_url}/objects/{object_id}"
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        retry_after = None
+        try:
+            async with session.get(detail_url) as response:
+                if response.status == 200:
+                    return format_artwork(await response.json(content_type=None))
+                if response.status not in RETRYABLE_STATUSES:
+                    return None # Missing or forbidden objects will not appear on a retry
+                retry_after = response.headers.get("Retry-After")
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError):
+            pass
+
+        if attempt < max_retries:
+            await asyncio.sleep(_backoff_delay(attempt, retry_after))
+    return None
+
+async def fetch_all_artworks(object_ids, output_file, base_url=API_BASE_URL,
+                             concurrency=FETCH_CONCURRENCY, rate=FETCH_RATE_LIMIT,
+                             burst=FETCH_BURST, max_retries=FETCH_MAX_RETRIES, timeout=FETCH_TIMEOUT,
+                             checkpoint=None):
+    """
+    Fetches details for every object ID over one pooled keep-alive connection set,
+    with at most `concurrency` requests in flight and a token-bucket rate limit.
+    Each record is written to `output_file` (an open text file) as soon as it arrives,
+    so the output order follows completion order rather than `object_ids` order.
+    Returns a stats dict with "saved" and "unchanged" counts and the "failed" IDs.
+    """
+    import aiohttp
+
+    bucket = TokenBucket(rate, burst)
+    queue = asyncio.Queue()
+    for object_id in object_ids:
+        queue.put_nowait(object_id)
+
+    stats = {"saved": 0, "unchanged": 0, "failed": []}
+    total = len(object_ids)
+
+    async def worker(session):
+        while True:
+            try:
+                object_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            details = await fetch_artwork_details(session, object_id, bucket, base_url, max_retries)
+            if details:
+                save_artwork(output_file, checkpoint, details, stats)
+            else:
+                stats["failed"].append(object_id)
+            done = stats["saved"] + stats["unchanged"] + len(stats["failed"])
+            if done % 100 == 0 or done == total:
+                print(f"  - ({done}/{total}) fetched, {len(stats['failed'])} failed")
+
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=30)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        await asyncio.gather(*(worker(session) for _ in range(min(concurrency, total) or 1)))
+
+    output_file.flush()
+    return stats
+
+def main(output_path="data/met_artworks.jsonl", base_url=API_BASE_URL, max_artworks=MAX_ARTWORKS_TO_FETCH,
+         use_async=True, concurrency=FETCH_CONCURRENCY, rate=FETCH_RATE_LIMIT,
+         incremental=True, refresh=False):
+    """
+    Main function to run the data fetching process.
+    In incremental mode, object IDs already in the checkpoint are skipped unless the API
+    reports their metadata changed since the last completed run (or `refresh` is set);
+    only new or changed records are appended and a delta manifest is written.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    artwork_ids = get_artwork_ids(base_url=base_url, max_artworks=max_artworks)
+
     if not artwork_ids:
         print("❌ Critical Error: Could not get any artwork IDs. Aborting.")
         sys.exit(1)
-        
+
+    if not incremental and os.path.exists(f"{output_path}.checkpoint"):
+        os.remove(f"{output_path}.checkpoint")
+    checkpoint = IngestCheckpoint(output_path)
+
+    if incremental and not refresh:
+        updated_ids = get_updated_ids(checkpoint.last_completed, base_url) if checkpoint.last_completed else set()
+        to_fetch = [i for i in artwork_ids
+                    if i not in checkpoint or updated_ids is None or i in updated_ids]
+        print(f"ℹ️ Checkpoint: {len(artwork_ids) - len(to_fetch)} artworks already up to date.")
+        artwork_ids = to_fetch
+
     print(f"\n➡️ Step 2: Fetching details for {len(artwork_ids)} artworks...")
-    
-    artwork_count = 0
-    with open(output_path, "w", encoding="utf-8") as f:
-        for i, object_id in enumerate(artwork_ids):
-            # Simple progress indicator
-            print(f"  - ({i+1}/{len(artwork_ids)}) Fetching object ID: {object_id}")
-            details = get_artwork_details(object_id)
-            
-            if details:
-                f.write(json.dumps(details, ensure_ascii=False) + "\n")
-                artwork_count += 1
-            
-            time.sleep(0.1) # Brief pause to be respectful to the API server
 
+    stats = {"saved": 0, "unchanged": 0, "failed": []}
+    start = time.perf_counter()
+    with open(output_path, "a" if incremental else "w", encoding="utf-8") as f:
+        if use_async:
+            stats = asyncio.run(
+                fetch_all_artworks(artwork_ids, f, base_url=base_url, concurrency=concurrency, rate=rate,
+                                   checkpoint=checkpoint)
+            )
+        else:
+            for i, object_id in enumerate(artwork_ids):
+                # Simple progress indicator
+                print(f"  - ({i+1}/{len(artwork_ids)}) Fetching object ID: {object_id}")
+                details = get_artwork_details(object_id, base_url=base_url)
+
+                if details:
+                    save_artwork(f, checkpoint, details, stats)
+                else:
+                    stats["failed"].append(object_id)
+
+                time.sleep(0.1) # Brief pause to be respectful to the API server
+    elapsed = time.perf_counter() - start
+
+    delta = checkpoint.finish(failed=stats["failed"], unchanged=stats["unchanged"])
+    if delta["changed"]:
+        # Drop the superseded versions of changed records
+        compact_jsonl(output_path, key_fn=artwork_id)
+
+    artwork_count = stats["saved"]
     if artwork_count > 0:
-        print(f"\n✅ Success! Saved data for {artwork_count} artworks to {output_path}")
-    else:
+        print(f"\n✅ Success! Saved data for {artwork_count} artworks to {output_path} "
+              f"in {elapsed:.1f}s ({artwork_count / elapsed:.1f} objects/sec)")
+        print(f"   Delta: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+              f"{stats['unchanged']} unchanged, {len(stats['failed'])} failed")
+    elif artwork_ids and not stats["unchanged"]:
         print("\n❌ Warning: Finished without saving any artwork data. There may be a temporary API issue.")
+    else:
+        print("\n✅ No new or changed artworks; the dataset is already up to date.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch artwork records from the Met Collection API.")
+    parser.add_argument("--output", default="data/met_artworks.jsonl", help="JSONL file to write")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="API root, e.g. a local stand-in server")
+    parser.add_argument("--max", type=int, default=MAX_ARTWORKS_TO_FETCH, help="Maximum artworks to fetch (0 = all)")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY, help="Requests in flight at once")
+    parser.add_argument("--rate", type=float, default=FETCH_RATE_LIMIT, help="Requests per second")
+    parser.add_argument("--sync", action="store_true", help="Use the original one-at-a-time fetcher")
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch known artworks and keep only changed ones")
+    parser.add_argument("--full", action="store_true", help="Discard the checkpoint and rewrite the output file")
+    args = parser.parse_args()
+
+    main(output_path=args.output, base_url=args.base_url, max_artworks=args.max,
+         use_async=not args.sync, concurrency=args.concurrency, rate=args.rate,
+         incremental=not args.full, refresh=args.refresh)
@@ -0,0 +1,120 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# A local stand-in for the Met Collection API, serving the same `/search` and
+# `/objects/{id}` routes so met_scraper.py can be exercised offline:
+#
+#   python neostats/data/mock_met_api.py --port 8765 --objects 5000 --latency 0.05 --fail-rate 0.1
+#   python -m neostats.data.met_scraper --base-url http://127.0.0.1:8765 --max 0
+
+def make_object(object_id, revision=0):
+    """Builds a synthetic object record with the fields met_scraper.py reads."""
+    return {
+        "objectID": object_id,
+        "title": f"Synthetic Artwork {object_id}" + (f" (rev. {revision})" if revision else ""),
+        "artistDisplayName": f"Artist {object_id % 97}",
+        "objectDate": f"ca. {1400 + object_id % 600}",
+        "objectBeginDate": 1400 + object_id % 600,
+        "objectEndDate": 1400 + object_id % 600,
+        "medium": random.Random(object_id).choice(["Oil on canvas", "Bronze", "Marble", "Glassy faience"]),
+        "creditLine": f"Gift of Donor {object_id % 31}, {1900 + object_id % 120}",
+        "objectName": "Painting",
+        "objectURL": f"https://www.metmuseum.org/art/collection/search/{object_id}",
+    }
+
+class MockMetHandler(BaseHTTPRequestHandler):
+    # Keep-alive so the scraper's pooled connections are actually reused
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass # Keep the console quiet while fetching thousands of objects
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("Retry-After", "0.1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        path = urlparse(self.path).path.rstrip("/")
+        server.request_count += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if path.endswith("/search"):
+            self._send_json(200, {"total": len(server.object_ids), "objectIDs": server.object_ids})
+            return
+
+        if path.endswith("/objects"):
+            # `?metadataDate=` listing: the objects bumped via `update_object`
+            updated = sorted(server.revisions)
+            self._send_json(200, {"total": len(updated), "objectIDs": updated})
+            return
+
+        if "/objects/" in path:
+            if random.random() < server.fail_rate:
+                self._send_json(random.choice([429, 503]), {"message": "Try again later"})
+                return
+            try:
+                object_id = int(path.rsplit("/", 1)[-1])
+            except ValueError:
+                self._send_json(400, {"message": "Invalid object ID"})
+                return
+            if object_id not in server.known_ids:
+                self._send_json(404, {"message": "ObjectID not found"})
+                return
+            self._send_json(200, make_object(object_id, server.revisions.get(object_id, 0)))
+            return
+
+        self._send_json(404, {"message": "Not found"})
+
+def start_mock_server(port=0, num_objects=100, latency=0.0, fail_rate=0.0):
+    """
+    Starts the stand-in API on a background thread and returns (server, base_url).
+    Call `server.shutdown()` when finished; `update_object(server, id)` simulates
+    an upstream edit that the next incremental run should pick up.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockMetHandler)
+    server.daemon_threads = True
+    server.object_ids = list(range(1, num_objects + 1))
+    server.known_ids = set(server.object_ids)
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.request_count = 0
+    server.revisions = {}
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, bound_port = server.server_address[:2]
+    return server, f"http://{host}:{bound_port}"
+
+def update_object(server, object_id):
+    """Bumps an object's revision so its record content (and hash) changes."""
+    server.revisions[object_id] = server.revisions.get(object_id, 0) + 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Met Collection API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--objects", type=int, default=1000, help="Number of object IDs returned by /search")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of object requests answered with 429/503")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.objects, args.latency, args.fail_rate)
+    print(f"✅ Mock Met API listening on {base_url} with {args.objects} objects. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
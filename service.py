@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from utils.rag_utils import retrieve_similar_artworks, load_index
+from models.embeddings import get_model
+from models.llm import (
+    agenerate_llm, astream_llm, build_context_prompt, new_async_session, LLMMetrics, answer_cache, PROMPT_VERSION,
+    GROQ_API_URL,
+)
+from models.metadata_filters import MetadataFilter
+from utils.telemetry import registry, trace, span, QUESTIONS, CACHE_LOOKUPS
+from config.config import (
+    INDEX_PATH, LLM_MODEL, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_MAX_PENDING, SERVICE_LLM_CONNECTIONS,
+)
+
+# A headless HTTP API over the same retrieval and answer pipeline as app.py. Embedding
+# and search run on a bounded thread pool (concurrent queries are micro-batched there);
+# LLM calls are non-blocking, so one process serves many answers at once:
+#
+#   python service.py --port 8000 --workers 4
+#   curl -s localhost:8000/retrieve -d '{"query": "Who made the Statuette of the Goddess Taweret?"}'
+#   curl -sN localhost:8000/answer/stream -d '{"query": "Tell me about glassy faience", "mode": "detailed"}'
+#
+# Request bodies: {"query": str, "top_k": int = 3, "mode": "concise" | "detailed",
+#                  "filters": {"artist", "medium", "year_from", "year_to"}}
+
+MODES = ("concise", "detailed")
+MAX_TOP_K = 20
+
+
+def json_error(error_class, message: str):
+    return error_class(text=json.dumps({"error": message}), content_type="application/json")
+
+
+class QuestionRequest:
+    def __init__(self, body: dict):
+        if not isinstance(body, dict):
+            raise json_error(web.HTTPBadRequest, "Body must be a JSON object")
+        self.query = body.get("query")
+        if not isinstance(self.query, str) or not self.query.strip():
+            raise json_error(web.HTTPBadRequest, "'query' must be a non-empty string")
+        self.top_k = body.get("top_k", 3)
+        if not isinstance(self.top_k, int) or not 1 <= self.top_k <= MAX_TOP_K:
+            raise json_error(web.HTTPBadRequest, f"'top_k' must be an integer from 1 to {MAX_TOP_K}")
+        self.mode = body.get("mode", "concise")
+        if self.mode not in MODES:
+            raise json_error(web.HTTPBadRequest, f"'mode' must be one of {', '.join(MODES)}")
+        filters = body.get("filters") or {}
+        if not isinstance(filters, dict):
+            raise json_error(web.HTTPBadRequest, "'filters' must be an object")
+        self.filters = MetadataFilter.parse(*(str(filters.get(field) or "")
+                                              for field in ("artist", "medium", "year_from", "year_to")))
+
+    @classmethod
+    async def read(cls, request: web.Request) -> "QuestionRequest":
+        try:
+            body = await request.json()
+        except ValueError:
+            raise json_error(web.HTTPBadRequest, "Body must be JSON")
+        return cls(body)
+
+
+class DocentService:
+    """
+    Request handlers plus the resources they share: the retrieval thread pool, the
+    count of retrievals it holds (beyond `max_pending` new requests are refused with
+    503 rather than queued without bound), and the LLM client session.
+    """
+
+    def __init__(self, index_path: str = INDEX_PATH, workers: int = SERVICE_WORKERS,
+                 max_pending: int = SERVICE_MAX_PENDING, api_url: str = GROQ_API_URL):
+        self.index_path = index_path
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="retrieval")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.api_url = api_url
+        self.session = None
+
+    async def run_blocking(self, fn, *args, shed: bool = True):
+        """
+        Runs `fn` on the thread pool, carrying this request's trace along. With `shed`,
+        refuses with 503 when the pool is already holding `max_pending` calls; work for
+        requests that were already admitted is never shed.
+        """
+        if shed and self.pending >= self.max_pending:
+            raise web.HTTPServiceUnavailable(text=json.dumps({"error": "Too many requests in flight"}),
+                                             content_type="application/json", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(context.run, fn, *args))
+        finally:
+            self.pending -= 1
+
+    async def retrieve(self, question: QuestionRequest):
+        with span("retrieve"):
+            return await self.run_blocking(retrieve_similar_artworks, question.query, self.index_path,
+                                           question.top_k, question.filters)
+
+    async def cached_answer(self, question: QuestionRequest, chunks):
+        with span("answer_cache"):
+            answer = await self.run_blocking(answer_cache.get, question.query, chunks, question.mode, LLM_MODEL,
+                                             PROMPT_VERSION, shed=False)
+        CACHE_LOOKUPS.inc(cache="answer", result="miss" if answer is None else "hit")
+        return answer
+
+    async def store_answer(self, question: QuestionRequest, chunks, answer: str):
+        await self.run_blocking(answer_cache.put, question.query, chunks, question.mode, LLM_MODEL,
+                                PROMPT_VERSION, answer, shed=False)
+
+    # Handlers
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "pending": self.pending, "max_pending": self.max_pending})
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def handle_retrieve(self, request: web.Request) -> web.Response:
+        question = await QuestionRequest.read(request)
+        start = time.perf_counter()
+        chunks = await self.retrieve(question)
+        return web.json_response({"query": question.query, "chunks": chunks,
+                                  "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+    async def handle_answer(self, request: web.Request) -> web.Response:
+        question = await QuestionRequest.read(request)
+        with trace("question") as question_trace:
+            QUESTIONS.inc()
+            chunks = await self.retrieve(question)
+            if not chunks:
+                return web.json_response({"query": question.query, "answer": None, "chunks": [], "cached": False})
+            answer = await self.cached_answer(question, chunks)
+            metrics = None
+            if answer is None:
+                with span("prompt"):
+                    prompt = build_context_prompt(question.query, chunks)
+                metrics = LLMMetrics(LLM_MODEL, streamed=False)
+                answer = await agenerate_llm(self.session, prompt, mode=question.mode, api_url=self.api_url,
+                                             metrics=metrics)
+                if metrics.error:
+                    raise json_error(web.HTTPBadGateway, answer)
+                await self.store_answer(question, chunks, answer)
+        return web.json_response({
+            "query": question.query,
+            "answer": answer,
+            "chunks": chunks,
+            "cached": metrics is None,
+            "llm": metrics.as_dict() if metrics else None,
+            "took_ms": round(question_trace.total * 1000, 2),
+        })
+
+    async def handle_answer_stream(self, request: web.Request) -> web.StreamResponse:
+        """
+        Server-sent events: {"chunks": [...]} first, then {"delta": text} as the answer
+        is generated, then {"done": true, ...} (or {"error": message}).
+        """
+        question = await QuestionRequest.read(request)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(event: dict):
+            await response.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+
+        with trace("question") as question_trace:
+            QUESTIONS.inc()
+            try:
+                chunks = await self.retrieve(question)
+            except web.HTTPServiceUnavailable:
+                await send({"error": "Too many requests in flight"})
+                return response
+            await send({"chunks": chunks})
+            answer = await self.cached_answer(question, chunks) if chunks else None
+            metrics = None
+            if answer is not None:
+                await send({"delta": answer})
+            elif chunks:
+                with span("prompt"):
+                    prompt = build_context_prompt(question.query, chunks)
+                metrics = LLMMetrics(LLM_MODEL, streamed=True)
+                parts = []
+                async for text in astream_llm(self.session, prompt, mode=question.mode, api_url=self.api_url,
+                                              metrics=metrics):
+                    if metrics.error:
+                        await send({"error": text})
+                        return response
+                    parts.append(text)
+                    await send({"delta": text})
+                await self.store_answer(question, chunks, "".join(parts))
+        await send({"done": True, "cached": answer is not None, "llm": metrics.as_dict() if metrics else None,
+                    "took_ms": round(question_trace.total * 1000, 2)})
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    # Lifecycle
+
+    async def on_startup(self, app: web.Application):
+        # Load the model and index before accepting traffic, so the first requests are not slow
+        await asyncio.get_running_loop().run_in_executor(self.executor, get_model)
+        await asyncio.get_running_loop().run_in_executor(self.executor, load_index, self.index_path)
+        self.session = new_async_session(SERVICE_LLM_CONNECTIONS)
+
+    async def on_cleanup(self, app: web.Application):
+        if self.session is not None:
+            await self.session.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/health", self.handle_health),
+            web.get("/metrics", self.handle_metrics),
+            web.post("/retrieve", self.handle_retrieve),
+            web.post("/answer", self.handle_answer),
+            web.post("/answer/stream", self.handle_answer_stream),
+        ])
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve artwork retrieval and answers over HTTP.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Threads for embedding and search")
+    parser.add_argument("--max-pending", type=int, default=SERVICE_MAX_PENDING,
+                        help="Retrievals queued or running before requests are refused with 503")
+    parser.add_argument("--index-path", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    try:
+        load_index(args.index_path)
+    except FileNotFoundError:
+        print(f"FAISS index not found at '{args.index_path}.index'. Please run 'python build_index.py' to create it.")
+        raise SystemExit(1)
+    service = DocentService(args.index_path, args.workers, args.max_pending)
+    web.run_app(service.make_app(), host=args.host, port=args.port)
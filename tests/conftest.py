@@ -0,0 +1,33 @@
+import hashlib
+import os
+import sys
+import numpy as np
+import pytest
+
+# Let the tests import the app's packages however pytest is invoked
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HashEncoder:
+    """
+    Stand-in for the sentence embedding model: a fixed random unit vector per text, so
+    tests run offline and the same text always embeds the same way.
+    """
+
+    dimension = 32
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension)
+            vectors[i] = vector / np.linalg.norm(vector)
+        return vectors
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    import models.embeddings
+    model = HashEncoder()
+    monkeypatch.setattr(models.embeddings, "_model", model)
+    return model
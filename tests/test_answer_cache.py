@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+import pytest
+import models.answer_cache
+from models.answer_cache import AnswerCache
+from models.index_manifest import new_generation, publish
+
+CHUNKS = ["Title: Statuette of the Goddess Taweret\nMedium: Glassy faience"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(models.answer_cache, "time",
+                        SimpleNamespace(time=lambda: now.value, monotonic=lambda: now.value))
+    return now
+
+
+def publish_generation(index_path: str) -> str:
+    version, prefix = new_generation(index_path)
+    publish(index_path, version, prefix)
+    return version
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_entries_expire_after_ttl(tmp_path, clock, on_disk):
+    cache = AnswerCache(8, str(tmp_path / "answers.sqlite") if on_disk else None, ttl=60)
+    cache.put("Who made Taweret?", CHUNKS, "concise", "model", "v1", "An Egyptian workshop.")
+
+    clock.value += 59
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") == "An Egyptian workshop."
+    clock.value += 2
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sqlite_tier_serves_a_new_process_until_expiry(tmp_path, clock):
+    path = str(tmp_path / "answers.sqlite")
+    AnswerCache(8, path, ttl=60).put("Who made Taweret?", CHUNKS, "concise", "model", "v1", "An Egyptian workshop.")
+
+    restarted = AnswerCache(8, path, ttl=60)
+    assert restarted.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") == "An Egyptian workshop."
+    assert restarted.stats()["disk_hits"] == 1
+    clock.value += 61
+    assert AnswerCache(8, path, ttl=60).get("Who made Taweret?", CHUNKS, "concise", "model", "v1") is None
+
+
+def test_key_covers_context_mode_model_and_prompt(tmp_path, clock):
+    cache = AnswerCache(8)
+    cache.put("Who made Taweret?", CHUNKS, "concise", "model", "v1", "An Egyptian workshop.")
+    assert cache.get("Who made Taweret?", CHUNKS + ["Title: Scarab"], "concise", "model", "v1") is None
+    assert cache.get("Who made Taweret?", CHUNKS, "detailed", "model", "v1") is None
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "other-model", "v1") is None
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v2") is None
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_publishing_a_new_index_generation_drops_every_answer(tmp_path, clock, on_disk):
+    index_path = str(tmp_path / "faiss_index")
+    persist_path = str(tmp_path / "answers.sqlite") if on_disk else None
+    publish_generation(index_path)
+    cache = AnswerCache(8, persist_path, index_path=index_path, check_interval=0)
+    cache.put("Who made Taweret?", CHUNKS, "concise", "model", "v1", "An Egyptian workshop.")
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") == "An Egyptian workshop."
+
+    publish_generation(index_path)
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") is None
+    assert cache.stats()["invalidations"] == 1
+    if on_disk:
+        assert AnswerCache(8, persist_path, index_path=index_path, check_interval=0).get(
+            "Who made Taweret?", CHUNKS, "concise", "model", "v1") is None
+
+
+def test_rebuilds_are_noticed_within_the_check_interval(tmp_path, clock, monkeypatch):
+    index_path = str(tmp_path / "faiss_index")
+    publish_generation(index_path)
+    cache = AnswerCache(8, index_path=index_path, check_interval=5)
+    cache.put("Who made Taweret?", CHUNKS, "concise", "model", "v1", "An Egyptian workshop.")
+    reads = []
+    index_version = models.answer_cache.index_version
+    monkeypatch.setattr(models.answer_cache, "index_version", lambda path: reads.append(path) or index_version(path))
+
+    publish_generation(index_path)
+    clock.value += 4
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") == "An Egyptian workshop."
+    clock.value += 2
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") is None
+    clock.value += 6
+    assert cache.get("Who made Taweret?", CHUNKS, "concise", "model", "v1") is None
+    assert reads == [index_path]  # The manifest is only read again once its stat changes
@@ -0,0 +1,77 @@
+import time
+import pytest
+from models.embeddings import build_faiss_index_streaming
+from models.index_manifest import new_generation, publish
+from utils.hot_index import HotIndex, IndexGeneration
+
+
+def publish_generation(index_path: str, titles) -> str:
+    version, prefix = new_generation(index_path)
+    build_faiss_index_streaming(((str(i), f"Title: {title}") for i, title in enumerate(titles)),
+                                index_path=prefix, index_type="flat", workers=1)
+    publish(index_path, version, prefix)
+    return version
+
+
+@pytest.fixture
+def closed(monkeypatch):
+    """
+    Versions of the generations closed so far.
+    """
+    versions = []
+    close = IndexGeneration.close
+
+    def record(generation):
+        versions.append(generation.version)
+        close(generation)
+    monkeypatch.setattr(IndexGeneration, "close", record)
+    return versions
+
+
+def reload(hot: HotIndex):
+    time.sleep(0.01)  # Past the reload interval and into a new manifest mtime
+    with hot.acquire():
+        pass
+    hot.wait_for_reload()
+
+
+def test_swaps_to_a_newly_published_generation(tmp_path, fake_model, closed):
+    index_path = str(tmp_path / "faiss_index")
+    first = publish_generation(index_path, ["Taweret"])
+    hot = HotIndex(index_path, reload_interval=0.001)
+    assert hot.current.version == first
+
+    second = publish_generation(index_path, ["Taweret", "Scarab"])
+    reload(hot)
+    assert hot.current.version == second
+    assert list(hot.current.chunks) == ["Title: Taweret", "Title: Scarab"]
+    assert hot.reloads == 1
+    assert closed == [first]  # Nothing held the first generation
+
+
+def test_pinned_generation_is_closed_once_drained(tmp_path, fake_model, closed):
+    index_path = str(tmp_path / "faiss_index")
+    first = publish_generation(index_path, ["Taweret"])
+    hot = HotIndex(index_path, reload_interval=0.001)
+
+    with hot.acquire() as pinned:
+        second = publish_generation(index_path, ["Scarab"])
+        reload(hot)
+        assert hot.current.version == second
+        assert pinned.retired and pinned.in_flight == 1
+        assert closed == []
+        assert pinned.chunks[0] == "Title: Taweret"  # Still readable by the query holding it
+    assert closed == [first]
+
+
+def test_failed_load_keeps_the_current_generation(tmp_path, fake_model):
+    index_path = str(tmp_path / "faiss_index")
+    first = publish_generation(index_path, ["Taweret"])
+    hot = HotIndex(index_path, reload_interval=0.001)
+    hot.current
+
+    version, prefix = new_generation(index_path)  # Published without any artifacts
+    publish(index_path, version, prefix)
+    reload(hot)
+    assert hot.current.version == first
+    assert hot.reload_error is not None
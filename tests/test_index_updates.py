@@ -0,0 +1,177 @@
+import json
+import os
+import pytest
+from models.embeddings import build_faiss_index_streaming, load_faiss_index, load_id_map
+from models.index_manifest import resolve_index_path
+from models.index_updates import IncrementalIndex
+from models.lexical_index import lexical_index_path
+from models.metadata_filters import FilterIndex, MetadataFilter, filter_index_path
+from utils.ingest_checkpoint import IngestCheckpoint, artwork_id
+
+
+def artwork(artwork_id: str, title: str):
+    return artwork_id, f"Title: {title}\nArtist: Unknown"
+
+
+@pytest.fixture
+def index_path(tmp_path, fake_model):
+    path = str(tmp_path / "faiss_index")
+    build_faiss_index_streaming([artwork("1", "Taweret"), artwork("2", "Scarab"), artwork("3", "Bastet")],
+                                index_path=path, batch_size=2, index_type="flat", workers=1)
+    return path
+
+
+def nearest(index_path: str, model, text: str) -> str:
+    index, chunks = load_faiss_index(index_path, mmap=False)
+    _, rows = index.search(model.encode([text]), 1)
+    return chunks[int(rows[0][0])]
+
+
+def test_upsert_adds_new_and_replaces_existing_artworks(index_path, fake_model):
+    updates = IncrementalIndex(index_path)
+    added, replaced = updates.upsert([artwork("2", "Scarab (restored)"), artwork("4", "Sphinx")])
+    updates.save()
+
+    assert (added, replaced) == (1, 1)
+    id_map = load_id_map(index_path)
+    assert id_map["rows"] == {"1": 0, "2": 3, "3": 2, "4": 4}
+    assert id_map["tombstones"] == [1]
+    index, chunks = load_faiss_index(index_path, mmap=False)
+    assert index.ntotal == 4  # The replaced row is dropped on load
+    assert chunks[3] == artwork("2", "Scarab (restored)")[1]
+    assert nearest(index_path, fake_model, artwork("4", "Sphinx")[1]) == artwork("4", "Sphinx")[1]
+
+
+def test_delete_tombstones_known_ids_only(index_path, fake_model):
+    updates = IncrementalIndex(index_path)
+    assert updates.delete(["1", "missing"]) == 1
+    updates.save()
+
+    index, _ = load_faiss_index(index_path, mmap=False)
+    assert index.ntotal == 2
+    assert "1" not in load_id_map(index_path)["rows"]
+    assert nearest(index_path, fake_model, artwork("1", "Taweret")[1]) != artwork("1", "Taweret")[1]
+
+
+def test_compact_reclaims_tombstones_without_changing_results(index_path, fake_model):
+    updates = IncrementalIndex(index_path)
+    updates.upsert([artwork("2", "Scarab (restored)")])
+    updates.delete(["1"])
+    updates.save()
+    assert updates.tombstone_ratio == pytest.approx(2 / 4)
+
+    assert updates.maybe_compact(threshold=0.2)
+    id_map = load_id_map(index_path)
+    assert id_map["tombstones"] == []
+    assert sorted(id_map["rows"].values()) == [0, 1]
+    assert id_map["next_row"] == 2
+    index, chunks = load_faiss_index(index_path, mmap=False)
+    assert index.ntotal == 2
+    assert sorted(chunks[row] for row in range(len(chunks))) == sorted(
+        [artwork("2", "Scarab (restored)")[1], artwork("3", "Bastet")[1]])
+    for row in id_map["rows"].values():
+        _, found = index.search(fake_model.encode([chunks[row]]), 1)
+        assert int(found[0][0]) == row
+    assert not IncrementalIndex(index_path).maybe_compact(threshold=0.2)
+
+
+def artwork_record(object_id: int, title: str, artist: str, medium: str, date: str) -> dict:
+    return {"object_id": object_id, "title": title, "artist": artist, "medium": medium, "date": date,
+            "url": f"https://www.metmuseum.org/art/collection/search/{object_id}"}
+
+
+COLLECTION = [
+    artwork_record(1, "Taweret", "Unknown", "Steatite", "ca. 1390–1352 B.C."),
+    artwork_record(2, "Scarab", "Unknown", "Faience", "ca. 1479–1425 B.C."),
+    artwork_record(3, "Bastet", "Unknown", "Bronze", "664–332 B.C."),
+    artwork_record(4, "Wheat Field with Cypresses", "Vincent van Gogh", "Oil on canvas", "1889"),
+    artwork_record(5, "Irises", "Vincent van Gogh", "Oil on canvas", "1890"),
+    artwork_record(6, "The Harvesters", "Pieter Bruegel the Elder", "Oil on wood", "1565"),
+    artwork_record(7, "Mont Sainte-Victoire", "Paul Cézanne", "Oil on canvas", "1902–6"),
+    artwork_record(8, "The Card Players", "Paul Cézanne", "Oil on canvas", "1890–92"),
+]
+
+
+@pytest.fixture
+def published_index(tmp_path, fake_model, monkeypatch):
+    """
+    A published single-index build of COLLECTION, with build_index pointed at it.
+    """
+    import build_index
+    data_path = str(tmp_path / "met_artworks.jsonl")
+    with open(data_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in COLLECTION)
+    monkeypatch.setattr(build_index, "ARTWORK_DATA_PATH", data_path)
+    monkeypatch.setattr(build_index, "INDEX_PATH", str(tmp_path / "faiss_index"))
+    monkeypatch.setattr(build_index, "open_embedding_store", lambda: None)
+    build_index.main(index_type="flat", workers=1, shards=1)
+    return build_index
+
+
+def scrape(data_path: str, records):
+    """
+    Appends records the way the scrapers do and writes the delta manifest.
+    """
+    checkpoint = IngestCheckpoint(data_path)
+    with open(data_path, "a", encoding="utf-8") as f:
+        for record in records:
+            key = artwork_id(record)
+            status = checkpoint.classify(key, record)
+            offset = f.tell()
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            checkpoint.mark(key, record, status, offset)
+    return checkpoint.finish()
+
+
+def test_delta_manifest_carries_the_changed_records(tmp_path):
+    data_path = str(tmp_path / "met_artworks.jsonl")
+    restored = artwork_record(2, "Scarab (restored)", "Unknown", "Faiénce", "ca. 1479–1425 B.C.")
+    scrape(data_path, COLLECTION[:3])
+    delta = scrape(data_path, [restored, COLLECTION[3]])
+
+    assert (delta["added"], delta["changed"]) == (["4"], ["2"])
+    assert delta["records"] == {"2": restored, "4": COLLECTION[3]}
+
+
+def test_update_patches_sidecars_to_match_a_full_rebuild(published_index, monkeypatch):
+    build_index = published_index
+    _, before = resolve_index_path(build_index.INDEX_PATH)
+    checkpoint = IngestCheckpoint(build_index.ARTWORK_DATA_PATH)  # As left by the scrape that was built
+    for record in COLLECTION:
+        checkpoint.mark(artwork_id(record), record, "added")
+    checkpoint.finish()
+    scrape(build_index.ARTWORK_DATA_PATH, [
+        artwork_record(2, "Scarab of Amenhotep III", "Unknown", "Glazed steatite", "ca. 1390–1352 B.C."),
+        artwork_record(9, "Young Woman with a Water Pitcher", "Johannes Vermeer", "Oil on canvas", "ca. 1662"),
+    ])
+
+    def unread(path):
+        raise AssertionError("the update read the whole artwork data file")
+    iter_artwork_records = build_index.iter_artwork_records
+    monkeypatch.setattr(build_index, "iter_artwork_records", unread)
+    build_index.update(delete_ids=["6"])
+    monkeypatch.setattr(build_index, "iter_artwork_records", iter_artwork_records)
+    _, after = resolve_index_path(build_index.INDEX_PATH)
+
+    assert after != before
+    assert os.path.samefile(f"{before}_params.json", f"{after}_params.json")  # Untouched files are linked
+    id_map = load_id_map(after)
+    assert id_map["tombstones"] == [1, 5]  # Not compacted, so the sidecars were patched
+
+    with open(lexical_index_path(after), encoding="utf-8") as f:
+        patched_lexical = json.load(f)
+    with open(filter_index_path(after), encoding="utf-8") as f:
+        patched_filters = json.load(f)
+    build_index.rebuild_lexical_index(after)
+    build_index.rebuild_filter_index(after)
+    with open(lexical_index_path(after), encoding="utf-8") as f:
+        assert json.load(f) == patched_lexical
+    with open(filter_index_path(after), encoding="utf-8") as f:
+        rebuilt_filters = json.load(f)
+    for column in ("begin", "end", "live"):
+        assert patched_filters[column] == rebuilt_filters[column]
+    patched, rebuilt = FilterIndex(patched_filters), FilterIndex(rebuilt_filters)
+    for filters in (MetadataFilter(artist="Bruegel"), MetadataFilter(medium="steatite"),
+                    MetadataFilter(medium="oil canvas", year_from=1600), MetadataFilter(artist="vermeer")):
+        assert patched.candidates(filters).tolist() == rebuilt.candidates(filters).tolist()
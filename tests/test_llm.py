@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+import config.config
+from models.llm import agenerate_llm, astream_llm, generate_llm, new_async_session, stream_llm
+from models.mock_llm_server import start_mock_server
+
+ANSWER = "Painted by Paul Cézanne — « Nature morte » 静物"
+
+
+@pytest.fixture
+def api_url(monkeypatch):
+    monkeypatch.setattr(config.config, "GROQ_API_KEY", "test")
+    server, url = start_mock_server(answer=ANSWER, ttft=0.0, token_delay=0.0)
+    yield url
+    server.shutdown()
+
+
+def test_streamed_answer_keeps_non_ascii_text(api_url):
+    assert "".join(stream_llm("Who painted it?", api_url=api_url)) == ANSWER
+
+
+def test_whole_answer_keeps_non_ascii_text(api_url):
+    assert generate_llm("Who painted it?", api_url=api_url) == ANSWER
+
+
+def test_async_answers_keep_non_ascii_text(api_url):
+    async def ask():
+        async with new_async_session() as session:
+            streamed = "".join([text async for text in astream_llm(session, "Who painted it?", api_url=api_url)])
+            return streamed, await agenerate_llm(session, "Who painted it?", api_url=api_url)
+
+    assert asyncio.run(ask()) == (ANSWER, ANSWER)
@@ -0,0 +1,56 @@
+import pytest
+from models.metadata_filters import FilterIndex, MetadataFilter, build_filter_index, parse_year_range
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1889", (1889, 1889)),
+    ("ca. 1515", (1515, 1515)),
+    ("ca. 1515–20", (1515, 1520)),
+    ("1598–1602", (1598, 1602)),
+    ("1890s", (1890, 1899)),
+    ("332–30 B.C.", (-332, -30)),
+    ("2nd century B.C.", (-200, -101)),
+    ("19th century", (1800, 1899)),
+    ("late 19th–early 20th century", (1866, 1933)),
+    ("early to mid-14th century", (1300, 1366)),
+    ("", None),
+    (None, None),
+    ("Date unknown", None),
+])
+def test_parse_year_range(text, expected):
+    assert parse_year_range(text) == expected
+
+
+RECORDS = [
+    ("Vincent van Gogh", "Oil on canvas", parse_year_range("1889")),
+    ("Unknown", "Glassy faience", parse_year_range("332–30 B.C.")),
+    ("Claude Monet", "Oil on canvas", parse_year_range("1899")),
+    ("Unknown", "Faience", None),
+    ("Vincent van Gogh", "Pen and ink on paper", parse_year_range("1888")),
+]
+
+
+@pytest.fixture
+def filter_index(tmp_path):
+    index_path = str(tmp_path / "faiss_index")
+    # Row 5 is a tombstone: it has a vector but is not live
+    assert build_filter_index(index_path, enumerate(RECORDS), n_rows=len(RECORDS) + 1) == len(RECORDS)
+    return FilterIndex.load(index_path)
+
+
+@pytest.mark.parametrize("filters, rows", [
+    (MetadataFilter(), [0, 1, 2, 3, 4]),
+    (MetadataFilter(artist="van gogh"), [0, 4]),
+    (MetadataFilter(artist="Van Gogh", medium="oil"), [0]),
+    (MetadataFilter(medium="faience"), [1, 3]),
+    (MetadataFilter(year_from=1880, year_to=1890), [0, 4]),
+    (MetadataFilter(year_to=0), [1]),  # Undated artworks never match a year bound
+    (MetadataFilter.parse(year_from="400 B.C.", year_to="1 A.D."), [1]),
+    (MetadataFilter(artist="Rembrandt"), []),
+])
+def test_candidates(filter_index, filters, rows):
+    assert filter_index.candidates(filters).tolist() == rows
+
+
+def test_indexes_built_without_filters_have_none(tmp_path):
+    assert FilterIndex.load(str(tmp_path / "faiss_index")) is None
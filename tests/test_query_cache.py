@@ -0,0 +1,25 @@
+import numpy as np
+from models.query_cache import QueryEmbeddingCache
+
+
+def test_sqlite_tier_serves_a_new_process(tmp_path):
+    path = str(tmp_path / "query_cache.sqlite")
+    QueryEmbeddingCache(8, path, namespace="model").put("Who made Taweret?", np.ones(4, dtype=np.float32))
+
+    restarted = QueryEmbeddingCache(8, path, namespace="model")
+    assert restarted.get("  who made TAWERET? ").tolist() == [1, 1, 1, 1]
+    assert restarted.stats()["disk_hits"] == 1
+    assert QueryEmbeddingCache(8, path, namespace="other-model").get("Who made Taweret?") is None
+
+
+def test_clear_drops_persisted_vectors_of_its_namespace_only(tmp_path):
+    path = str(tmp_path / "query_cache.sqlite")
+    cache = QueryEmbeddingCache(8, path, namespace="model")
+    other = QueryEmbeddingCache(8, path, namespace="other-model")
+    cache.put("Who made Taweret?", np.ones(4, dtype=np.float32))
+    other.put("Who made Taweret?", np.zeros(4, dtype=np.float32))
+
+    cache.clear()
+    assert cache.get("Who made Taweret?") is None
+    assert QueryEmbeddingCache(8, path, namespace="model").get("Who made Taweret?") is None
+    assert QueryEmbeddingCache(8, path, namespace="other-model").get("Who made Taweret?") is not None
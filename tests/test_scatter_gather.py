@@ -0,0 +1,77 @@
+import pytest
+from models.embeddings import build_faiss_index_streaming, embed_queries, load_faiss_index
+from models.index_shards import shard_for, shard_index_path, write_shard_layout
+from models.metadata_filters import MetadataFilter
+from utils.hot_index import HotIndex
+from utils.rag_utils import search_artworks_batch
+from utils.scatter_gather import ShardedIndex, ShardsUnavailable, merge_shard_hits, search_shard
+
+ARTWORKS = [(str(i), f"Title: Artwork {i}\nMedium: Medium {i % 7}") for i in range(120)]
+QUERIES = ["Who made artwork 3?", "Bronze figure of a cat", "Medium 5", "Statuette of Taweret"]
+
+
+@pytest.fixture
+def index_path(tmp_path, fake_model):
+    """
+    The same artworks indexed once whole at `index_path` and once split into 3 shards.
+    """
+    path = str(tmp_path / "faiss_index")
+    build_faiss_index_streaming(ARTWORKS, index_path=path, index_type="flat", workers=1)
+    for shard in range(3):
+        build_faiss_index_streaming([item for item in ARTWORKS if shard_for(item[0], 3) == shard],
+                                    index_path=shard_index_path(path, shard), index_type="flat", workers=1)
+    write_shard_layout(path, 3, "id", [0, 1, 2])
+    return path
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 20])
+def test_sharded_search_matches_unsharded(index_path, top_k):
+    index, chunks = load_faiss_index(index_path, mmap=False)
+    expected = search_artworks_batch(index, chunks, QUERIES, top_k, max_distance=None)
+    assert all(len(found) == top_k for found in expected)
+
+    sharded = ShardedIndex(index_path, {"count": 3, "key": "id", "shards": [0, 1, 2]}, workers="thread")
+    try:
+        assert sharded.search(QUERIES, embed_queries(QUERIES), top_k, max_distance=None) == expected
+    finally:
+        sharded.close()
+
+
+def test_merge_keeps_nearest_hit_past_max_distance():
+    hits_by_shard = [
+        (0, {"exact": [], "dense": [(1.6, 0, "a"), (1.9, 1, "b")], "lexical": []}),
+        (1, {"exact": [], "dense": [(1.5, 0, "c")], "lexical": []}),
+    ]
+    assert merge_shard_hits(hits_by_shard, top_k=3, k=3, max_distance=1.4) == ["c"]
+    assert merge_shard_hits(hits_by_shard, top_k=3, k=3, max_distance=None) == ["c", "a", "b"]
+
+
+def test_merge_prefers_exact_matches_from_any_shard():
+    hits_by_shard = [
+        (0, {"exact": [], "dense": [(0.1, 0, "a")], "lexical": [(1.0, 0, "a")]}),
+        (1, {"exact": [(4, "Title: Taweret")], "dense": [(0.5, 4, "Title: Taweret")], "lexical": []}),
+    ]
+    assert merge_shard_hits(hits_by_shard, top_k=3, k=3) == ["Title: Taweret"]
+
+
+def test_shard_without_filter_columns_returns_no_hits_for_filtered_search(index_path):
+    vectors = embed_queries(QUERIES[:1])
+    _, results = search_shard(HotIndex(shard_index_path(index_path, 0)), QUERIES[:1], vectors, 5,
+                              MetadataFilter(medium="bronze"))
+    assert results == [{"exact": [], "dense": [], "lexical": [], "unfiltered": True}]
+
+    sharded = ShardedIndex(index_path, {"count": 3, "key": "id", "shards": [0, 1, 2]}, workers="thread")
+    try:
+        assert sharded.search(QUERIES[:1], vectors, 5, MetadataFilter(medium="bronze")) == [[]]
+        assert sharded.unfiltered_shards == {0, 1, 2}
+    finally:
+        sharded.close()
+
+
+def test_raises_when_no_shard_answers(tmp_path, fake_model):
+    sharded = ShardedIndex(str(tmp_path / "missing"), {"count": 2, "key": "id", "shards": [0, 1]}, workers="thread")
+    try:
+        with pytest.raises(ShardsUnavailable):
+            sharded.search(QUERIES[:1], embed_queries(QUERIES[:1]), 5)
+    finally:
+        sharded.close()
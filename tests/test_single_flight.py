@@ -0,0 +1,61 @@
+import threading
+import pytest
+from utils.single_flight import FlightAbandoned, SingleFlight
+
+
+def follow(flights: SingleFlight, key, joined: threading.Event, outcome: dict, timeout=None):
+    with flights.join(key) as (flight, leader):
+        outcome["leader"] = leader
+        joined.set()
+        try:
+            outcome["events"] = list(flight.events(timeout=timeout))
+        except FlightAbandoned:
+            outcome["abandoned"] = True
+
+
+def start_follower(flights: SingleFlight, key, timeout=None):
+    joined, outcome = threading.Event(), {}
+    thread = threading.Thread(target=follow, args=(flights, key, joined, outcome, timeout))
+    thread.start()
+    assert joined.wait(5)
+    return thread, outcome
+
+
+def test_followers_replay_the_leaders_events():
+    flights = SingleFlight()
+    with flights.join("question") as (flight, leader):
+        assert leader
+        flight.publish("chunks", ["Title: Taweret"])
+        thread, outcome = start_follower(flights, "question")
+        assert flight.followers == 1
+        flight.publish("answer", "An Egyptian workshop.", False)
+    thread.join(5)
+
+    assert outcome == {"leader": False, "events": [("chunks", ["Title: Taweret"]),
+                                                   ("answer", "An Egyptian workshop.", False)]}
+    assert len(flights) == 0
+
+
+def test_failing_leader_releases_its_followers():
+    flights = SingleFlight()
+    with pytest.raises(RuntimeError):
+        with flights.join("question") as (flight, leader):
+            flight.publish("chunks", [])
+            thread, outcome = start_follower(flights, "question")
+            raise RuntimeError("LLM unavailable")
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert outcome == {"leader": False, "abandoned": True}
+    assert len(flights) == 0
+    with flights.join("question") as (_, leader):
+        assert leader  # The next request starts afresh
+
+
+def test_follower_stops_waiting_on_a_stuck_leader():
+    flights = SingleFlight()
+    with flights.join("question") as (flight, leader):
+        thread, outcome = start_follower(flights, "question", timeout=0.05)
+        thread.join(5)
+        assert outcome == {"leader": False, "abandoned": True}
+        assert not flight.landed
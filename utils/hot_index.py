@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import os
+import threading
+import time
+from models.embeddings import load_faiss_index
+from models.index_factory import load_index_params
+from models.index_manifest import manifest_path, resolve_index_path
+from models.lexical_index import LexicalIndex
+from models.metadata_filters import FilterIndex
+from utils.micro_batcher import MicroBatcher
+from config.config import HYBRID_RETRIEVAL, INDEX_RELOAD_INTERVAL, RETRIEVAL_MAX_BATCH, RETRIEVAL_BATCH_WAIT_MS
+
+
+class IndexGeneration:
+    """
+    Everything loaded from one published generation of an index: the FAISS index, its
+    chunks and sidecars, and the micro-batchers searching it. Queries pin a generation
+    while they use it; once it has been replaced and the last query has finished, its
+    batchers are stopped and its files released.
+    """
+
+    def __init__(self, version: Optional[str], path: str):
+        self.version = version
+        self.path = path
+        self.index, self.chunks = load_faiss_index(path)
+        self.lexical: Optional[LexicalIndex] = LexicalIndex.load(path) if HYBRID_RETRIEVAL else None
+        self.filter_index: Optional[FilterIndex] = FilterIndex.load(path)
+        self.params = load_index_params(path)
+        self.in_flight = 0
+        self.retired = False
+        self._batchers: Dict[int, MicroBatcher] = {}
+        self._lock = threading.Lock()
+
+    def batcher(self, top_k: int, search) -> MicroBatcher:
+        """
+        Returns the micro-batcher shared by all queries against this generation with
+        this top_k; `search(generation, queries, top_k)` runs each batch.
+        """
+        with self._lock:
+            if top_k not in self._batchers:
+                self._batchers[top_k] = MicroBatcher(
+                    lambda queries: search(self, queries, top_k),
+                    max_batch_size=RETRIEVAL_MAX_BATCH,
+                    max_wait_ms=RETRIEVAL_BATCH_WAIT_MS,
+                )
+            return self._batchers[top_k]
+
+    def close(self):
+        with self._lock:
+            batchers, self._batchers = list(self._batchers.values()), {}
+        for batcher in batchers:
+            batcher.close()
+        if hasattr(self.chunks, "close"):
+            self.chunks.close()
+
+
+class HotIndex:
+    """
+    Serves the published generation of the index at `index_path` and switches to a
+    newer one without a restart. At most every `reload_interval` seconds a query checks
+    the manifest; a new version is loaded on a background thread while queries keep
+    using the current one, then swapped in under a lock. A generation that fails to
+    load is skipped and the current one stays in service.
+    """
+
+    def __init__(self, index_path: str, reload_interval: float = INDEX_RELOAD_INTERVAL):
+        self.index_path = index_path
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self.reload_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._current: Optional[IndexGeneration] = None
+        self._loading: Optional[threading.Thread] = None
+        self._manifest_stamp = self._stat_manifest()
+        self._checked_at = time.monotonic()
+
+    def _stat_manifest(self):
+        try:
+            stat = os.stat(manifest_path(self.index_path))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _current_locked(self) -> IndexGeneration:
+        if self._current is None:
+            self._current = IndexGeneration(*resolve_index_path(self.index_path))
+        return self._current
+
+    @property
+    def current(self) -> IndexGeneration:
+        """
+        The generation in service, loaded on first use (raises FileNotFoundError if the
+        index has not been built).
+        """
+        with self._lock:
+            return self._current_locked()
+
+    @contextmanager
+    def acquire(self) -> Iterator[IndexGeneration]:
+        """
+        Pins the current generation for the duration of the block, so a swap while
+        the query runs cannot release what it is reading.
+        """
+        self._maybe_reload()
+        with self._lock:
+            generation = self._current_locked()
+            generation.in_flight += 1
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.in_flight -= 1
+                drained = generation.retired and generation.in_flight == 0
+            if drained:
+                generation.close()
+
+    def _maybe_reload(self):
+        if self.reload_interval <= 0 or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = time.monotonic()
+        stamp = self._stat_manifest()
+        if stamp == self._manifest_stamp:
+            return
+        with self._lock:
+            if self._loading is not None:
+                return
+            self._loading = threading.Thread(target=self._reload, args=(stamp,), name="index-reload", daemon=True)
+            self._loading.start()
+
+    def _reload(self, stamp):
+        try:
+            version, path = resolve_index_path(self.index_path)
+            if self._current is None or version != self._current.version:
+                self.swap(IndexGeneration(version, path))
+        except Exception as e:  # Keep serving the current generation
+            self.reload_error = f"Could not load the published index: {e}"
+        finally:
+            # A failed version is not retried until the manifest changes again
+            with self._lock:
+                self._manifest_stamp = stamp
+                self._loading = None
+
+    def swap(self, generation: IndexGeneration):
+        """
+        Puts `generation` in service. The previous one is closed as soon as no query
+        holds it, which may be immediately.
+        """
+        with self._lock:
+            previous, self._current = self._current, generation
+            self.reloads += 1
+            self.reload_error = None
+            if previous is None:
+                return
+            previous.retired = True
+            drained = previous.in_flight == 0
+        if drained:
+            previous.close()
+
+    def wait_for_reload(self, timeout: Optional[float] = None):
+        """
+        Blocks until a background load in progress (if any) has finished.
+        """
+        loading = self._loading
+        if loading is not None:
+            loading.join(timeout)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+
+def record_hash(record: dict) -> str:
+    """
+    Stable content hash of an artwork record (key order does not matter).
+    """
+    canonical = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def artwork_id(data: dict) -> str:
+    """
+    Stable key for an artwork: its Met object ID, taken from the record or from the
+    trailing number of its collection URL, falling back to the URL itself.
+    """
+    if data.get("object_id") is not None:
+        return str(data["object_id"])
+    url = data.get("url") or ""
+    tail = url.rstrip("/").rsplit("/", 1)[-1]
+    return tail if tail.isdigit() else url
+
+
+def delta_manifest_path(output_path: str) -> str:
+    return f"{output_path}.delta.json"
+
+
+class IngestCheckpoint:
+    """
+    Append-only progress log kept next to the output JSONL file.
+
+    Every saved record appends one line ({"key", "sha256", "status", "offset"}) right
+    after the record itself is flushed, so an interrupted run can resume where it
+    stopped. Keys are `artwork_id`s, the same IDs the index and compaction use, and
+    `offset` is where the record starts in the output file. A completed run appends a
+    {"completed": <timestamp>} marker; everything logged after the last marker is the
+    pending delta for the current run.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.path = f"{output_path}.checkpoint"
+        self.hashes: Dict[str, str] = {}
+        self.pending: Dict[str, str] = {}  # key -> "added" / "changed" since the last completed run
+        self.offsets: Dict[str, int] = {}  # key -> output file offset of its latest pending record
+        self.last_completed: Optional[str] = None
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A torn final line from a crash
+                if "completed" in entry:
+                    self.last_completed = entry["completed"]
+                    self.pending = {}
+                    self.offsets = {}
+                    continue
+                key = str(entry["key"])
+                self.hashes[key] = entry["sha256"]
+                if entry.get("status") in ("added", "changed"):
+                    # A record added earlier in the same interrupted run stays "added"
+                    self.pending[key] = self.pending.get(key, entry["status"])
+                    self._track_offset(key, entry.get("offset"))
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self.hashes
+
+    def classify(self, key, record: dict) -> str:
+        """
+        Returns "added", "changed" or "unchanged" for a freshly fetched record.
+        """
+        previous = self.hashes.get(str(key))
+        if previous is None:
+            return "added"
+        return "unchanged" if previous == record_hash(record) else "changed"
+
+    def mark(self, key, record: dict, status: str, offset: Optional[int] = None):
+        """
+        Logs a record that has just been written to the output file at `offset`.
+        """
+        key = str(key)
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        digest = record_hash(record)
+        self._file.write(json.dumps({"key": key, "sha256": digest, "status": status, "offset": offset}) + "\n")
+        self._file.flush()
+        self.hashes[key] = digest
+        self.pending[key] = self.pending.get(key, status)
+        self._track_offset(key, offset)
+
+    def _track_offset(self, key: str, offset: Optional[int]):
+        if offset is None:
+            self.offsets.pop(key, None)  # An earlier offset would point at a superseded record
+        else:
+            self.offsets[key] = offset
+
+    def pending_records(self) -> Dict[str, dict]:
+        """
+        The latest record of each pending artwork, read back from the output file at the
+        offsets logged for them, so the cost follows the size of the delta.
+        """
+        records = {}
+        if not self.offsets:
+            return records
+        with open(self.output_path, "rb") as f:
+            for key, offset in self.offsets.items():
+                f.seek(offset)
+                records[key] = json.loads(f.readline())
+        return records
+
+    def finish(self, failed: Optional[List[str]] = None, unchanged: int = 0) -> dict:
+        """
+        Writes the delta manifest for this run and marks the checkpoint as completed.
+        The manifest carries the added and changed records themselves under "records",
+        so the index update needs neither the output file nor its offsets, which
+        compacting the output file afterwards invalidates.
+        """
+        completed = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        delta = {
+            "source": self.output_path,
+            "completed": completed,
+            "previous_completed": self.last_completed,
+            "added": sorted(k for k, s in self.pending.items() if s == "added"),
+            "changed": sorted(k for k, s in self.pending.items() if s == "changed"),
+            "unchanged": unchanged,
+            "failed": sorted(str(k) for k in (failed or [])),
+            "records": self.pending_records(),
+        }
+        tmp_path = delta_manifest_path(self.output_path) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(delta, f, indent=2)
+        os.replace(tmp_path, delta_manifest_path(self.output_path))
+
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"completed": completed}) + "\n")
+        self.close()
+
+        self.last_completed = completed
+        self.pending = {}
+        self.offsets = {}
+        return delta
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def compact_jsonl(path: str, key_fn: Callable[[dict], str]) -> int:
+    """
+    Rewrites a JSONL file keeping only the last line for each key, in first-seen order.
+    Appending changed records leaves superseded versions behind; this drops them.
+    Returns the number of records kept.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    latest: Dict[object, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Skip malformed lines
+            try:
+                key = key_fn(record)
+            except KeyError:
+                key = ("unkeyed", line_number)  # Keep records we cannot match up
+            latest[key] = line if line.endswith("\n") else line + "\n"
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(latest.values())
+    os.replace(tmp_path, path)
+    return len(latest)
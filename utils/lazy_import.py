@@ -0,0 +1,28 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so importing our
+    code does not pay for heavy dependencies (faiss, streamlit) that a caller never uses.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,90 @@
+from concurrent.futures import Future
+from typing import Callable, List
+import queue
+import threading
+import time
+from utils import telemetry
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Coalesces single-item calls from concurrent threads (e.g. Streamlit sessions) into
+    batched calls of `fn`, which maps a list of items to a list of results.
+
+    A batch is dispatched once `max_batch_size` items are waiting or `max_wait_ms` has
+    passed since the first one arrived. Raising `max_wait_ms` trades per-request latency
+    for larger batches and higher throughput; 0 only batches requests that queued up
+    while the previous batch was running, adding no latency when the system is idle.
+    """
+
+    def __init__(self, fn: Callable[[List], List], max_batch_size: int = 32, max_wait_ms: float = 3.0):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        future = self.submit(item)
+        result = future.result()
+        # Stages timed while serving the batch belong to this caller's trace too
+        telemetry.replay(getattr(future, "spans", ()))
+        return result
+
+    def close(self):
+        """
+        Stops the worker thread once the calls already submitted have been served.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def _collect(self) -> list:
+        first = self._queue.get()
+        if first is _STOP:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._queue.put(_STOP)  # Serve this batch, then stop
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            items = [item for item, _ in batch]
+            self.batches += 1
+            self.items += len(items)
+            try:
+                with telemetry.capture() as spans:
+                    results = self.fn(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.spans = spans
+                future.set_result(result)
@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List
+
+
+class StageStats:
+    """
+    Records processed by one pipeline stage and the time spent doing its own work.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.records = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.records / self.seconds if self.seconds > 0 else float("inf")
+
+
+class PipelineStats:
+    """
+    Per-stage throughput for a chain of generators.
+
+    Time is attributed exclusively: when a stage pulls from an upstream stage that is
+    also timed, the upstream time is subtracted, so each stage reports only its own cost.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        self.started_at = time.perf_counter()
+        self._local = threading.local()
+
+    def stage(self, name: str) -> StageStats:
+        if name not in self.stages:
+            self.stages[name] = StageStats(name)
+        return self.stages[name]
+
+    def _timed_total(self) -> float:
+        return getattr(self._local, "total", 0.0)
+
+    def add(self, name: str, records: int, seconds: float):
+        """
+        Adds work done outside of `timed`, e.g. a loop body in the caller.
+        """
+        stats = self.stage(name)
+        stats.records += records
+        stats.seconds += seconds
+        self._local.total = self._timed_total() + seconds
+
+    def timed(self, name: str, iterable: Iterable, count: Callable[[object], int] = lambda item: 1) -> Iterator:
+        """
+        Yields from `iterable`, charging the time spent producing each item to `name`.
+        `count` maps an item to the number of records it carries (e.g. len for batches).
+        """
+        iterator = iter(iterable)
+        while True:
+            upstream_before = self._timed_total()
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            elapsed = time.perf_counter() - start
+            upstream = self._timed_total() - upstream_before
+            self.add(name, count(item), max(elapsed - upstream, 0.0))
+            yield item
+
+    def report(self) -> str:
+        wall = time.perf_counter() - self.started_at
+        lines = [f"{'stage':<12} {'records':>10} {'busy (s)':>10} {'records/sec':>12}"]
+        for stats in self.stages.values():
+            lines.append(f"{stats.name:<12} {stats.records:>10} {stats.seconds:>10.2f} {stats.rate:>12.1f}")
+        lines.append(f"wall time: {wall:.2f}s")
+        return "\n".join(lines)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """
+    Groups an iterable into lists of at most `size` items.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_DONE = object()
+
+
+def prefetch(iterable: Iterable, maxsize: int = 4) -> Iterator:
+    """
+    Runs `iterable` on a background thread so it overlaps with the consumer.
+    The queue holds at most `maxsize` items, which bounds memory; exceptions raised
+    by the producer are re-raised in the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+            buffer.put(_DONE)
+        except BaseException as e:
+            buffer.put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue so the thread can exit
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.01)
@@ -1,66 +1,262 @@
 import json
 import os
-from typing import List
-from models.embeddings import embed_query, load_faiss_index
+import threading
+import time
+from typing import Iterator, List, Optional
 import numpy as np
-import streamlit as st
+from models.embeddings import embed_queries
+from models.context_builder import compact_chunk
+from models.index_factory import as_squared_l2, filtered_search, prepare_vectors
+from models.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from models.metadata_filters import MetadataFilter
+from models.index_shards import read_shard_layout, shards_path
+from utils.hot_index import HotIndex, IndexGeneration
+from utils.scatter_gather import ShardedIndex, ShardsUnavailable
+from utils.telemetry import span, RETRIEVAL_QUERIES
+from config.config import (
+    RETRIEVAL_MICRO_BATCHING, HYBRID_CANDIDATES, RRF_K, EXACT_MATCH_FAST_PATH, FILTER_EXACT_SEARCH_MAX,
+    CONTEXT_MAX_DISTANCE, CONTEXT_MIN_LEXICAL_SCORE, INDEX_RELOAD_INTERVAL,
+)
+from utils.lazy_import import lazy_import
 
-def load_artwork_chunks(jsonl_path: str) -> List[str]:
+st = lazy_import("streamlit")  # Only needed to report errors in the app
+
+def iter_artwork_records(jsonl_path: str) -> Iterator[dict]:
     """
-    Loads artwork metadata from a JSONL file and converts each entry into a text chunk.
+    Streams artwork records from a JSONL file one at a time, skipping malformed lines.
     """
-    chunks = []
-
     if not os.path.exists(jsonl_path):
         raise FileNotFoundError(f"File not found: {jsonl_path}")
 
     with open(jsonl_path, "r", encoding="utf-8") as f:
         for line in f:
             try:
-                data = json.loads(line)
-
-                title = data.get("title", "Unknown Title")
-                artist = data.get("artist", "Unknown Artist")
-                date = data.get("date", "Unknown Date")
-                medium = data.get("medium", "Unknown Medium")
-                dimensions = data.get("dimensions", "")
-                description = data.get("description", "")
-                url = data.get("url", "")
-
-                text_chunk = f"""
-                Title: {title}
-                Artist: {artist}
-                Date: {date}
-                Medium: {medium}
-                Dimensions: {dimensions}
-                Description: {description}
-                Source: {url}
-                """
-                chunks.append(text_chunk.strip())
-
+                yield json.loads(line)
             except json.JSONDecodeError:
                 continue  # Skip malformed lines
 
-    return chunks
 
-@st.cache_resource
-def cached_load_faiss_index(index_path: str):
+def format_artwork_chunk(data: dict) -> str:
     """
-    Loads FAISS index and chunks from disk and caches them in memory.
+    Converts one artwork record into the text chunk that gets embedded: one
+    "Field: value" line per known field, leaving out missing and empty ones.
     """
-    return load_faiss_index(index_path)
+    fields = [
+        ("Title", data.get("title")),
+        ("Artist", data.get("artist")),
+        ("Date", data.get("date")),
+        ("Medium", data.get("medium")),
+        ("Dimensions", data.get("dimensions")),
+        ("Description", data.get("description")),
+        ("Source", data.get("url")),
+    ]
+    return compact_chunk("\n".join(f"{name}: {value or ''}" for name, value in fields))
 
 
-def retrieve_similar_artworks(query: str, index_path: str, top_k: int = 3) -> List[str]:
+def iter_artwork_chunks(jsonl_path: str) -> Iterator[str]:
     """
-    Retrieve top-k most similar artwork chunks based on the query.
+    Streams text chunks from a JSONL file without holding the collection in memory.
+    """
+    for data in iter_artwork_records(jsonl_path):
+        yield format_artwork_chunk(data)
+
+
+def load_artwork_chunks(jsonl_path: str) -> List[str]:
+    """
+    Loads artwork metadata from a JSONL file and converts each entry into a text chunk.
+    """
+    return list(iter_artwork_chunks(jsonl_path))
+
+_hot_indexes = {}
+_hot_indexes_lock = threading.Lock()
+
+
+def hot_index(index_path: str) -> HotIndex:
+    """
+    Returns the process-wide HotIndex serving `index_path`, which loads the published
+    generation on first use and switches to newer ones as they are published.
+    """
+    with _hot_indexes_lock:
+        if index_path not in _hot_indexes:
+            _hot_indexes[index_path] = HotIndex(index_path)
+        return _hot_indexes[index_path]
+
+
+# index_path -> (layout file stamp, monotonic time it was checked, ShardedIndex or None)
+_sharded_indexes = {}
+
+
+def _stat_shard_layout(index_path: str):
+    try:
+        stat = os.stat(shards_path(index_path))
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def sharded_index(index_path: str) -> Optional[ShardedIndex]:
+    """
+    Returns the process-wide ShardedIndex serving `index_path`, or None if the index is
+    not sharded. Like HotIndex's manifest, the shard layout file is checked at most every
+    INDEX_RELOAD_INTERVAL seconds, so a build switching between sharded and unsharded
+    (or to another shard count) is picked up without a restart.
+    """
+    retired = None
+    with _hot_indexes_lock:
+        now = time.monotonic()
+        if index_path in _sharded_indexes:
+            stamp, checked_at, sharded = _sharded_indexes[index_path]
+            if INDEX_RELOAD_INTERVAL <= 0 or now - checked_at < INDEX_RELOAD_INTERVAL:
+                return sharded
+            if _stat_shard_layout(index_path) == stamp:
+                _sharded_indexes[index_path] = (stamp, now, sharded)
+                return sharded
+            retired = sharded
+        stamp = _stat_shard_layout(index_path)
+        layout = read_shard_layout(index_path)
+        if retired is not None and layout == retired.layout:
+            sharded, retired = retired, None  # Rewritten by a rebuild; each shard hot-reloads on its own
+        else:
+            sharded = ShardedIndex(index_path, layout) if layout is not None else None
+        _sharded_indexes[index_path] = (stamp, now, sharded)
+    if retired is not None:
+        retired.close()
+    return sharded
+
+
+def load_index(index_path: str):
+    """
+    Loads the index in service ahead of the first query: the published generation, or
+    for a sharded index, every shard in its worker.
+    """
+    sharded = sharded_index(index_path)
+    if sharded is not None:
+        sharded.warm_up()
+    else:
+        hot_index(index_path).current
+
+
+def relevant_rows(rows, distances, n_chunks: int, max_distance: Optional[float]) -> List[int]:
+    """
+    The valid row IDs of one search result, dropping those farther than `max_distance`
+    from the query. The nearest row is always kept, so a question gets an answer.
+    """
+    hits = [(int(row), distance) for row, distance in zip(rows, distances) if 0 <= row < n_chunks]
+    if max_distance is None:
+        return [row for row, _ in hits]
+    return [row for i, (row, distance) in enumerate(hits) if i == 0 or distance <= max_distance]
+
+
+def search_artworks_batch(index, chunks, queries: List[str], top_k: int,
+                          lexical: Optional[LexicalIndex] = None, candidates: Optional[np.ndarray] = None,
+                          search_params: Optional[dict] = None,
+                          max_distance: Optional[float] = CONTEXT_MAX_DISTANCE,
+                          min_lexical_score: float = CONTEXT_MIN_LEXICAL_SCORE) -> List[List[str]]:
+    """
+    Embeds all queries in one model call and searches them in one index call.
+    With a lexical index, queries that exactly name a title or artist are answered from
+    it without embedding, and the rest fuse BM25 and dense rankings with reciprocal rank fusion.
+    With `candidates` (row IDs passing a metadata filter, searched with `search_params`),
+    every retriever is restricted to those rows. Dense hits farther than `max_distance`
+    and BM25 hits scoring below `min_lexical_score` are dropped before fusion, so fewer
+    than `top_k` chunks come back when only a few are relevant to either retriever.
+    """
+    results: List[Optional[List[int]]] = [None] * len(queries)
+    if lexical is not None and EXACT_MATCH_FAST_PATH:
+        with span("exact_match"):
+            for i, query in enumerate(queries):
+                results[i] = lexical.exact_match(query, top_k, candidates) or None
+    pending = [i for i, rows in enumerate(results) if rows is None]
+    RETRIEVAL_QUERIES.inc(len(queries) - len(pending), path="exact")
+
+    if pending:
+        dense_k = max(top_k, HYBRID_CANDIDATES) if lexical is not None else top_k
+        with span("embed"):
+            query_vecs = prepare_vectors(index, embed_queries([queries[i] for i in pending]))
+        with span("search"):
+            if candidates is None:
+                distances, indices = index.search(query_vecs, dense_k)
+            else:
+                distances, indices = filtered_search(index, query_vecs, candidates, dense_k, search_params,
+                                                     FILTER_EXACT_SEARCH_MAX)
+            distances = as_squared_l2(index, distances)
+        if lexical is None:
+            for i, row, row_distances in zip(pending, indices, distances):
+                results[i] = relevant_rows(row, row_distances, len(chunks), max_distance)
+            RETRIEVAL_QUERIES.inc(len(pending), path="dense")
+        else:
+            with span("lexical"):
+                for i, row, row_distances in zip(pending, indices, distances):
+                    dense = relevant_rows(row, row_distances, len(chunks), max_distance)
+                    lexical_rows = lexical.search(queries[i], HYBRID_CANDIDATES, candidates, min_lexical_score)
+                    results[i] = reciprocal_rank_fusion([dense, lexical_rows], top_k, RRF_K)
+            RETRIEVAL_QUERIES.inc(len(pending), path="hybrid")
+    return [[chunks[row] for row in rows] for rows in results]
+
+
+def retrieve_similar_artworks_batch(queries: List[str], index_path: str, top_k: int = 3) -> List[List[str]]:
+    """
+    Retrieve top-k most similar artwork chunks for each of several queries at once.
     """
     try:
-        index, chunks = cached_load_faiss_index(index_path)
-        query_vec = embed_query(query).reshape(1, -1)
-        distances, indices = index.search(query_vec, top_k)
+        sharded = sharded_index(index_path)
+        if sharded is not None:
+            return sharded.retrieve_batch(queries, top_k)
+        with hot_index(index_path).acquire() as generation:
+            return _search_generation(generation, queries, top_k)
+    except FileNotFoundError:
+        st.error(f"FAISS index not found at '{index_path}.index'. Please run 'python build_index.py' to create it.")
+        return [[] for _ in queries]
+    except ShardsUnavailable as e:
+        st.error(f"{e}. If the index has not been built, run 'python build_index.py'.")
+        return [[] for _ in queries]
+
+
+def _search_generation(generation: IndexGeneration, queries: List[str], top_k: int) -> List[List[str]]:
+    return search_artworks_batch(generation.index, generation.chunks, queries, top_k, generation.lexical)
+
 
-        return [chunks[i] for i in indices[0] if i < len(chunks)]
+def retrieve_similar_artworks(query: str, index_path: str, top_k: int = 3,
+                              filters: Optional[MetadataFilter] = None) -> List[str]:
+    """
+    Retrieve top-k most similar artwork chunks based on the query.
+    Concurrent calls are coalesced into batched encode/search calls when micro-batching is on.
+    With `filters`, only artworks matching them are considered; the matching row IDs are
+    resolved first and restrict the search itself rather than filtering its top-k.
+    The query holds the index generation it started on, even if a newer one is swapped in meanwhile.
+    A sharded index is searched on all shards in parallel and their results merged.
+    """
+    try:
+        sharded = sharded_index(index_path)
+        if sharded is not None:
+            chunks = sharded.retrieve(query, top_k, filters)
+            if filters is not None and not filters.is_empty() and sharded.unfiltered_shards:
+                st.warning("Some index shards were built without metadata filters and were left out of this "
+                           "search; run 'python build_index.py' to add them.")
+            return chunks
+        with hot_index(index_path).acquire() as generation:
+            return _retrieve_from(generation, query, top_k, filters)
     except FileNotFoundError:
         st.error(f"FAISS index not found at '{index_path}.index'. Please run 'python build_index.py' to create it.")
-        return []
\ No newline at end of file
+        return []
+    except ShardsUnavailable as e:
+        st.error(f"{e}. If the index has not been built, run 'python build_index.py'.")
+        return []
+
+
+def _retrieve_from(generation: IndexGeneration, query: str, top_k: int,
+                   filters: Optional[MetadataFilter]) -> List[str]:
+    if filters is not None and not filters.is_empty():
+        if generation.filter_index is None:
+            st.warning("This index was built without metadata filters; run 'python build_index.py' to add them.")
+        else:
+            with span("filter"):
+                candidates = generation.filter_index.candidates(filters)
+            if not len(candidates):
+                return []
+            return search_artworks_batch(generation.index, generation.chunks, [query], top_k, generation.lexical,
+                                         candidates, generation.params)[0]
+
+    if RETRIEVAL_MICRO_BATCHING:
+        return generation.batcher(top_k, _search_generation)(query)
+    return _search_generation(generation, [query], top_k)[0]
@@ -0,0 +1,279 @@
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import multiprocessing as mp
+import threading
+import time
+import numpy as np
+from models.embeddings import embed_queries
+from models.index_factory import as_squared_l2, filtered_search, prepare_vectors
+from models.index_shards import shard_index_path
+from models.lexical_index import reciprocal_rank_fusion
+from models.metadata_filters import MetadataFilter
+from utils.hot_index import HotIndex
+from utils.micro_batcher import MicroBatcher
+from utils.telemetry import span, RETRIEVAL_QUERIES, SHARD_SECONDS, SHARD_FANOUT_SECONDS, SHARD_FAILURES
+from config.config import (
+    SHARD_WORKERS, SHARD_TIMEOUT, HYBRID_RETRIEVAL, HYBRID_CANDIDATES, RRF_K, EXACT_MATCH_FAST_PATH,
+    FILTER_EXACT_SEARCH_MAX, CONTEXT_MAX_DISTANCE, CONTEXT_MIN_LEXICAL_SCORE, RETRIEVAL_MICRO_BATCHING,
+    RETRIEVAL_MAX_BATCH, RETRIEVAL_BATCH_WAIT_MS,
+)
+
+SHARD_WORKER_TYPES = ("process", "thread")
+
+# Set in each shard worker process by _init_shard_worker
+_worker_shard: Optional[HotIndex] = None
+
+
+class ShardsUnavailable(RuntimeError):
+    """
+    No shard of a sharded index answered a search.
+    """
+
+
+def _init_shard_worker(index_path: str):
+    global _worker_shard
+    _worker_shard = HotIndex(index_path)
+    _worker_shard.current  # Load the shard before the first query arrives
+
+
+def _search_in_worker(queries: List[str], vectors: np.ndarray, k: int, filters: Optional[MetadataFilter],
+                      min_lexical_score: float):
+    return search_shard(_worker_shard, queries, vectors, k, filters, min_lexical_score)
+
+
+def _loaded(shard: Optional[HotIndex] = None) -> bool:
+    (shard or _worker_shard).current
+    return True
+
+
+def search_shard(shard: HotIndex, queries: List[str], vectors: np.ndarray, k: int,
+                 filters: Optional[MetadataFilter] = None,
+                 min_lexical_score: float = CONTEXT_MIN_LEXICAL_SCORE) -> Tuple[float, List[dict]]:
+    """
+    Searches one shard for a batch of embedded queries. Returns the seconds the shard
+    spent and, per query, its exact-name matches as (row, chunk), and its top-k dense hits
+    as (squared L2 distance, row, chunk) and BM25 hits as (normalised score, row, chunk),
+    best first. BM25 hits scoring below `min_lexical_score` are left out.
+    A shard built without filter columns cannot apply `filters`: it returns no hits,
+    each marked "unfiltered", rather than unfiltered hits.
+    """
+    start = time.perf_counter()
+    with shard.acquire() as generation:
+        index, chunks, lexical = generation.index, generation.chunks, generation.lexical
+        candidates = None
+        if filters is not None and not filters.is_empty():
+            if generation.filter_index is None:
+                return time.perf_counter() - start, [{"exact": [], "dense": [], "lexical": [], "unfiltered": True}
+                                                     for _ in queries]
+            candidates = generation.filter_index.candidates(filters)
+            if not len(candidates):
+                return time.perf_counter() - start, [{"exact": [], "dense": [], "lexical": []} for _ in queries]
+        vectors = prepare_vectors(index, vectors)
+        if candidates is None:
+            distances, rows = index.search(vectors, k)
+        else:
+            distances, rows = filtered_search(index, vectors, candidates, k, generation.params,
+                                              FILTER_EXACT_SEARCH_MAX)
+        distances = as_squared_l2(index, distances)
+
+        results = []
+        for query, query_rows, query_distances in zip(queries, rows.tolist(), distances.tolist()):
+            hits = {"exact": [], "lexical": []}
+            hits["dense"] = [(distance, row, chunks[row]) for row, distance in zip(query_rows, query_distances)
+                             if 0 <= row < len(chunks)]
+            if lexical is not None:
+                if EXACT_MATCH_FAST_PATH:
+                    hits["exact"] = [(row, chunks[row]) for row in lexical.exact_match(query, k, candidates)]
+                hits["lexical"] = [(score, row, chunks[row]) for row, score
+                                   in lexical.scored_search(query, k, candidates, min_lexical_score)]
+            results.append(hits)
+    return time.perf_counter() - start, results
+
+
+def merge_shard_hits(hits_by_shard: List[Tuple[int, dict]], top_k: int, k: int,
+                     max_distance: Optional[float] = CONTEXT_MAX_DISTANCE) -> List[str]:
+    """
+    Merges one query's per-shard hits into the chunks a single index would return.
+    Exact-name matches win outright; otherwise the shards' sorted dense and BM25 lists
+    are each merged with a heap into a global top-k and fused with reciprocal rank fusion.
+    Dense hits farther than `max_distance` are dropped, except the nearest overall; the
+    shards have already dropped weak BM25 hits.
+    """
+    exact = [chunk for _, hits in hits_by_shard for _, chunk in hits["exact"]]
+    if exact:
+        RETRIEVAL_QUERIES.inc(path="exact")
+        return exact[:top_k]
+
+    dense = list(heapq.merge(*[[(distance, shard, row, chunk) for distance, row, chunk in hits["dense"]]
+                               for shard, hits in hits_by_shard]))[:k]
+    dense = [hit for i, hit in enumerate(dense) if i == 0 or max_distance is None or hit[0] <= max_distance]
+    lexical = list(heapq.merge(*[[(-score, shard, row, chunk) for score, row, chunk in hits["lexical"]]
+                                 for shard, hits in hits_by_shard]))[:k]
+    RETRIEVAL_QUERIES.inc(path="hybrid" if HYBRID_RETRIEVAL else "dense")
+
+    chunk_of = {(shard, row): chunk for _, shard, row, chunk in dense + lexical}
+    fused = reciprocal_rank_fusion([[(shard, row) for _, shard, row, _ in hits] for hits in (dense, lexical) if hits],
+                                   top_k, RRF_K)
+    return [chunk_of[key] for key in fused]
+
+
+class ShardedIndex:
+    """
+    Serves an index partitioned by `build_index.py --shards`. Each batch of queries is
+    embedded once and scattered to every shard in parallel; the shards' sorted top-k
+    lists are gathered and merged with a heap, then fused as for a single index. BM25
+    scores come from each shard's own term statistics, which agree closely when
+    artworks are spread by ID. Every shard hot-reloads its own published generations.
+
+    With `workers="process"` each shard is loaded and searched by a worker process of
+    its own, standing in for a remote node: queries and hits cross the process boundary
+    as pickled messages. With "thread" the shards are searched in this process. A shard
+    that has not answered within `timeout` seconds, or fails, is left out of the result
+    and counted in docent_shard_failures_total; the latency fan-out adds on top of the
+    slowest shard's own search is recorded in docent_shard_fanout_seconds.
+
+    A search that overran its timeout cannot be interrupted, so until it finishes its
+    shard is skipped (reason "busy") rather than queueing more work behind it. A worker
+    process that died is replaced on the shard's next search. Shards built without
+    filter columns are listed in `unfiltered_shards` and left out of filtered searches.
+    """
+
+    def __init__(self, index_path: str, layout: dict, workers: str = SHARD_WORKERS, timeout: float = SHARD_TIMEOUT):
+        if workers not in SHARD_WORKER_TYPES:
+            raise ValueError(f"Unknown shard workers '{workers}'. Choose one of: {', '.join(SHARD_WORKER_TYPES)}.")
+        self.layout = layout
+        self.shards: List[int] = list(layout["shards"])
+        self.workers = workers
+        self.timeout = timeout
+        self.last_fanout_seconds: Optional[float] = None
+        self.unfiltered_shards: Set[int] = set()
+        self._paths = [shard_index_path(index_path, shard) for shard in self.shards]
+        self._hot: Optional[List[HotIndex]] = None
+        if workers == "thread":
+            self._hot = [HotIndex(path) for path in self._paths]
+        self._executors = [self._new_executor(position) for position in range(len(self.shards))]
+        self._overdue: List[Optional[Future]] = [None] * len(self.shards)
+        self._batchers: Dict[int, MicroBatcher] = {}
+        self._lock = threading.Lock()
+
+    def _new_executor(self, position: int):
+        if self._hot is not None:
+            return ThreadPoolExecutor(1, thread_name_prefix=f"shard{self.shards[position]}")
+        # Spawned workers start clean instead of inheriting the parent's threads and torch state
+        return ProcessPoolExecutor(1, mp_context=mp.get_context("spawn"), initializer=_init_shard_worker,
+                                   initargs=(self._paths[position],))
+
+    def _submit(self, position: int, fn, *args) -> Future:
+        if self._hot is not None:
+            args = (self._hot[position], *args)
+        executor = self._executors[position]
+        try:
+            return executor.submit(fn, *args)
+        except BrokenExecutor:
+            # The worker died (e.g. killed, or its shard failed to load): start a new one
+            with self._lock:
+                if self._executors[position] is executor:
+                    self._executors[position] = self._new_executor(position)
+                    executor.shutdown(wait=False)
+                executor = self._executors[position]
+            return executor.submit(fn, *args)
+
+    def _busy(self, position: int) -> bool:
+        overdue = self._overdue[position]
+        if overdue is not None and overdue.done():
+            self._overdue[position] = overdue = None
+        return overdue is not None
+
+    def warm_up(self):
+        """
+        Starts every shard worker and loads its shard, waiting until all are ready.
+        """
+        for future in [self._submit(position, _loaded) for position in range(len(self.shards))]:
+            future.result()
+
+    def search(self, queries: List[str], vectors: np.ndarray, top_k: int, filters: Optional[MetadataFilter] = None,
+               max_distance: Optional[float] = CONTEXT_MAX_DISTANCE,
+               min_lexical_score: float = CONTEXT_MIN_LEXICAL_SCORE) -> List[List[str]]:
+        """
+        Top-k chunks for each of several embedded queries, from all shards that answer in
+        time. Raises ShardsUnavailable if none does.
+        """
+        k = max(top_k, HYBRID_CANDIDATES) if HYBRID_RETRIEVAL else top_k
+        fn = _search_in_worker if self._hot is None else search_shard
+        start = time.perf_counter()
+        futures: Dict[Future, int] = {}
+        failures: List[str] = []
+        for position, shard in enumerate(self.shards):
+            if self._busy(position):
+                SHARD_FAILURES.inc(shard=str(shard), reason="busy")
+                failures.append(f"shard {shard} busy")
+                continue
+            futures[self._submit(position, fn, queries, vectors, k, filters, min_lexical_score)] = position
+        done, late = wait(futures, timeout=self.timeout)
+        elapsed = time.perf_counter() - start
+
+        for future in late:
+            position = futures[future]
+            if not future.cancel():
+                self._overdue[position] = future
+            SHARD_FAILURES.inc(shard=str(self.shards[position]), reason="timeout")
+            failures.append(f"shard {self.shards[position]} timed out")
+        gathered, slowest = [], 0.0
+        for future in done:
+            shard = self.shards[futures[future]]
+            try:
+                seconds, results = future.result()
+            except Exception as e:
+                SHARD_FAILURES.inc(shard=str(shard), reason="error")
+                failures.append(f"shard {shard}: {e!r}")
+                continue
+            SHARD_SECONDS.observe(seconds, shard=str(shard))
+            slowest = max(slowest, seconds)
+            if results and results[0].get("unfiltered"):
+                self.unfiltered_shards.add(shard)
+            elif filters is not None and not filters.is_empty():
+                self.unfiltered_shards.discard(shard)
+            gathered.append((shard, results))
+        if not gathered:
+            raise ShardsUnavailable(f"No index shard answered ({'; '.join(failures)})")
+        self.last_fanout_seconds = max(0.0, elapsed - slowest)
+        SHARD_FANOUT_SECONDS.observe(self.last_fanout_seconds)
+
+        gathered.sort(key=lambda item: item[0])
+        return [merge_shard_hits([(shard, results[i]) for shard, results in gathered], top_k, k, max_distance)
+                for i in range(len(queries))]
+
+    def retrieve_batch(self, queries: List[str], top_k: int,
+                       filters: Optional[MetadataFilter] = None) -> List[List[str]]:
+        with span("embed"):
+            vectors = embed_queries(queries)
+        with span("scatter_gather"):
+            return self.search(queries, vectors, top_k, filters)
+
+    def retrieve(self, query: str, top_k: int, filters: Optional[MetadataFilter] = None) -> List[str]:
+        """
+        Top-k chunks for one query. Concurrent unfiltered queries are coalesced into one
+        embedding call and one fan-out when micro-batching is on.
+        """
+        if RETRIEVAL_MICRO_BATCHING and (filters is None or filters.is_empty()):
+            return self._batcher(top_k)(query)
+        return self.retrieve_batch([query], top_k, filters)[0]
+
+    def _batcher(self, top_k: int) -> MicroBatcher:
+        with self._lock:
+            if top_k not in self._batchers:
+                self._batchers[top_k] = MicroBatcher(
+                    lambda queries: self.retrieve_batch(queries, top_k),
+                    max_batch_size=RETRIEVAL_MAX_BATCH,
+                    max_wait_ms=RETRIEVAL_BATCH_WAIT_MS,
+                )
+            return self._batchers[top_k]
+
+    def close(self):
+        with self._lock:
+            batchers, self._batchers = list(self._batchers.values()), {}
+        for batcher in batchers:
+            batcher.close()
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
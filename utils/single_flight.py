@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+import threading
+import time
+
+
+class FlightAbandoned(Exception):
+    """
+    The caller computing a shared result stopped before finishing it, or went quiet for
+    longer than a follower was willing to wait.
+    """
+
+
+class Flight:
+    """
+    One in-flight computation shared by every caller asking for the same key. The
+    caller doing the work publishes events as it goes; the others replay them from
+    the start and then receive each new one as soon as it is published.
+    """
+
+    def __init__(self):
+        self.followers = 0
+        self._events: List[tuple] = []
+        self._done = False
+        self._abandoned = False
+        self._cond = threading.Condition()
+
+    def publish(self, *event):
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    @property
+    def landed(self) -> bool:
+        return self._done
+
+    def _land(self, abandoned: bool):
+        with self._cond:
+            self._done = True
+            self._abandoned = abandoned
+            self._cond.notify_all()
+
+    def events(self, timeout: Optional[float] = None) -> Iterator[tuple]:
+        """
+        Yields every event published, waiting for new ones until the flight lands.
+        Raises FlightAbandoned if the leader stopped before finishing, or if `timeout`
+        seconds pass without a new event.
+        """
+        seen = 0
+        while True:
+            with self._cond:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while seen == len(self._events) and not self._done:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise FlightAbandoned()
+                    self._cond.wait(remaining)
+                if seen < len(self._events):
+                    event = self._events[seen]
+                    seen += 1
+                elif self._abandoned:
+                    raise FlightAbandoned()
+                else:
+                    return
+            yield event
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests. The first caller for a key leads and does
+    the work; callers arriving while it is in flight follow and share what it publishes.
+    Once the leader finishes, the key is free again, so later requests start afresh
+    (and are usually served by a cache the leader filled).
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def join(self, key: Hashable) -> Iterator[Tuple[Flight, bool]]:
+        """
+        Yields (flight, leader) for `key`. The flight lands when the leader's block
+        exits, abandoned if it exits with an exception.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+            else:
+                flight.followers += 1
+        if not leader:
+            yield flight, False
+            return
+        try:
+            yield flight, True
+        except BaseException:
+            self._land(key, flight, abandoned=True)
+            raise
+        self._land(key, flight, abandoned=False)
+
+    def _land(self, key: Hashable, flight: Flight, abandoned: bool):
+        with self._lock:
+            del self._flights[key]
+        flight._land(abandoned)
+
+    def __len__(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,317 @@
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+import contextvars
+import math
+import threading
+import time
+from config.config import TELEMETRY_ENABLED
+
+# Upper bounds (seconds) of the latency histogram buckets: from a cached lookup to a slow LLM answer
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic count, one series per combination of label values.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labels), 0.0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """
+    Distribution of observed values in fixed cumulative buckets, as Prometheus expects;
+    quantiles are estimated by interpolating within a bucket.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels.get(name, "")) for name in self.labels))
+        return series[-1] if series else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        series = self._series.get(tuple(str(labels.get(name, "")) for name in self.labels))
+        if not series or not series[-1]:
+            return None
+        rank = q * series[-1]
+        cumulative = 0
+        for i, bound in enumerate(self.buckets):
+            previous = cumulative
+            cumulative += series[i]
+            if cumulative >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if bound == math.inf:
+                    return lower
+                return lower + (bound - lower) * (rank - previous) / max(series[i], 1)
+        return None
+
+    def series_labels(self) -> List[Dict[str, str]]:
+        return [dict(zip(self.labels, key)) for key in sorted(self._series)]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram("docent_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+QUESTION_SECONDS = registry.histogram("docent_question_seconds", "Time from question to complete answer.")
+LLM_TTFT_SECONDS = registry.histogram("docent_llm_ttft_seconds", "Time to the first token of an LLM answer.")
+QUESTIONS = registry.counter("docent_questions_total", "Questions asked in the app.")
+RETRIEVAL_QUERIES = registry.counter(
+    "docent_retrieval_queries_total", "Queries retrieved, by how they were answered.", ("path",))
+CACHE_LOOKUPS = registry.counter("docent_cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"))
+LLM_REQUESTS = registry.counter("docent_llm_requests_total", "LLM requests by delivery.", ("delivery",))
+LLM_ERRORS = registry.counter("docent_llm_errors_total", "LLM requests that failed.")
+LLM_TOKENS = registry.counter("docent_llm_tokens_total", "Completion tokens received from the LLM.")
+COALESCED_CALLS = registry.counter(
+    "docent_coalesced_calls_total",
+    "Retrieval and LLM calls saved by sharing an identical question already in flight, by call.", ("call",))
+SHARD_SECONDS = registry.histogram(
+    "docent_shard_search_seconds", "Time each index shard spends on a search, measured in the shard.", ("shard",))
+SHARD_FANOUT_SECONDS = registry.histogram(
+    "docent_shard_fanout_seconds", "Latency scatter-gather adds on top of the slowest shard's own search.")
+SHARD_FAILURES = registry.counter(
+    "docent_shard_failures_total", "Shard searches left out of a result, by shard and reason.", ("shard", "reason"))
+
+
+class Trace:
+    """
+    The spans of one question, in start order, for showing where its time went.
+    Each span is (stage, start offset in seconds, duration in seconds, nesting depth).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.total: Optional[float] = None
+        self.spans: List[Tuple[str, float, float, int]] = []
+        self.depth = 0
+
+    def add(self, stage: str, started_at: float, seconds: float, depth: Optional[int] = None):
+        self.spans.append((stage, started_at - self.started_at, seconds, self.depth if depth is None else depth))
+
+    def as_rows(self) -> List[dict]:
+        return [{"stage": "  " * depth + stage, "start ms": round(offset * 1000, 1), "ms": round(seconds * 1000, 1)}
+                for stage, offset, seconds, depth in sorted(self.spans, key=lambda span: (span[1], span[3]))]
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("docent_trace", default=None)
+
+# The most recent completed traces, newest last
+recent_traces: "deque[Trace]" = deque(maxlen=50)
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """
+    Collects the spans recorded on this thread until the block exits into a new Trace,
+    and times the whole block as a question.
+    """
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        current.total = time.perf_counter() - current.started_at
+        if TELEMETRY_ENABLED:
+            QUESTION_SECONDS.observe(current.total)
+        recent_traces.append(current)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a pipeline stage into the stage histogram and the current trace, if any.
+    """
+    if not TELEMETRY_ENABLED:
+        yield
+        return
+    current = _current_trace.get()
+    if current is not None:
+        current.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if current is not None:
+            current.depth -= 1
+            current.add(stage, start, seconds)
+
+
+def record(stage: str, started_at: float, seconds: float):
+    """
+    Records a stage timed elsewhere (e.g. by LLMMetrics) as if it were a span.
+    """
+    if not TELEMETRY_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    current = _current_trace.get()
+    if current is not None:
+        current.add(stage, started_at, seconds)
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, float, float, int]]]:
+    """
+    Collects spans recorded on this thread (e.g. a micro-batcher's worker) so they can
+    be replayed into the traces of the requests they served. Yields a list of
+    (stage, absolute start, duration, depth), filled in when the block exits.
+    """
+    current = Trace("capture")
+    token = _current_trace.set(current)
+    spans: List[Tuple[str, float, float, int]] = []
+    try:
+        yield spans
+    finally:
+        _current_trace.reset(token)
+        spans.extend((stage, offset + current.started_at, seconds, depth)
+                     for stage, offset, seconds, depth in current.spans)
+
+
+def replay(spans: List[Tuple[str, float, float, int]]):
+    """
+    Adds captured spans to the current trace, nested under whatever span is open.
+    Their stage histograms were already updated when they were recorded.
+    """
+    current = _current_trace.get()
+    if current is None:
+        return
+    for stage, started_at, seconds, depth in spans:
+        current.add(stage, started_at, seconds, current.depth + depth)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the app's console
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0].rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        payload = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """
+    Serves the registry at http://host:port/metrics on a background thread and
+    returns (server, url). Call `server.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}/metrics"